@@ -0,0 +1,125 @@
+# Indicadores da cozinha a partir do histórico de status dos pedidos
+# (pedido_eventos) e dos contadores por hora (cozinha_hora), ambos gravados
+# junto com cada mudança de status. Tempos por etapa saem de uma consulta com
+# funções de janela sobre os eventos do período; vazão e fila saem das no
+# máximo 24 linhas de contadores do dia.
+#
+# Uso: python analise.py [AAAA-MM-DD] [--banco estoque.db]
+import argparse
+from datetime import date, datetime, timedelta
+
+import servicos
+from servicos import DBManager, nas_duas_partes
+
+# nome, status de entrada, status de saída
+ETAPAS = (
+    ("Espera", "Aberto", "Em Andamento"),
+    ("Preparo", "Em Andamento", "Finalizado"),
+    ("Cozinha (total)", "Aberto", "Finalizado"),
+    ("Retirada", "Finalizado", "Concluído"),
+)
+STATUS_NA_FILA = ("Aberto", "Em Andamento")
+
+def tempos_etapas(inicio, fim):
+    # Pedidos que saíram de cada etapa em [inicio, fim); percentil pelo posto
+    # mais próximo: o menor tempo cuja posição alcança p% do total
+    # Eventos de um pedido ficam todos no mesmo banco: cada ramo junta os do
+    # dia a dia e os do arquivo separadamente
+    valores = ", ".join(f"(?{3 * i + 1}, ?{3 * i + 2}, ?{3 * i + 3})" for i in range(len(ETAPAS)))
+    inicio_fim = f"?{3 * len(ETAPAS) + 1} AND saida.data_hora < ?{3 * len(ETAPAS) + 2}"
+    tempos = nas_duas_partes(
+        "SELECT etapas.ordem, (julianday(saida.data_hora) - julianday(entrada.data_hora)) * 86400 AS segundos "
+        "FROM etapas "
+        f"JOIN {{parte}}.pedido_eventos saida ON saida.status = etapas.ate AND saida.data_hora >= {inicio_fim} "
+        "JOIN {parte}.pedido_eventos entrada ON entrada.pedido_id = saida.pedido_id AND entrada.status = etapas.de")
+    linhas = DBManager.consultar(f'''
+        WITH etapas (ordem, de, ate) AS (VALUES {valores}),
+        tempos AS ({tempos}),
+        ordenados AS (
+            SELECT ordem, segundos,
+                   ROW_NUMBER() OVER (PARTITION BY ordem ORDER BY segundos) AS posicao,
+                   COUNT(*) OVER (PARTITION BY ordem) AS total
+            FROM tempos
+        )
+        SELECT ordem, COUNT(*),
+               MIN(CASE WHEN posicao >= total * 0.5 THEN segundos END),
+               MIN(CASE WHEN posicao >= total * 0.95 THEN segundos END),
+               MAX(segundos)
+        FROM ordenados GROUP BY ordem''',
+        tuple(valor for i, (_, de, ate) in enumerate(ETAPAS) for valor in (i, de, ate)) + (inicio, fim))
+    por_ordem = {linha[0]: linha[1:] for linha in linhas}
+    resultado = []
+    for i, (nome, _, _) in enumerate(ETAPAS):
+        pedidos, p50, p95, maximo = por_ordem.get(i, (0, None, None, None))
+        resultado.append({"etapa": nome, "pedidos": pedidos, "p50_s": p50, "p95_s": p95, "max_s": maximo})
+    return resultado
+
+def por_hora(dia):
+    # A fila no fim de cada hora parte da fila de agora (pedidos ainda em
+    # Aberto/Em Andamento) e desfaz o saldo de entradas e prontos das horas
+    # seguintes, então não depende do histórico anterior à migração
+    with DBManager.leitura() as cursor:
+        fila = cursor.execute(f"SELECT COUNT(*) FROM pedidos WHERE status IN ({', '.join('?' * len(STATUS_NA_FILA))})",
+                              STATUS_NA_FILA).fetchone()[0]
+        fila -= cursor.execute("SELECT COALESCE(SUM(entradas - prontos), 0) FROM cozinha_hora WHERE hora > ?",
+                               (f"{dia} 23",)).fetchone()[0]
+        contadores = {linha[0]: linha[1:] for linha in cursor.execute(
+            "SELECT hora, entradas, iniciados, prontos, concluidos FROM cozinha_hora WHERE hora BETWEEN ? AND ?",
+            (f"{dia} 00", f"{dia} 23"))}
+    agora = datetime.now()
+    ultima = agora.hour if dia == agora.date().isoformat() else 23
+    horas = []
+    for hora in range(23, -1, -1):
+        entradas, iniciados, prontos, concluidos = contadores.get(f"{dia} {hora:02d}", (0, 0, 0, 0))
+        if hora <= ultima:
+            horas.append({"hora": hora, "entradas": entradas, "iniciados": iniciados, "prontos": prontos,
+                          "concluidos": concluidos, "fila": fila})
+        fila -= entradas - prontos
+    horas.reverse()
+    return horas
+
+def painel(dia):
+    # Tudo o que a tela mostra de um dia, lido no mesmo instante do banco
+    inicio = date.fromisoformat(dia)
+    with DBManager.leitura():
+        etapas = tempos_etapas(f"{inicio} 00:00:00", f"{inicio + timedelta(days=1)} 00:00:00")
+        horas = por_hora(dia)
+    pico = max(horas, key=lambda h: h["prontos"], default=None)
+    return {
+        "dia": dia,
+        "etapas": etapas,
+        "horas": horas,
+        "entradas": sum(h["entradas"] for h in horas),
+        "prontos": sum(h["prontos"] for h in horas),
+        "fila_maxima": max((h["fila"] for h in horas), default=0),
+        "hora_pico": pico["hora"] if pico and pico["prontos"] else None,
+    }
+
+def formatar_duracao(segundos):
+    if segundos is None:
+        return "-"
+    minutos, segundos = divmod(round(segundos), 60)
+    horas, minutos = divmod(minutos, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos}:{segundos:02d}"
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dia", nargs="?", default=date.today().isoformat())
+    parser.add_argument("--banco", default=servicos.DB_NAME)
+    args = parser.parse_args()
+
+    servicos.DB_NAME = args.banco
+    dados = painel(args.dia)
+    print(f"Cozinha em {dados['dia']}: {dados['entradas']} pedidos entraram, {dados['prontos']} ficaram prontos, "
+          f"fila máxima {dados['fila_maxima']}")
+    print(f"\n{'etapa':16} {'pedidos':>8} {'mediana':>9} {'p95':>9} {'máx':>9}")
+    for etapa in dados["etapas"]:
+        print(f"{etapa['etapa']:16} {etapa['pedidos']:>8} {formatar_duracao(etapa['p50_s']):>9} "
+              f"{formatar_duracao(etapa['p95_s']):>9} {formatar_duracao(etapa['max_s']):>9}")
+    print(f"\n{'hora':>4} {'entradas':>9} {'prontos':>8} {'concluídos':>11} {'fila':>5}")
+    for hora in dados["horas"]:
+        print(f"{hora['hora']:>4} {hora['entradas']:>9} {hora['prontos']:>8} {hora['concluidos']:>11} {hora['fila']:>5}")
+    DBManager.fechar_conexoes()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+# API HTTP/JSON local para tablets e totens fazerem pedidos sem a interface
+# desktop. Servidor asyncio sem dependências externas; leituras rodam num pool
+# de threads e todas as escritas passam pela FilaEscrita, um escritor só.
+#
+# Uso: python api.py [--host 127.0.0.1] [--porta 8080] [--banco estoque.db]
+#
+#   GET  /produtos?busca=&categoria=       cardápio
+#   GET  /pedidos                          pedidos em aberto (Kanban)
+#   GET  /pedidos/alteracoes?desde=N       feed de alterações de pedidos
+#   POST /pedidos                          {"cliente": "...", "itens": [{"produto_id": 1, "quantidade": 2}],
+#                                           "carrinho": "..." (opcional, converte as reservas dele)}
+#   PUT  /carrinhos/<id>/itens/<produto>   {"quantidade": 2} reserva o total do produto no carrinho (0 libera)
+#   DELETE /carrinhos/<id>                 cancela o carrinho e libera as reservas
+#   POST /pedidos/<id>/avancar             {"status_atual": "Aberto"} (opcional)
+#   POST /pedidos/<id>/concluir
+#   POST /despesas                         {"valor": 12.5, "descricao": "..."}
+#   GET  /relatorio?inicio=AAAA-MM-DD&fim=AAAA-MM-DD
+import argparse
+import asyncio
+import json
+import re
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+import servicos
+from perfil import Perfil
+from servicos import (
+    DBManager, Dinheiro, EstoqueInsuficiente, FilaEscrita, ProdutoCatalog, RelatorioCaixa, ServicoCaixa, ServicoPedidos,
+    ServicoReservas, TransicaoInvalida
+)
+
+MOTIVOS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+TAMANHO_MAXIMO_CORPO = 1024 * 1024
+MAXIMO_CABECALHOS = 100
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem, **extras):
+        super().__init__(mensagem)
+        self.status = status
+        self.corpo = {"erro": mensagem, **extras}
+
+def produto_json(produto):
+    return {"id": produto.id, "nome": produto.nome, "quantidade": produto.quantidade,
+            "disponivel": produto.disponivel, "preco": float(produto.preco), "categoria": produto.categoria}
+
+def pedido_json(linha):
+    pedido_id, cliente, status, data_hora, itens = linha[:5]
+    return {"id": pedido_id, "cliente": cliente, "status": status, "data_hora": data_hora, "itens": itens}
+
+class ServidorAPI:
+    def __init__(self):
+        self.fila = FilaEscrita()
+        self.rotas = [
+            ("GET", re.compile(r"^/produtos$"), self.listar_produtos),
+            ("GET", re.compile(r"^/pedidos$"), self.listar_pedidos),
+            ("GET", re.compile(r"^/pedidos/alteracoes$"), self.alteracoes),
+            ("POST", re.compile(r"^/pedidos$"), self.criar_pedido),
+            ("POST", re.compile(r"^/pedidos/(\d+)/avancar$"), self.avancar_pedido),
+            ("POST", re.compile(r"^/pedidos/(\d+)/concluir$"), self.concluir_pedido),
+            ("PUT", re.compile(r"^/carrinhos/([\w-]{1,64})/itens/(\d+)$"), self.reservar_item),
+            ("DELETE", re.compile(r"^/carrinhos/([\w-]{1,64})$"), self.cancelar_carrinho),
+            ("POST", re.compile(r"^/despesas$"), self.registrar_despesa),
+            ("GET", re.compile(r"^/relatorio$"), self.relatorio),
+        ]
+
+    async def ler(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, funcao, *args)
+
+    async def escrever(self, funcao, *args):
+        return await asyncio.wrap_future(self.fila.enviar(funcao, *args))
+
+    async def listar_produtos(self, consulta, corpo):
+        def buscar():
+            ProdutoCatalog.sincronizar()
+            return ProdutoCatalog.buscar(consulta.get("busca", ""), consulta.get("categoria"))
+        return 200, [produto_json(produto) for produto in await self.ler(buscar)]
+
+    async def listar_pedidos(self, consulta, corpo):
+        ultima, pedidos = await self.ler(ServicoPedidos.pedidos_abertos)
+        return 200, {"alteracao_id": ultima, "pedidos": [pedido_json(p) for p in pedidos]}
+
+    async def alteracoes(self, consulta, corpo):
+        desde = inteiro(consulta.get("desde", "0"), "desde")
+        alteracoes = await self.ler(ServicoPedidos.alteracoes_desde, desde)
+        return 200, [dict(pedido_json(linha), alteracao_id=linha[5]) for linha in alteracoes]
+
+    async def criar_pedido(self, consulta, corpo):
+        cliente = corpo.get("cliente")
+        itens = corpo.get("itens")
+        carrinho = corpo.get("carrinho")
+        if not isinstance(cliente, str) or not cliente.strip():
+            raise ErroHTTP(400, "É necessário informar o nome do cliente!")
+        if not isinstance(itens, list) or not itens:
+            raise ErroHTTP(400, "Adicione itens ao pedido antes de finalizar!")
+        try:
+            itens = [(int(item["produto_id"]), int(item["quantidade"])) for item in itens]
+        except (KeyError, TypeError, ValueError):
+            raise ErroHTTP(400, "Cada item precisa de produto_id e quantidade inteiros.") from None
+        if carrinho is not None and not isinstance(carrinho, str):
+            raise ErroHTTP(400, "carrinho deve ser o texto usado nas reservas.")
+        try:
+            pedido_id = await self.escrever(ServicoPedidos.finalizar_ids, cliente.strip(), itens, carrinho)
+        except EstoqueInsuficiente as e:
+            raise erro_estoque(e) from None
+        except ValueError as e:
+            raise ErroHTTP(400, str(e)) from None
+        return 201, {"id": pedido_id}
+
+    async def reservar_item(self, consulta, corpo, carrinho, produto_id):
+        quantidade = corpo.get("quantidade")
+        if isinstance(quantidade, bool) or not isinstance(quantidade, int) or quantidade < 0:
+            raise ErroHTTP(400, "Informe a quantidade total do produto no carrinho (0 libera).")
+        try:
+            await self.escrever(ServicoReservas.reservar, carrinho, int(produto_id), quantidade)
+        except EstoqueInsuficiente as e:
+            raise erro_estoque(e) from None
+        return 200, {"carrinho": carrinho, "produto_id": int(produto_id), "quantidade": quantidade}
+
+    async def cancelar_carrinho(self, consulta, corpo, carrinho):
+        await self.escrever(ServicoReservas.liberar, carrinho)
+        return 200, {"carrinho": carrinho}
+
+    async def avancar_pedido(self, consulta, corpo, pedido_id):
+        try:
+            status = await self.escrever(ServicoPedidos.avancar, int(pedido_id), corpo.get("status_atual"))
+        except TransicaoInvalida as e:
+            raise ErroHTTP(409, str(e)) from None
+        return 200, {"id": int(pedido_id), "status": status}
+
+    async def concluir_pedido(self, consulta, corpo, pedido_id):
+        try:
+            status = await self.escrever(ServicoPedidos.concluir, int(pedido_id))
+        except TransicaoInvalida as e:
+            raise ErroHTTP(409, str(e)) from None
+        return 200, {"id": int(pedido_id), "status": status}
+
+    async def registrar_despesa(self, consulta, corpo):
+        valor = corpo.get("valor")
+        descricao = corpo.get("descricao")
+        try:
+            if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                raise ValueError
+            valor = Dinheiro.de_reais(valor)
+        except ValueError:
+            valor = None
+        if valor is None or valor <= Dinheiro():
+            raise ErroHTTP(400, "Informe um valor de despesa positivo.")
+        if not isinstance(descricao, str) or not descricao.strip():
+            raise ErroHTTP(400, "Informe a descrição da despesa.")
+        lancamento_id = await self.escrever(ServicoCaixa.registrar_despesa, valor, descricao.strip())
+        return 201, {"id": lancamento_id}
+
+    async def relatorio(self, consulta, corpo):
+        if not consulta.get("inicio"):
+            raise ErroHTTP(400, "Informe ao menos a data de início (inicio=AAAA-MM-DD).")
+        inicio = data(consulta["inicio"], "inicio")
+        fim = data(consulta["fim"], "fim") if consulta.get("fim") else inicio
+
+        def gerar():
+            totais = RelatorioCaixa.totais(inicio, fim)
+            detalhes = RelatorioCaixa.detalhes(inicio, fim)
+            return totais, detalhes
+        (vendas, despesas, qtd_vendas, qtd_despesas), detalhes = await self.ler(gerar)
+        return 200, {
+            "inicio": inicio, "fim": fim,
+            "total_vendas": float(vendas), "total_despesas": float(despesas), "saldo": float(vendas - despesas),
+            "qtd_vendas": qtd_vendas, "qtd_despesas": qtd_despesas,
+            "lancamentos": [{"data": data, "tipo": tipo, "valor": float(valor), "pedido_id": pedido_id,
+                             "cliente": cliente, "itens": itens}
+                            for data, tipo, valor, pedido_id, cliente, itens in detalhes],
+        }
+
+    async def despachar(self, metodo, alvo, corpo_bruto):
+        url = urlsplit(alvo)
+        consulta = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        metodo_encontrado = False
+        for metodo_rota, padrao, tratador in self.rotas:
+            encontrado = padrao.match(url.path)
+            if not encontrado:
+                continue
+            if metodo_rota != metodo:
+                metodo_encontrado = True
+                continue
+            corpo = {}
+            if corpo_bruto:
+                try:
+                    corpo = json.loads(corpo_bruto)
+                except ValueError:
+                    raise ErroHTTP(400, "Corpo da requisição não é um JSON válido.") from None
+                if not isinstance(corpo, dict):
+                    raise ErroHTTP(400, "O corpo da requisição deve ser um objeto JSON.")
+            return await tratador(consulta, corpo, *encontrado.groups())
+        if metodo_encontrado:
+            raise ErroHTTP(405, f"Método {metodo} não permitido em {url.path}.")
+        raise ErroHTTP(404, f"Rota não encontrada: {url.path}")
+
+    async def ler_requisicao(self, reader):
+        # (metodo, alvo, versao, cabecalhos), ou None se o cliente fechou a conexão.
+        # ErroHTTP quando não dá para entender a requisição: sem saber onde ela
+        # termina, a conexão é fechada depois da resposta
+        linha = await ler_linha(reader)
+        if not linha:
+            return None
+        partes = linha.decode("latin-1").split()
+        if len(partes) != 3 or not partes[2].startswith("HTTP/"):
+            raise ErroHTTP(400, "Linha de requisição inválida.")
+        cabecalhos = {}
+        for _ in range(MAXIMO_CABECALHOS):
+            cabecalho = await ler_linha(reader)
+            if cabecalho in (b"\r\n", b"\n", b""):
+                return (*partes, cabecalhos)
+            nome, separador, valor = cabecalho.decode("latin-1").partition(":")
+            if not separador or not nome.strip():
+                raise ErroHTTP(400, "Cabeçalho inválido.")
+            cabecalhos[nome.strip().lower()] = valor.strip()
+        raise ErroHTTP(413, "Cabeçalhos demais na requisição.")
+
+    async def tratar_conexao(self, reader, writer):
+        # HTTP/1.1 com keep-alive: o mesmo tablet manda vários pedidos na mesma conexão
+        try:
+            while True:
+                try:
+                    requisicao = await self.ler_requisicao(reader)
+                except ErroHTTP as e:
+                    await responder(writer, e.status, e.corpo, False)
+                    break
+                if requisicao is None:
+                    break
+                metodo, alvo, versao, cabecalhos = requisicao
+
+                manter = versao == "HTTP/1.1" and cabecalhos.get("connection", "").lower() != "close"
+                tamanho = tamanho_corpo(cabecalhos)
+                if tamanho is None:
+                    # Sem saber onde o corpo termina, a conexão não tem como continuar
+                    status, dados, manter = 400, {"erro": "Content-Length inválido."}, False
+                elif tamanho > TAMANHO_MAXIMO_CORPO:
+                    status, dados, manter = 413, {"erro": "Corpo da requisição muito grande."}, False
+                else:
+                    corpo = await reader.readexactly(tamanho) if tamanho else b""
+                    try:
+                        status, dados = await self.despachar(metodo.upper(), alvo, corpo)
+                    except ErroHTTP as e:
+                        status, dados = e.status, e.corpo
+                    except Exception as e:
+                        status, dados = 500, {"erro": f"Erro interno: {e}"}
+
+                await responder(writer, status, dados, manter)
+                if not manter:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def servir(self, host, porta):
+        servidor = await asyncio.start_server(self.tratar_conexao, host, porta)
+        print(f"API ouvindo em http://{host}:{porta}", flush=True)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def fechar(self):
+        self.fila.parar()
+        DBManager.fechar_conexoes()
+
+async def ler_linha(reader):
+    # readline() levanta ValueError quando a linha passa do limite do
+    # StreamReader (64 KiB) em vez de devolvê-la cortada
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):
+        raise ErroHTTP(413, "Linha da requisição muito longa.") from None
+
+async def responder(writer, status, dados, manter):
+    conteudo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"HTTP/1.1 {status} {MOTIVOS.get(status, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(conteudo)}\r\n"
+        f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n".encode("latin-1") + conteudo)
+    await writer.drain()
+
+def erro_estoque(erro):
+    return ErroHTTP(409, str(erro), faltantes=[{"produto": nome, "disponivel": disponivel}
+                                              for nome, disponivel in erro.faltantes])
+
+def inteiro(valor, nome):
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErroHTTP(400, f"Parâmetro {nome} deve ser um número inteiro.") from None
+
+def data(valor, nome):
+    try:
+        return date.fromisoformat(valor).isoformat()
+    except ValueError:
+        raise ErroHTTP(400, f"Parâmetro {nome} deve ser uma data AAAA-MM-DD.") from None
+
+def tamanho_corpo(cabecalhos):
+    # None para Content-Length que não é um inteiro não negativo (int()
+    # aceitaria sinal, espaços e "_")
+    valor = cabecalhos.get("content-length") or "0"
+    if not (valor.isascii() and valor.isdigit()):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        # Mais dígitos do que o int() converte
+        return None
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8080)
+    parser.add_argument("--banco", default=servicos.DB_NAME)
+    args = parser.parse_args()
+
+    servicos.DB_NAME = args.banco
+    DBManager.initialize_database()
+    ProdutoCatalog.sincronizar()
+    Perfil.instalar_sinal()
+    servidor = ServidorAPI()
+    try:
+        asyncio.run(servidor.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.fechar()
+
+if __name__ == "__main__":
+    main()
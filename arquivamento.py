@@ -0,0 +1,129 @@
+# Arquivo morto: pedidos concluídos há mais de DIAS dias (com itens, eventos
+# e lançamentos de caixa) e despesas antigas saem das tabelas do dia a dia
+# para o banco anexado "arquivo" (estoque-arquivo.db), um lote curto por
+# transação para não segurar o lock de escrita dos outros terminais. Assim
+# Kanban, venda e caixa trabalham sobre tabelas do tamanho do movimento
+# recente, e relatório, histórico e exportação leem as duas partes.
+#
+# Em WAL o commit não é atômico entre os dois arquivos: se cair no meio, o
+# lote pode ficar nos dois lados até a próxima rodada, que o copia de novo
+# (INSERT OR REPLACE pelo id) e termina de apagar.
+#
+# Uso: python arquivamento.py [caminho/do/estoque.db] [--dias 60] [--lote 500] [--vacuum]
+import argparse
+import time
+from datetime import date, timedelta
+
+import servicos
+from servicos import DBManager
+
+DIAS = 60
+LOTE = 500
+PAGINAS_VACUUM = 256
+
+# tabela, colunas, filtro pelos ids dos pedidos do lote
+TABELAS_PEDIDO = (
+    ("pedidos", "id, cliente, status, data_hora, itens, alteracao_id", "id"),
+    ("pedido_itens", "id, pedido_id, produto_id, quantidade, preco_unit_centavos", "pedido_id"),
+    ("pedido_eventos", "id, pedido_id, status, data_hora", "pedido_id"),
+    ("fluxo_caixa", "id, data, tipo, valor_centavos, pedido_id", "pedido_id"),
+)
+COLUNAS_CAIXA = "id, data, tipo, valor_centavos, pedido_id"
+
+def backfill_pendente(cursor):
+    # Pedido antigo ainda sem pedido_itens não pode sair da tabela viva
+    limite = cursor.execute("SELECT valor FROM schema_meta WHERE chave = 'backfill_itens_ate'").fetchone()
+    ultimo = cursor.execute("SELECT valor FROM schema_meta WHERE chave = 'backfill_itens_ultimo_id'").fetchone()
+    return limite is not None and int(ultimo[0] if ultimo else 0) < int(limite[0])
+
+def arquivar_lote(dias=DIAS, lote=LOTE):
+    # Retorna quantos pedidos e lançamentos avulsos foram para o arquivo
+    limite = (date.today() - timedelta(days=dias)).isoformat()
+    with DBManager.transacao() as cursor:
+        if backfill_pendente(cursor):
+            return 0
+        # O pedido com o maior alteracao_id fica: o trigger do feed de
+        # alterações calcula o próximo a partir dele
+        pedidos = [linha[0] for linha in cursor.execute(
+            "SELECT id FROM pedidos WHERE status = 'Concluído' AND data_hora < ? "
+            "AND alteracao_id < (SELECT MAX(alteracao_id) FROM pedidos) ORDER BY data_hora LIMIT ?",
+            (limite, lote))]
+        avulsos = [linha[0] for linha in cursor.execute(
+            "SELECT id FROM fluxo_caixa WHERE pedido_id IS NULL AND data < ? ORDER BY data LIMIT ?", (limite, lote))]
+        if not pedidos and not avulsos:
+            return 0
+
+        cursor.execute("INSERT OR REPLACE INTO schema_meta (chave, valor) VALUES ('arquivando', '1')")
+        if pedidos:
+            marcadores = ", ".join("?" * len(pedidos))
+            for tabela, colunas, chave in TABELAS_PEDIDO:
+                cursor.execute(f"INSERT OR REPLACE INTO arquivo.{tabela} ({colunas}) "
+                               f"SELECT {colunas} FROM main.{tabela} WHERE {chave} IN ({marcadores})", pedidos)
+            # Filhos antes do pedido
+            for tabela, _, chave in reversed(TABELAS_PEDIDO):
+                cursor.execute(f"DELETE FROM main.{tabela} WHERE {chave} IN ({marcadores})", pedidos)
+        if avulsos:
+            marcadores = ", ".join("?" * len(avulsos))
+            cursor.execute(f"INSERT OR REPLACE INTO arquivo.fluxo_caixa ({COLUNAS_CAIXA}) "
+                           f"SELECT {COLUNAS_CAIXA} FROM main.fluxo_caixa WHERE id IN ({marcadores})", avulsos)
+            cursor.execute(f"DELETE FROM main.fluxo_caixa WHERE id IN ({marcadores})", avulsos)
+        cursor.execute("DELETE FROM schema_meta WHERE chave = 'arquivando'")
+    return len(pedidos) + len(avulsos)
+
+def arquivar(dias=DIAS, lote=LOTE, pausa=0.05):
+    # Lote atrás de lote, com uma pausa entre eles para os terminais escreverem
+    total = 0
+    while True:
+        movidos = arquivar_lote(dias, lote)
+        if not movidos:
+            return total
+        total += movidos
+        time.sleep(pausa)
+
+def compactar(paginas=PAGINAS_VACUUM):
+    # Devolve ao sistema até `paginas` páginas livres (o que o arquivamento
+    # apagou). Retorna quantas liberou; 0 se o banco não está em auto_vacuum
+    # incremental ou não há o que liberar
+    if DBManager.consultar_um("PRAGMA auto_vacuum")[0] != 2:
+        return 0
+    livres = DBManager.consultar_um("PRAGMA freelist_count")[0]
+    if not livres:
+        return 0
+    DBManager.consultar(f"PRAGMA incremental_vacuum({min(livres, paginas)})")
+    return livres - DBManager.consultar_um("PRAGMA freelist_count")[0]
+
+def converter_vacuum():
+    # Um banco criado antes do auto_vacuum só muda com um VACUUM completo,
+    # que trava o banco inteiro: rodar com a lanchonete fechada
+    conn = DBManager.conexao()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM main")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("banco", nargs="?", default=servicos.DB_NAME)
+    parser.add_argument("--dias", type=int, default=DIAS, help="arquiva pedidos concluídos há mais dias que isso")
+    parser.add_argument("--lote", type=int, default=LOTE)
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM completo para ativar o vacuum incremental")
+    args = parser.parse_args()
+
+    servicos.DB_NAME = args.banco
+    DBManager.initialize_database()
+    inicio = time.perf_counter()
+    movidos = arquivar(args.dias, args.lote)
+    print(f"arquivados: {movidos} pedidos e lançamentos avulsos em {time.perf_counter() - inicio:.1f}s "
+          f"(arquivo: {servicos.caminho_arquivo(args.banco)})")
+    if args.vacuum:
+        converter_vacuum()
+        print("VACUUM completo; vacuum incremental ativado")
+    liberadas = 0
+    while True:
+        paginas = compactar()
+        if not paginas:
+            break
+        liberadas += paginas
+    print(f"páginas devolvidas ao sistema: {liberadas}")
+    DBManager.fechar_conexoes()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# Teste de carga da API: sobe o servidor (api.py) num processo separado com um
+# banco temporário e dispara pedidos por várias conexões keep-alive ao mesmo
+# tempo, como vários tablets/totens. Mede pedidos por segundo e latência.
+#
+# Uso: python -m benchmarks.bench_api [--conexoes 32] [--pedidos 5000] [--porta 8765]
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import servicos
+from servicos import DBManager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def requisicao(reader, writer, metodo, caminho, dados=None):
+    corpo = json.dumps(dados).encode("utf-8") if dados is not None else b""
+    writer.write(f"{metodo} {caminho} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n\r\n".encode("latin-1") + corpo)
+    status = int((await reader.readline()).split()[1])
+    tamanho = 0
+    while True:
+        cabecalho = await reader.readline()
+        if cabecalho == b"\r\n":
+            break
+        nome, _, valor = cabecalho.decode("latin-1").partition(":")
+        if nome.lower() == "content-length":
+            tamanho = int(valor)
+    return status, json.loads(await reader.readexactly(tamanho))
+
+
+async def cliente(porta, numero, n_pedidos, n_produtos, latencias, status):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    for i in range(n_pedidos):
+        itens = [{"produto_id": 1 + (numero + i) % n_produtos, "quantidade": 1},
+                 {"produto_id": 1 + (numero + i + 1) % n_produtos, "quantidade": 2}]
+        inicio = time.perf_counter()
+        codigo, _ = await requisicao(reader, writer, "POST", "/pedidos", {"cliente": f"Totem {numero}", "itens": itens})
+        latencias.append(time.perf_counter() - inicio)
+        status[codigo] = status.get(codigo, 0) + 1
+    writer.close()
+
+
+async def aguardar_servidor(porta, processo):
+    for _ in range(100):
+        if processo.poll() is not None:
+            raise SystemExit("O servidor da API terminou antes de aceitar conexões.")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", porta)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise SystemExit("O servidor da API não respondeu a tempo.")
+
+
+async def carga(args, processo):
+    await aguardar_servidor(args.porta, processo)
+    latencias = []
+    status = {}
+    por_conexao = args.pedidos // args.conexoes
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(args.porta, n, por_conexao, args.produtos, latencias, status)
+                           for n in range(args.conexoes)))
+    return time.perf_counter() - inicio, latencias, status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conexoes", type=int, default=32)
+    parser.add_argument("--pedidos", type=int, default=5000)
+    parser.add_argument("--produtos", type=int, default=50)
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--meta", type=float, default=500, help="pedidos/s mínimos esperados")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    banco = os.path.join(pasta, "api.db")
+    servicos.DB_NAME = banco
+    DBManager.initialize_database()
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO produtos (nome, quantidade, preco_centavos) VALUES (?, ?, ?)",
+                           ((f"Produto {i}", 10 ** 9, 1000) for i in range(args.produtos)))
+    DBManager.fechar_conexoes()
+
+    processo = subprocess.Popen([sys.executable, os.path.join(RAIZ, "api.py"), "--porta", str(args.porta),
+                                 "--banco", banco], stdout=subprocess.DEVNULL)
+    try:
+        duracao, latencias, status = asyncio.run(carga(args, processo))
+    finally:
+        processo.terminate()
+        processo.wait()
+
+    total = len(latencias)
+    vazao = total / duracao
+    latencias.sort()
+    print(f"{total} pedidos em {duracao:.2f} s por {args.conexoes} conexões: {vazao:.0f} pedidos/s")
+    print(f"latência mediana {statistics.median(latencias) * 1000:.1f} ms, "
+          f"p95 {latencias[int(total * 0.95)] * 1000:.1f} ms, máx {latencias[-1] * 1000:.1f} ms")
+    print(f"respostas: {dict(sorted(status.items()))}")
+
+    gravados = DBManager.consultar_um("SELECT COUNT(*) FROM pedidos")[0]
+    print(f"pedidos gravados no banco: {gravados}")
+    sys.exit(0 if vazao >= args.meta and gravados == status.get(201, 0) == total else 1)
+
+
+if __name__ == "__main__":
+    main()
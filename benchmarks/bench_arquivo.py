@@ -0,0 +1,88 @@
+# Caminhos quentes (Kanban, venda, caixa do dia, primeira página do
+# histórico) sobre bancos sintéticos com 1, 2 e 4 anos de movimento, antes e
+# depois de mandar os pedidos concluídos antigos para o arquivo morto. Com o
+# arquivo, os tempos e o tamanho do banco do dia a dia devem ficar iguais de
+# uma coluna para a outra, seja qual for o tamanho do histórico.
+#
+# Uso: python -m benchmarks.bench_arquivo [--anos 1 2 4] [--pedidos-por-ano 30000] [--repeticoes 50]
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import date
+
+import arquivamento
+from benchmarks import gerar_dados
+from benchmarks.suite import medir
+from servicos import DBManager, ProdutoCatalog, RelatorioCaixa, ServicoPedidos
+
+HISTORICO = ("SELECT id, cliente, status, data_hora, itens FROM todos_pedidos "
+             "ORDER BY data_hora DESC, id DESC LIMIT 200")
+
+
+def caminhos_quentes(repeticoes):
+    hoje = date.today().isoformat()
+    ProdutoCatalog.sincronizar()
+    produtos = sorted(ProdutoCatalog.todos(), key=lambda p: -p.quantidade)[:2]
+    carrinho = [(produtos[0], 1), (produtos[1], 1)]
+
+    def venda_completa():
+        pedido_id = ServicoPedidos.finalizar("Benchmark", carrinho)
+        status = "Aberto"
+        while status != "Concluído":
+            status = ServicoPedidos.avancar(pedido_id, status)
+
+    casos = {
+        "pedidos.abertos": ServicoPedidos.pedidos_abertos,
+        "venda.finalizar_ate_concluir": venda_completa,
+        "relatorio.detalhes.dia": lambda: RelatorioCaixa.detalhes(hoje, hoje),
+        "relatorio.texto.dia": lambda: RelatorioCaixa.texto(hoje),
+        "historico.primeira_pagina": lambda: DBManager.consultar(HISTORICO),
+    }
+    return {nome: medir(funcao, repeticoes)["mediana_ms"] for nome, funcao in casos.items()}
+
+
+def tamanho_mb(banco):
+    return sum(os.path.getsize(caminho) for caminho in (banco, f"{banco}-wal") if os.path.exists(caminho)) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--anos", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--pedidos-por-ano", type=int, default=30_000)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    parser.add_argument("--dias", type=int, default=arquivamento.DIAS, help="idade mínima para arquivar")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    resultados = {}
+    try:
+        for anos in args.anos:
+            banco = os.path.join(pasta, f"{anos}-anos.db")
+            inicio = time.perf_counter()
+            gerar_dados.gerar(banco, 100, args.pedidos_por_ano * anos, 365 * anos)
+            print(f"{anos} ano(s): {args.pedidos_por_ano * anos} pedidos gerados em {time.perf_counter() - inicio:.1f}s",
+                  flush=True)
+            sem_arquivo = caminhos_quentes(args.repeticoes)
+            sem_arquivo["banco_mb"] = tamanho_mb(banco)
+
+            inicio = time.perf_counter()
+            movidos = arquivamento.arquivar(args.dias, pausa=0)
+            arquivamento.converter_vacuum()
+            print(f"  arquivados {movidos} pedidos e despesas em {time.perf_counter() - inicio:.1f}s", flush=True)
+            com_arquivo = caminhos_quentes(args.repeticoes)
+            com_arquivo["banco_mb"] = tamanho_mb(banco)
+            resultados[anos] = (sem_arquivo, com_arquivo)
+            DBManager.fechar_conexoes()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    colunas = [f"{anos} ano(s)" for anos in resultados]
+    print(f"\n{'mediana (ms) sem arquivo / com arquivo':40}" + "".join(f"{coluna:>18}" for coluna in colunas))
+    for caso in next(iter(resultados.values()))[0]:
+        print(f"{caso:40}" + "".join(f"{sem[caso]:>8.2f} / {com[caso]:<7.2f}" for sem, com in resultados.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Tempo por tecla da busca de produtos com um cardápio grande (10 mil itens
+# por padrão): só o ProdutoCatalog.buscar e a tela de venda inteira
+# (busca + atualização da grade).
+#
+# Uso: python -m benchmarks.bench_busca [--produtos 10000]
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+import servicos
+from estoque_app import DBAssincrono, VendaProdutos
+from servicos import DBManager, ProdutoCatalog
+
+BASES = ["Pão de Queijo", "X-Burger", "X-Bacon", "Coxinha", "Pastel", "Açaí", "Suco de Laranja",
+         "Refrigerante", "Misto Quente", "Café com Leite", "Tapioca", "Pudim", "Brigadeiro", "Esfiha"]
+VARIANTES = ["Tradicional", "Especial", "Duplo", "Grande", "Médio", "Pequeno", "Light", "Caseiro", "Gourmet"]
+CATEGORIAS = ["Salgados", "Lanches", "Bebidas", "Doces", "Porções"]
+DIGITADOS = ["pao de q", "x-bac", "acai gra", "suco la", "cafe", "brig gour", "esfiha esp", "zzz"]
+
+
+def gerar_produtos(n, seed=42):
+    aleatorio = random.Random(seed)
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO produtos (nome, quantidade, preco_centavos, categoria) VALUES (?, ?, ?, ?)",
+                           ((f"{aleatorio.choice(BASES)} {aleatorio.choice(VARIANTES)} {i}",
+                             aleatorio.randint(0, 100), aleatorio.randint(200, 4000),
+                             aleatorio.choice(CATEGORIAS)) for i in range(n)))
+
+
+def teclas(texto):
+    # Cada prefixo do texto, como se fosse digitado letra a letra
+    return [texto[:i] for i in range(1, len(texto) + 1)]
+
+
+def resumo(nome, tempos):
+    tempos = sorted(tempos)
+    print(f"{nome:<34} mediana {statistics.median(tempos) * 1000:6.2f}ms  "
+          f"p95 {tempos[int(len(tempos) * 0.95) - 1] * 1000:6.2f}ms  máx {tempos[-1] * 1000:6.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", type=int, default=10000)
+    args = parser.parse_args()
+
+    servicos.DB_NAME = os.path.join(tempfile.mkdtemp(), "busca.db")
+    DBManager.initialize_database()
+    gerar_produtos(args.produtos)
+
+    inicio = time.perf_counter()
+    ProdutoCatalog.sincronizar()
+    print(f"catálogo com {args.produtos} produtos carregado em {(time.perf_counter() - inicio) * 1000:.0f}ms")
+
+    tempos = []
+    for texto in DIGITADOS:
+        for parcial in teclas(texto):
+            inicio = time.perf_counter()
+            ProdutoCatalog.buscar(parcial)
+            tempos.append(time.perf_counter() - inicio)
+    resumo("ProdutoCatalog.buscar", tempos)
+
+    tempos = []
+    for texto in DIGITADOS:
+        for parcial in teclas(texto):
+            inicio = time.perf_counter()
+            ProdutoCatalog.buscar(parcial, "Bebidas")
+            tempos.append(time.perf_counter() - inicio)
+    resumo("ProdutoCatalog.buscar + categoria", tempos)
+
+    app = QApplication(sys.argv)
+    venda = VendaProdutos(None)
+    venda.show()
+    venda.iniciar_novo_pedido()
+    DBAssincrono.aguardar()
+    tempos = []
+    for texto in DIGITADOS:
+        for parcial in teclas(texto):
+            inicio = time.perf_counter()
+            venda.busca.setText(parcial)
+            app.processEvents()
+            tempos.append(time.perf_counter() - inicio)
+        venda.busca.clear()
+    resumo("tela de venda (busca + grade)", tempos)
+    venda.close()
+    DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Compara consultas/segundo entre a conexão nova por chamada (implementação
+# antiga do DBManager.execute_query) e a conexão persistente por thread.
+#
+# Uso: python -m benchmarks.bench_conexoes [--n 5000]
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+import servicos
+from servicos import DBManager
+
+
+def execute_query_antigo(query, params=None):
+    with sqlite3.connect(servicos.DB_NAME) as conn:
+        cursor = conn.cursor()
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        conn.commit()
+        return cursor.fetchall()
+
+
+def popular(n_produtos):
+    DBManager.initialize_database()
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO produtos (nome, quantidade, preco_centavos) VALUES (?, ?, ?)",
+                           ((f"Produto {i}", 1000, 1000 + i % 7 * 100) for i in range(n_produtos)))
+
+
+def medir(nome, funcao, n):
+    inicio = time.perf_counter()
+    for i in range(n):
+        funcao(i)
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<40} {n / duracao:>12.0f} consultas/s")
+    return n / duracao
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        servicos.DB_NAME = os.path.join(pasta, "bench.db")
+        popular(100)
+
+        leitura = "SELECT id, nome, quantidade, preco_centavos FROM produtos WHERE id = ?"
+        escrita = "UPDATE produtos SET quantidade = quantidade - 1 WHERE id = ?"
+
+        antigo_l = medir("leitura - conexão por chamada", lambda i: execute_query_antigo(leitura, (i % 100 + 1,)), args.n)
+        novo_l = medir("leitura - conexão persistente", lambda i: DBManager.consultar(leitura, (i % 100 + 1,)), args.n)
+        antigo_e = medir("escrita - conexão por chamada", lambda i: execute_query_antigo(escrita, (i % 100 + 1,)), args.n)
+        novo_e = medir("escrita - conexão persistente", lambda i: DBManager.executar(escrita, (i % 100 + 1,)), args.n)
+
+        print(f"\nganho leitura: {novo_l / antigo_l:.1f}x  ganho escrita: {novo_e / antigo_e:.1f}x")
+        DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
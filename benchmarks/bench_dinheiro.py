@@ -0,0 +1,64 @@
+# Contas de dinheiro num período longo: a soma das vendas em float (como o
+# caixa fazia com as colunas REAL) contra a soma em centavos inteiros, e o
+# tempo do relatório de um mês e do período todo. Os totais do relatório
+# têm de bater centavo por centavo com a soma dos lançamentos e dos itens.
+#
+# Uso: python -m benchmarks.bench_dinheiro [--escala media] [--repeticoes 20]
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from benchmarks import gerar_dados
+from benchmarks.suite import medir
+from servicos import DBManager, Dinheiro, RelatorioCaixa
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--escala", choices=gerar_dados.ESCALAS, default="media")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    try:
+        produtos, pedidos, dias = gerar_dados.ESCALAS[args.escala]
+        parametros = gerar_dados.gerar(os.path.join(pasta, "dinheiro.db"), produtos, pedidos, dias)
+        fim = parametros["ate"]
+        inicio = (date.fromisoformat(fim) - timedelta(days=dias - 1)).isoformat()
+        mes = (date.fromisoformat(fim) - timedelta(days=29)).isoformat()
+
+        centavos = [linha[0] for linha in DBManager.consultar(
+            "SELECT valor_centavos FROM todo_fluxo_caixa WHERE tipo = 'Venda' ORDER BY id")]
+        em_float = 0.0
+        for valor in centavos:
+            em_float += valor / 100
+        exato = Dinheiro.somar(centavos)
+        itens = Dinheiro(DBManager.consultar_um("SELECT SUM(quantidade * preco_unit_centavos) FROM todos_pedido_itens")[0])
+        vendas = RelatorioCaixa.totais(inicio, fim)[0]
+        print(f"{len(centavos)} vendas em {dias} dias")
+        print(f"  soma em float:     {em_float!r}")
+        print(f"  soma em centavos:  {exato}")
+        print(f"  itens vendidos:    {itens}")
+        print(f"  relatório:         {vendas}")
+
+        casos = {
+            "relatorio.totais.30_dias": lambda: RelatorioCaixa.totais(mes, fim),
+            "relatorio.totais.periodo_todo": lambda: RelatorioCaixa.totais(inicio, fim),
+            "relatorio.detalhes.30_dias": lambda: RelatorioCaixa.detalhes(mes, fim),
+            "relatorio.texto.30_dias": lambda: RelatorioCaixa.texto(mes, fim),
+        }
+        print()
+        for nome, funcao in casos.items():
+            print(f"{nome:32} {medir(funcao, args.repeticoes)['mediana_ms']:>9.2f} ms")
+        DBManager.fechar_conexoes()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    if not exato == itens == vendas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
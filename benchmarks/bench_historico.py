@@ -0,0 +1,81 @@
+# Abre a tela de histórico sobre um banco sintético grande (1 milhão de
+# pedidos por padrão) e mede o tempo até a primeira página e o custo de rolar.
+#
+# Uso: python -m benchmarks.bench_historico [--pedidos 1000000] [--banco caminho.db]
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+import servicos
+from estoque_app import DBAssincrono, HistoricoPedidos
+from servicos import DBManager
+
+
+def aguardar_pagina(modelo):
+    while modelo.carregando:
+        DBAssincrono.aguardar()
+
+
+def gerar_pedidos(n):
+    # CTE recursiva: gera tudo dentro do SQLite, sem ida e volta pelo Python
+    with DBManager.transacao() as cursor:
+        cursor.execute(
+            """WITH RECURSIVE seq(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < ?)
+               INSERT INTO pedidos (cliente, status, data_hora, itens)
+               SELECT 'Cliente ' || (n % 500),
+                      'Concluído',
+                      strftime('%Y-%m-%d %H:%M:%S', '2023-01-01', '+' || (n * 30) || ' seconds'),
+                      (n % 5 + 1) || 'x X-Burger, 1x Refrigerante'
+               FROM seq""", (n,))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pedidos", type=int, default=1_000_000)
+    parser.add_argument("--banco", help="reaproveita um banco já gerado")
+    args = parser.parse_args()
+
+    if args.banco and os.path.exists(args.banco):
+        servicos.DB_NAME = args.banco
+        DBManager.initialize_database()
+    else:
+        servicos.DB_NAME = args.banco or os.path.join(tempfile.mkdtemp(), "historico.db")
+        DBManager.initialize_database()
+        inicio = time.perf_counter()
+        gerar_pedidos(args.pedidos)
+        print(f"gerados {args.pedidos} pedidos em {time.perf_counter() - inicio:.1f}s")
+
+    app = QApplication(sys.argv)
+    rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    inicio = time.perf_counter()
+    historico = HistoricoPedidos(None)
+    historico.show()
+    aguardar_pagina(historico.modelo_historico)
+    app.processEvents()
+    abrir = time.perf_counter() - inicio
+
+    modelo = historico.modelo_historico
+    inicio = time.perf_counter()
+    for _ in range(50):
+        modelo.fetchMore()
+        aguardar_pagina(modelo)
+    rolar = (time.perf_counter() - inicio) / 50
+
+    rss_depois = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"abrir histórico: {abrir * 1000:.1f}ms")
+    print(f"próxima página ({modelo.TAMANHO_PAGINA} linhas): {rolar * 1000:.2f}ms")
+    print(f"linhas carregadas: {modelo.rowCount()}  memória extra: {(rss_depois - rss_antes) / 1024:.1f}MB")
+    historico.close()
+    DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Importa uma planilha sintética de produtos (100 mil linhas por padrão) num
+# banco vazio e de novo por cima dela (só atualizações), depois exporta
+# produtos, pedidos e caixa. Mede o tempo e a memória máxima do processo,
+# que não deve crescer com o tamanho do arquivo.
+#
+# Uso: python -m benchmarks.bench_importacao [--linhas 100000] [--pedidos 100000]
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import resource
+import time
+
+import servicos
+from benchmarks import gerar_dados
+from importacao import exportar, importar_produtos
+from servicos import DBManager
+
+
+def escrever_planilha(caminho, linhas, semente=7):
+    aleatorio = random.Random(semente)
+    if caminho.endswith(".csv"):
+        with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+            escritor = csv.writer(arquivo, delimiter=";")
+            escritor.writerow(["Código", "Produto", "Estoque", "Preço", "Categoria"])
+            for i in range(linhas):
+                escritor.writerow([f"SKU{i:07d}", f"Produto {i}", aleatorio.randint(0, 500),
+                                   f"{aleatorio.uniform(1, 90):.2f}".replace(".", ","),
+                                   gerar_dados.CATEGORIAS[i % len(gerar_dados.CATEGORIAS)]])
+    else:
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            arquivo.write("[\n")
+            for i in range(linhas):
+                arquivo.write(("," if i else "") + json.dumps(
+                    {"sku": f"SKU{i:07d}", "preco": round(aleatorio.uniform(1, 90), 2)}) + "\n")
+            arquivo.write("]\n")
+
+
+def medir(descricao, funcao, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcao(*args, **kwargs)
+    duracao = time.perf_counter() - inicio
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{descricao}: {duracao:.2f}s, memória máxima do processo {rss:.0f}MB -> {resultado}")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--pedidos", type=int, default=100_000)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    planilha = os.path.join(pasta, "fornecedor.csv")
+    precos = os.path.join(pasta, "precos.json")
+    escrever_planilha(planilha, args.linhas)
+    escrever_planilha(precos, args.linhas)
+    print(f"planilhas: {os.path.getsize(planilha) / 1024 / 1024:.1f}MB (csv), "
+          f"{os.path.getsize(precos) / 1024 / 1024:.1f}MB (json)")
+
+    servicos.DB_NAME = os.path.join(pasta, "importacao.db")
+    DBManager.initialize_database()
+    medir("importar csv em banco vazio (por sku)", importar_produtos, planilha, "sku")
+    medir("importar csv de novo (por nome, só atualiza)", importar_produtos, planilha, "nome")
+    medir("importar json de preços (por sku)", importar_produtos, precos, "sku")
+    medir("exportar produtos csv", exportar, "produtos", os.path.join(pasta, "produtos.csv"))
+    DBManager.fechar_conexoes()
+
+    banco = os.path.join(pasta, "pedidos.db")
+    parametros = gerar_dados.gerar(banco, 200, args.pedidos, 365)
+    inicio = gerar_dados.date.fromisoformat(parametros["ate"]).replace(day=1).isoformat()
+    medir("exportar pedidos do ano csv", exportar, "pedidos", os.path.join(pasta, "pedidos.csv"), "2000-01-01",
+          parametros["ate"])
+    medir("exportar pedidos do mês jsonl", exportar, "pedidos", os.path.join(pasta, "pedidos.jsonl"), inicio,
+          parametros["ate"])
+    medir("exportar caixa do ano json", exportar, "caixa", os.path.join(pasta, "caixa.json"), "2000-01-01",
+          parametros["ate"])
+    DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
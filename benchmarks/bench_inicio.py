@@ -0,0 +1,131 @@
+# Abertura a frio do app e troca de telas. Cada abertura é um processo novo
+# (interpretador, imports, banco, janela) medido do lado de fora até a
+# primeira pintura da janela e até o Kanban terminar de carregar. Depois, no
+# mesmo processo, cada tela é aberta pela primeira vez (montagem) e de novo
+# (vinda da pilha de telas).
+#
+# Uso: python -m benchmarks.bench_inicio [--banco estoque.db] [--aberturas 10] [--repeticoes 50]
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+META_PRIMEIRA_PINTURA_MS = 300
+
+# Roda no processo filho: o mesmo caminho de `python estoque_app.py`, com um
+# filtro de eventos que anota a primeira pintura e um timer que espera o Kanban
+FILHO = '''
+import sys, time
+import servicos
+servicos.DB_NAME = sys.argv[1]
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+import estoque_app
+
+class Marcador(QObject):
+    pintura = None
+
+    def eventFilter(self, objeto, evento):
+        if self.pintura is None and evento.type() == QEvent.Paint:
+            self.pintura = time.time()
+        return False
+
+def conferir():
+    janela = next((w for w in app.topLevelWidgets() if isinstance(w, estoque_app.EstoqueApp)), None)
+    if marcador.pintura and janela and janela.kanban and not janela.kanban.carregando:
+        print(marcador.pintura, time.time(), flush=True)
+        timer.stop()
+        janela.close()
+
+app = QApplication(sys.argv)
+marcador = Marcador()
+app.installEventFilter(marcador)
+timer = QTimer()
+timer.timeout.connect(conferir)
+timer.start(1)
+estoque_app.main()
+'''
+
+
+def abertura(banco):
+    inicio = time.time()
+    saida = subprocess.run([sys.executable, "-c", FILHO, banco], cwd=RAIZ, capture_output=True, text=True, check=True)
+    pintura, pronto = map(float, saida.stdout.split())
+    return (pintura - inicio) * 1000, (pronto - inicio) * 1000
+
+
+def trocas(banco, repeticoes):
+    from PyQt5.QtWidgets import QApplication
+
+    import servicos
+    from benchmarks.suite import esperar_tela, medir
+    from estoque_app import EstoqueApp
+
+    servicos.DB_NAME = banco
+    app = QApplication.instance() or QApplication(sys.argv)
+    janela = EstoqueApp()
+    janela.show()
+    esperar_tela(app)
+    telas = [("kanban", janela.mostrar_kanban), ("venda", janela.mostrar_venda), ("estoque", janela.mostrar_estoque),
+             ("historico", janela.mostrar_historico), ("painel", janela.mostrar_painel)]
+    resultados = {}
+    for nome, mostrar in telas:
+        # A primeira visita monta a tela; o Kanban já foi montado na abertura
+        inicio = time.perf_counter()
+        mostrar()
+        esperar_tela(app)
+        primeira = (time.perf_counter() - inicio) * 1000
+        outra = janela.mostrar_estoque if nome == "kanban" else janela.mostrar_kanban
+
+        def ida_e_volta(mostrar=mostrar, outra=outra):
+            outra()
+            mostrar()
+            app.processEvents()
+        resultados[nome] = (primeira, medir(ida_e_volta, repeticoes)["mediana_ms"] / 2)
+    janela.close()
+    esperar_tela(app)
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--banco", help="banco a copiar para o teste (padrão: um sintético pequeno)")
+    parser.add_argument("--aberturas", type=int, default=10)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    banco = os.path.join(pasta, "inicio.db")
+    try:
+        if args.banco:
+            shutil.copy(args.banco, banco)
+        else:
+            subprocess.run([sys.executable, "-m", "benchmarks.gerar_dados", banco, "--escala", "pequena"],
+                           cwd=RAIZ, check=True, capture_output=True)
+        # A primeira abertura migra o banco e aquece o cache de disco: fica fora da conta
+        abertura(banco)
+        medidas = [abertura(banco) for _ in range(args.aberturas)]
+        pinturas, prontos = zip(*medidas)
+        print(f"abertura a frio ({args.aberturas}x, processo novo):")
+        print(f"  primeira pintura: mediana {statistics.median(pinturas):.0f}ms, máx {max(pinturas):.0f}ms "
+              f"(meta {META_PRIMEIRA_PINTURA_MS}ms)")
+        print(f"  Kanban carregado: mediana {statistics.median(prontos):.0f}ms, máx {max(prontos):.0f}ms")
+
+        print(f"\n{'tela':12} {'1ª visita ms':>13} {'troca ms':>9}")
+        for nome, (primeira, troca) in trocas(banco, args.repeticoes).items():
+            print(f"{nome:12} {primeira:>13.1f} {troca:>9.2f}")
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    if statistics.median(pinturas) > META_PRIMEIRA_PINTURA_MS:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Mede o maior intervalo entre quadros da interface enquanto outro terminal
+# segura o lock de escrita do banco, comparando uma escrita feita direto na
+# thread da interface com a mesma escrita pelo DBAssincrono.
+#
+# Uso: python -m benchmarks.bench_latencia_ui [--lock 1.0]
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication
+
+import servicos
+from estoque_app import DBAssincrono
+from servicos import DBManager
+
+QUADRO_MS = 16
+
+
+def segurar_lock(banco, segundos, pronto):
+    conn = sqlite3.connect(banco, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    pronto.set()
+    time.sleep(segundos)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def medir(app, banco, segundos, escrever):
+    quadros = []
+    timer = QTimer()
+    timer.timeout.connect(lambda: quadros.append(time.perf_counter()))
+    timer.start(QUADRO_MS)
+
+    pronto = threading.Event()
+    outro_terminal = threading.Thread(target=segurar_lock, args=(banco, segundos, pronto))
+    outro_terminal.start()
+    pronto.wait()
+
+    concluido = []
+    QTimer.singleShot(50, lambda: escrever(concluido))
+    fim = time.perf_counter() + segundos + 0.5
+    while time.perf_counter() < fim or not concluido:
+        app.processEvents()
+        time.sleep(0.001)
+    timer.stop()
+    outro_terminal.join()
+
+    intervalos = [b - a for a, b in zip(quadros, quadros[1:])]
+    return max(intervalos) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lock", type=float, default=1.0, help="segundos com o lock de escrita preso")
+    args = parser.parse_args()
+
+    banco = os.path.join(tempfile.mkdtemp(), "latencia.db")
+    servicos.DB_NAME = banco
+    DBManager.initialize_database()
+    app = QApplication(sys.argv)
+
+    despesa = ("INSERT INTO fluxo_caixa (data, tipo, valor_centavos) VALUES (?, ?, ?)", ("2024-01-01", "Despesa: teste", 100))
+
+    def sincrono(concluido):
+        DBManager.executar(*despesa)
+        concluido.append(True)
+
+    def assincrono(concluido):
+        DBAssincrono.executar(DBManager.executar, *despesa, ao_concluir=concluido.append)
+
+    print(f"quadro alvo: {QUADRO_MS}ms, lock de escrita preso por {args.lock:.1f}s")
+    print(f"maior intervalo - escrita na thread da interface: {medir(app, banco, args.lock, sincrono):8.1f}ms")
+    print(f"maior intervalo - escrita pelo DBAssincrono:      {medir(app, banco, args.lock, assincrono):8.1f}ms")
+    DBAssincrono.aguardar()
+    DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
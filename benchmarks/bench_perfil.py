@@ -0,0 +1,82 @@
+# Custo da instrumentação (perfil.Perfil): roda a mesma mistura de consultas e
+# vendas com o perfil ligado e desligado, alternando as rodadas, e mede
+# quantas medições o app registra parado (só o MonitorBanco rodando).
+#
+# Uso: python -m benchmarks.bench_perfil [--rodadas 15] [--pedidos 20000]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks import gerar_dados
+from estoque_app import DBAssincrono, EstoqueApp
+from perfil import Perfil
+from servicos import DBManager, ProdutoCatalog, RelatorioCaixa, ServicoPedidos, VERSOES_CATALOGO
+
+
+def mistura(parametros):
+    # O que um caixa e a cozinha fazem num minuto de movimento
+    hoje = parametros["ate"]
+    ProdutoCatalog.sincronizar()
+    produtos = sorted(ProdutoCatalog.todos(), key=lambda p: -p.quantidade)[:2]
+
+    def rodada():
+        for _ in range(20):
+            pedido_id = ServicoPedidos.finalizar("Perfil", [(produtos[0], 1), (produtos[1], 2)])
+            ServicoPedidos.avancar(pedido_id)
+            ProdutoCatalog.sincronizar()
+            ProdutoCatalog.buscar("x")
+            ServicoPedidos.alteracoes_desde(pedido_id - 5)
+            DBManager.consultar_um(VERSOES_CATALOGO)
+        ServicoPedidos.pedidos_abertos()
+        RelatorioCaixa.texto(hoje)
+        DBManager.consultar("SELECT id, nome, quantidade, preco_centavos, categoria FROM produtos ORDER BY id")
+    return rodada
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rodadas", type=int, default=15)
+    parser.add_argument("--pedidos", type=int, default=20_000)
+    parser.add_argument("--parado", type=float, default=2.0, help="segundos com o app parado")
+    args = parser.parse_args()
+
+    banco = os.path.join(tempfile.mkdtemp(), "perfil.db")
+    parametros = gerar_dados.gerar(banco, 100, args.pedidos, 60)
+    rodada = mistura(parametros)
+    rodada()
+
+    tempos = {True: [], False: []}
+    for i in range(args.rodadas * 2):
+        Perfil.ativo = i % 2 == 0
+        inicio = time.perf_counter()
+        rodada()
+        tempos[Perfil.ativo].append(time.perf_counter() - inicio)
+    Perfil.ativo = True
+    ligado, desligado = statistics.median(tempos[True]), statistics.median(tempos[False])
+    print(f"rodada com perfil: {ligado * 1000:.2f} ms, sem perfil: {desligado * 1000:.2f} ms, "
+          f"custo {(ligado / desligado - 1) * 100:+.2f}%")
+
+    app = QApplication(sys.argv)
+    janela = EstoqueApp()
+    janela.show()
+    while not DBAssincrono.ocioso():
+        DBAssincrono.aguardar()
+    Perfil.limpar()
+    fim = time.perf_counter() + args.parado
+    while time.perf_counter() < fim:
+        app.processEvents()
+        time.sleep(0.01)
+    print(f"medições registradas com o app parado por {args.parado:.0f}s: {len(Perfil.medicoes())}")
+    janela.close()
+    DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
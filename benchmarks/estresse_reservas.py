@@ -0,0 +1,146 @@
+# Teste de estresse das reservas de estoque: vários processos, cada um um
+# terminal, enchem carrinhos disputando poucos produtos com pouco estoque e
+# então finalizam, cancelam ou abandonam o carrinho (que vence sozinho); no
+# meio, vendas de balcão sem reserva disputam o mesmo estoque.
+# Enquanto rodam, este processo confere que produtos.reservado bate com a
+# soma das reservas; no fim, que nada foi vendido além do estoque e que
+# nenhum carrinho com reserva em dia deixou de fechar a venda.
+#
+# Uso: python -m benchmarks.estresse_reservas [--terminais 6] [--carrinhos 300] [--produtos 5] [--estoque 30]
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+import servicos
+from servicos import DBManager, EstoqueInsuficiente, ProdutoCatalog, RESERVA_MINUTOS, ServicoPedidos, ServicoReservas
+
+VERIFICAR_RESERVADO = '''SELECT COUNT(*) FROM produtos
+    WHERE reservado != (SELECT COALESCE(SUM(quantidade), 0) FROM reservas WHERE produto_id = produtos.id)
+       OR quantidade < 0'''
+
+
+def terminal(banco, numero, n_carrinhos, validade):
+    servicos.DB_NAME = banco
+    aleatorio = random.Random(numero)
+    ProdutoCatalog.sincronizar()
+    produtos = ProdutoCatalog.todos()
+    contagem = {"reservas": 0, "recusadas": 0, "vendas": 0, "vendas_recusadas": 0, "balcao": 0,
+                "balcao_recusadas": 0, "canceladas": 0, "abandonadas": 0, "unidades": 0}
+    for _ in range(n_carrinhos):
+        carrinho = uuid.uuid4().hex
+        destino = aleatorio.random()
+        if destino < 0.1:
+            # Venda de balcão: só pode levar o que não está reservado
+            itens = [(produto, aleatorio.randint(1, 4)) for produto in aleatorio.sample(produtos, 1)]
+            try:
+                ServicoPedidos.finalizar(f"t{numero}", itens)
+                contagem["balcao"] += 1
+                contagem["unidades"] += itens[0][1]
+            except EstoqueInsuficiente:
+                contagem["balcao_recusadas"] += 1
+            continue
+        # Só o carrinho que vai ser abandonado tem reserva curta
+        minutos = validade / 60 if destino >= 0.85 else RESERVA_MINUTOS
+        itens = {}
+        for produto in aleatorio.sample(produtos, aleatorio.randint(1, min(3, len(produtos)))):
+            quantidade = aleatorio.randint(1, 4)
+            try:
+                ServicoReservas.reservar(carrinho, produto.id, quantidade, minutos)
+                itens[produto.id] = (produto, quantidade)
+                contagem["reservas"] += 1
+            except EstoqueInsuficiente:
+                contagem["recusadas"] += 1
+        if not itens:
+            continue
+        # O caixa ainda pergunta o nome do cliente antes de fechar a venda
+        time.sleep(aleatorio.uniform(0, 0.004))
+        if destino < 0.6:
+            try:
+                ServicoPedidos.finalizar(f"t{numero}", list(itens.values()), carrinho)
+                contagem["vendas"] += 1
+                contagem["unidades"] += sum(q for _, q in itens.values())
+            except EstoqueInsuficiente:
+                # Outro terminal vendeu o que este carrinho tinha reservado
+                contagem["vendas_recusadas"] += 1
+                ServicoReservas.liberar(carrinho)
+        elif destino < 0.85:
+            ServicoReservas.liberar(carrinho)
+            contagem["canceladas"] += 1
+        else:
+            contagem["abandonadas"] += 1
+    DBManager.fechar_conexoes()
+    return contagem
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--terminais", type=int, default=6)
+    parser.add_argument("--carrinhos", type=int, default=300, help="carrinhos por terminal")
+    parser.add_argument("--produtos", type=int, default=5)
+    parser.add_argument("--estoque", type=int, default=30)
+    parser.add_argument("--validade", type=float, default=0.2, help="segundos até vencer a reserva abandonada")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    banco = os.path.join(pasta, "reservas.db")
+    servicos.DB_NAME = banco
+    DBManager.initialize_database()
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO produtos (nome, quantidade, preco_centavos) VALUES (?, ?, ?)",
+                           ((f"Produto {i}", args.estoque, 1000) for i in range(args.produtos)))
+
+    contexto = multiprocessing.get_context("spawn")
+    inicio = time.perf_counter()
+    with contexto.Pool(args.terminais) as pool:
+        resultado = pool.starmap_async(terminal, [(banco, n, args.carrinhos, args.validade)
+                                                  for n in range(args.terminais)])
+        # Amostras do meio da disputa, cada uma num instante consistente do banco
+        amostras = divergencias = 0
+        while not resultado.ready():
+            with DBManager.leitura() as cursor:
+                divergencias += cursor.execute(VERIFICAR_RESERVADO).fetchone()[0]
+            amostras += 1
+            time.sleep(0.01)
+        contagens = resultado.get()
+    duracao = time.perf_counter() - inicio
+
+    total = {chave: sum(c[chave] for c in contagens) for chave in contagens[0]}
+    operacoes = sum(total.values()) - total["abandonadas"] - total["unidades"]
+    print(f"{args.terminais} terminais, {args.carrinhos} carrinhos cada, {args.produtos} produtos com {args.estoque} "
+          f"unidades: {operacoes} operações em {duracao:.1f}s ({operacoes / duracao:.0f}/s)")
+    print("  " + ", ".join(f"{chave}: {valor}" for chave, valor in total.items()))
+
+    time.sleep(args.validade)
+    ServicoReservas.expirar()
+    vendido = dict(DBManager.consultar("SELECT produto_id, SUM(quantidade) FROM pedido_itens GROUP BY produto_id"))
+    falhas = []
+    if not total["recusadas"] + total["balcao_recusadas"]:
+        # Estoque que sobra para todo mundo não testa a disputa
+        falhas.append("nenhuma reserva ou venda de balcão recusada: diminua --estoque")
+    if total["vendas_recusadas"]:
+        falhas.append(f"{total['vendas_recusadas']} carrinhos com reserva não conseguiram fechar a venda")
+    if divergencias:
+        falhas.append(f"reservado diferente da soma das reservas em {divergencias} de {amostras} amostras")
+    for produto_id, nome, quantidade, reservado in DBManager.consultar("SELECT id, nome, quantidade, reservado FROM produtos"):
+        if quantidade < 0 or quantidade + vendido.get(produto_id, 0) != args.estoque:
+            falhas.append(f"{nome}: estoque {quantidade}, vendido {vendido.get(produto_id, 0)} de {args.estoque}")
+        if reservado:
+            falhas.append(f"{nome}: {reservado} unidades ainda reservadas depois de tudo vencer")
+    if sum(vendido.values()) != total["unidades"]:
+        falhas.append(f"terminais venderam {total['unidades']} unidades, pedidos somam {sum(vendido.values())}")
+    print(f"  {amostras} amostras durante a disputa; vendido {sum(vendido.values())} de "
+          f"{args.estoque * args.produtos} unidades")
+    DBManager.fechar_conexoes()
+    if falhas:
+        print("FALHOU:\n  " + "\n  ".join(falhas))
+        sys.exit(1)
+    print("OK: nenhuma venda além do estoque e reservado sempre igual à soma das reservas")
+
+
+if __name__ == "__main__":
+    main()
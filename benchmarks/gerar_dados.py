@@ -0,0 +1,156 @@
+# Gera um banco sintético reproduzível (mesma semente, mesmos dados) com
+# produtos, pedidos, itens e lançamentos de caixa na escala pedida. Os
+# pedidos vão até a data final (hoje, por padrão), para que Kanban, histórico
+# e relatório do dia tenham o que mostrar; os mais recentes ficam em aberto.
+# Cada pedido ganha o histórico de status até o status atual, com tempos de
+# espera e preparo sorteados, para o painel da cozinha.
+#
+# Uso: python -m benchmarks.gerar_dados saida.db [--escala media] [--semente 42]
+#      python -m benchmarks.gerar_dados saida.db --pedidos 250000 --produtos 300 --dias 400
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import servicos
+from perfil import Perfil
+from servicos import DBManager, PROXIMO_STATUS, STATUS_KANBAN
+
+# produtos, pedidos, dias de movimento
+ESCALAS = {
+    "pequena": (50, 1_000, 30),
+    "media": (200, 100_000, 365),
+    "grande": (500, 1_000_000, 3 * 365),
+}
+CATEGORIAS = ("Lanches", "Bebidas", "Salgados", "Doces", "Porções", "Combos")
+NOMES = ("X-Burger", "X-Salada", "X-Bacon", "Misto Quente", "Coxinha", "Pastel", "Pão de Queijo", "Esfiha",
+         "Refrigerante", "Suco", "Água", "Café", "Brigadeiro", "Pudim", "Açaí", "Batata Frita", "Combo")
+VARIACOES = ("", "Especial", "Duplo", "Grande", "Pequeno", "Light", "da Casa", "Artesanal")
+CLIENTES = ("Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Heitor", "Isabela", "João")
+DESPESAS = ("Gás", "Pães", "Carnes", "Bebidas", "Embalagens", "Limpeza", "Energia", "Manutenção")
+# Muda quando o gerador passa a gravar algo novo, para caches de bancos gerados
+VERSAO = 4
+LOTE = 10_000
+ABERTOS = 60
+ESTOQUE_MAXIMO = 1_000_000
+# Segundos (mínimo, máximo) em cada status antes do próximo
+TEMPOS_STATUS = {"Aberto": (30, 600), "Em Andamento": (120, 900), "Finalizado": (30, 300)}
+
+
+def gerar_produtos(aleatorio, n):
+    for i in range(n):
+        nome = f"{NOMES[i % len(NOMES)]} {VARIACOES[(i // len(NOMES)) % len(VARIACOES)]}".strip()
+        if i >= len(NOMES) * len(VARIACOES):
+            nome = f"{nome} {i}"
+        yield (nome, aleatorio.randint(ESTOQUE_MAXIMO // 2, ESTOQUE_MAXIMO),
+               aleatorio.randint(200, 4500), CATEGORIAS[i % len(CATEGORIAS)])
+
+
+def gerar_eventos(aleatorio, pedido_id, momento, status):
+    # Do Aberto até o status atual, cada passo depois de um tempo sorteado
+    eventos = [(pedido_id, "Aberto", momento.strftime("%Y-%m-%d %H:%M:%S"))]
+    atual = "Aberto"
+    while atual != status:
+        momento += timedelta(seconds=aleatorio.randint(*TEMPOS_STATUS[atual]))
+        atual = PROXIMO_STATUS[atual]
+        eventos.append((pedido_id, atual, momento.strftime("%Y-%m-%d %H:%M:%S")))
+    return eventos
+
+
+def gerar_pedidos(aleatorio, produtos, n, dias, ate, primeiro_id):
+    # Um pedido por vez, em ordem cronológica; devolve as linhas das quatro
+    # tabelas juntas para o chamador gravar em lotes. Os tempos da cozinha
+    # têm sorteio próprio, para os demais dados não mudarem com eles
+    cozinha = random.Random(aleatorio.getrandbits(64))
+    inicio = datetime.combine(ate - timedelta(days=dias - 1), datetime.min.time()) + timedelta(hours=8)
+    passo = (dias * 86400 - 10 * 3600) / max(n, 1)
+    for i in range(n):
+        pedido_id = primeiro_id + i
+        momento = inicio + timedelta(seconds=i * passo)
+        escolhidos = aleatorio.sample(produtos, aleatorio.randint(1, min(4, len(produtos))))
+        itens = [(produto, aleatorio.randint(1, 3)) for produto in escolhidos]
+        status = STATUS_KANBAN[i % len(STATUS_KANBAN)] if i >= n - ABERTOS else "Concluído"
+        yield (
+            (pedido_id, f"{aleatorio.choice(CLIENTES)} {aleatorio.randint(1, 999)}", status,
+             momento.strftime("%Y-%m-%d %H:%M:%S"), ", ".join(f"{q}x {p[1]}" for p, q in itens)),
+            [(pedido_id, p[0], q, p[2]) for p, q in itens],
+            (momento.strftime("%Y-%m-%d"), "Venda", sum(p[2] * q for p, q in itens), pedido_id),
+            gerar_eventos(cozinha, pedido_id, momento, status),
+        )
+
+
+def gerar_despesas(aleatorio, dias, ate):
+    for dia in range(dias):
+        data = (ate - timedelta(days=dias - 1 - dia)).isoformat()
+        for _ in range(aleatorio.randint(0, 3)):
+            yield (data, f"Despesa: {aleatorio.choice(DESPESAS)}", aleatorio.randint(1000, 40000))
+
+
+def gerar(banco, produtos, pedidos, dias, semente=42, ate=None):
+    # A carga em massa não é o que se quer medir: fica fora do perfil
+    ativo, Perfil.ativo = Perfil.ativo, False
+    try:
+        return _gerar(banco, produtos, pedidos, dias, semente, ate)
+    finally:
+        Perfil.ativo = ativo
+
+
+def _gerar(banco, produtos, pedidos, dias, semente, ate):
+    servicos.DB_NAME = banco
+    DBManager.initialize_database()
+    if DBManager.consultar_um("SELECT COUNT(*) FROM pedidos")[0]:
+        raise SystemExit(f"{banco} já tem pedidos; gere num arquivo novo.")
+    aleatorio = random.Random(semente)
+    ate = ate or date.today()
+
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO produtos (nome, quantidade, preco_centavos, categoria) VALUES (?, ?, ?, ?)",
+                           gerar_produtos(aleatorio, produtos))
+        cadastrados = cursor.execute("SELECT id, nome, preco_centavos FROM produtos ORDER BY id").fetchall()
+        primeiro_id = cursor.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM pedidos").fetchone()[0]
+        cursor.executemany("INSERT INTO fluxo_caixa (data, tipo, valor_centavos) VALUES (?, ?, ?)",
+                           gerar_despesas(aleatorio, dias, ate))
+
+    # Uma transação por lote: o WAL não cresce sem limite nas escalas grandes
+    linhas = gerar_pedidos(aleatorio, cadastrados, pedidos, dias, ate, primeiro_id)
+    while True:
+        lote = [linha for _, linha in zip(range(LOTE), linhas)]
+        if not lote:
+            break
+        with DBManager.transacao() as cursor:
+            cursor.executemany("INSERT INTO pedidos (id, cliente, status, data_hora, itens) VALUES (?, ?, ?, ?, ?)",
+                               (pedido for pedido, _, _, _ in lote))
+            cursor.executemany("INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unit_centavos) "
+                               "VALUES (?, ?, ?, ?)",
+                               (item for _, itens, _, _ in lote for item in itens))
+            cursor.executemany("INSERT INTO fluxo_caixa (data, tipo, valor_centavos, pedido_id) VALUES (?, ?, ?, ?)",
+                               (venda for _, _, venda, _ in lote))
+            cursor.executemany("INSERT INTO pedido_eventos (pedido_id, status, data_hora) VALUES (?, ?, ?)",
+                               (evento for _, _, _, eventos in lote for evento in eventos))
+    # Sem ANALYZE: o app nunca roda, e as estatísticas mudariam os planos
+    # de consulta em relação ao banco de uma lanchonete de verdade
+    DBManager.consultar("PRAGMA wal_checkpoint(TRUNCATE)")
+    return {"produtos": produtos, "pedidos": pedidos, "dias": dias, "semente": semente, "ate": ate.isoformat()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("banco")
+    parser.add_argument("--escala", choices=ESCALAS, default="media")
+    parser.add_argument("--produtos", type=int)
+    parser.add_argument("--pedidos", type=int)
+    parser.add_argument("--dias", type=int)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--ate", type=date.fromisoformat, help="data do último pedido (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    produtos, pedidos, dias = ESCALAS[args.escala]
+    inicio = time.perf_counter()
+    parametros = gerar(args.banco, args.produtos or produtos, args.pedidos or pedidos, args.dias or dias,
+                       args.semente, args.ate)
+    print(f"{args.banco}: {parametros} em {time.perf_counter() - inicio:.1f}s")
+    DBManager.fechar_conexoes()
+
+
+if __name__ == "__main__":
+    main()
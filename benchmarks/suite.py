@@ -0,0 +1,314 @@
+# Suíte de benchmarks da aplicação inteira sobre um banco sintético
+# (benchmarks.gerar_dados): cada caminho de consulta do DBManager, os
+# serviços usados pelas telas, o fluxo de venda e o tempo para abrir cada
+# tela com Qt offscreen. O resultado vai para JSON e pode ser comparado com
+# o de outro commit.
+#
+# Uso: python -m benchmarks.suite [--escala media] [--cache pasta] [--saida resultado.json]
+#                                 [--comparar base.json] [--limiar 20] [--minimo-ms 0.5]
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication
+
+import analise
+import servicos
+from benchmarks import gerar_dados
+from estoque_app import DBAssincrono, EstoqueApp, ModeloPaginado
+from servicos import DBManager, ProdutoCatalog, RelatorioCaixa, ServicoCaixa, ServicoPedidos, VERSOES_CATALOGO
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def medir(funcao, repeticoes, antes=None):
+    # Uma execução de aquecimento, depois `repeticoes` medidas
+    if antes:
+        antes()
+    funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        if antes:
+            antes()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return {
+        "n": repeticoes,
+        "mediana_ms": round(statistics.median(tempos) * 1000, 4),
+        "p95_ms": round(tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))] * 1000, 4),
+        "min_ms": round(tempos[0] * 1000, 4),
+        "max_ms": round(tempos[-1] * 1000, 4),
+    }
+
+
+def consultas(repeticoes, parametros):
+    ate = date.fromisoformat(parametros["ate"])
+    inicio_periodo = (ate - timedelta(days=parametros["dias"] - 1)).isoformat()
+    ultimo_mes = (ate - timedelta(days=29)).isoformat()
+    hoje = ate.isoformat()
+    amanha = (ate + timedelta(days=1)).isoformat()
+    ultima_alteracao = DBManager.consultar_um("SELECT MAX(alteracao_id) FROM pedidos")[0]
+    produto_id = DBManager.consultar_um("SELECT MIN(id) FROM produtos")[0]
+
+    def transacao():
+        with DBManager.transacao() as cursor:
+            cursor.execute("UPDATE produtos SET quantidade = quantidade WHERE id = ?", (produto_id,))
+
+    def leitura():
+        with DBManager.leitura() as cursor:
+            cursor.execute("SELECT versao FROM versoes WHERE tabela = 'produtos'").fetchone()
+            cursor.execute("SELECT id, nome, quantidade, preco_centavos, categoria FROM produtos ORDER BY id").fetchall()
+
+    casos = {
+        "db.consultar.produtos": lambda: DBManager.consultar(
+            "SELECT id, nome, quantidade, preco_centavos, categoria FROM produtos ORDER BY id"),
+        "db.consultar_um.contagem_abertos": lambda: DBManager.consultar_um(
+            "SELECT COUNT(*) FROM pedidos WHERE status = 'Aberto'"),
+        "db.executar.update_autocommit": lambda: DBManager.executar(
+            "UPDATE produtos SET quantidade = quantidade WHERE id = ?", (produto_id,)),
+        "db.transacao.update": transacao,
+        "db.leitura.snapshot_catalogo": leitura,
+        "db.execute_query.select_legado": lambda: DBManager.execute_query("SELECT * FROM produtos"),
+        "db.versoes_catalogo": lambda: DBManager.consultar_um(VERSOES_CATALOGO),
+        "pedidos.abertos": ServicoPedidos.pedidos_abertos,
+        "pedidos.alteracoes_desde.ultimas_100": lambda: ServicoPedidos.alteracoes_desde(ultima_alteracao - 100),
+        "catalogo.sincronizar.em_dia": ProdutoCatalog.sincronizar,
+        "catalogo.buscar.prefixo": lambda: ProdutoCatalog.buscar("x"),
+        "catalogo.buscar.categoria": lambda: ProdutoCatalog.buscar("", "Bebidas"),
+        "relatorio.totais.periodo_todo": lambda: RelatorioCaixa.totais(inicio_periodo, hoje),
+        "relatorio.detalhes.dia": lambda: RelatorioCaixa.detalhes(hoje, hoje),
+        "relatorio.texto.dia": lambda: RelatorioCaixa.texto(hoje),
+        "relatorio.texto.30_dias": lambda: RelatorioCaixa.texto(ultimo_mes, hoje),
+        "analise.painel.dia": lambda: analise.painel(hoje),
+        "analise.tempos_etapas.30_dias": lambda: analise.tempos_etapas(f"{ultimo_mes} 00:00:00", f"{amanha} 00:00:00"),
+    }
+    resultados = {nome: medir(funcao, repeticoes) for nome, funcao in casos.items()}
+    resultados["catalogo.sincronizar.carga_completa"] = medir(ProdutoCatalog.sincronizar, repeticoes,
+                                                              antes=ProdutoCatalog.invalidar)
+    return resultados
+
+
+def venda(repeticoes):
+    # Venda completa como o caixa faz: baixa de estoque, pedido, itens e
+    # caixa numa transação; depois a cozinha avança o pedido até concluir
+    ProdutoCatalog.sincronizar()
+    produtos = sorted(ProdutoCatalog.todos(), key=lambda p: -p.quantidade)[:3]
+    carrinho = [(produtos[0], 2), (produtos[1], 1), (produtos[2], 1)]
+    criados = []
+
+    resultados = {
+        "venda.finalizar": medir(lambda: criados.append(ServicoPedidos.finalizar("Benchmark", carrinho)), repeticoes),
+        "venda.finalizar_ids": medir(lambda: criados.append(ServicoPedidos.finalizar_ids(
+            "Benchmark", [(p.id, q) for p, q in carrinho])), repeticoes),
+    }
+    fila = iter(criados)
+
+    def ciclo_pedido():
+        pedido_id = next(fila)
+        ServicoPedidos.avancar(pedido_id)
+        ServicoPedidos.avancar(pedido_id)
+        ServicoPedidos.concluir(pedido_id)
+    resultados["pedido.avancar_ate_concluir"] = medir(ciclo_pedido, min(repeticoes, len(criados) - 1))
+    resultados["caixa.registrar_despesa"] = medir(lambda: ServicoCaixa.registrar_despesa(1.0, "Benchmark"), repeticoes)
+    return resultados
+
+
+def esperar_tela(app):
+    # A tela está pronta quando nenhuma consulta dela está em andamento
+    app.processEvents()
+    while not DBAssincrono.ocioso():
+        DBAssincrono.aguardar()
+
+
+def telas(repeticoes):
+    app = QApplication.instance() or QApplication(sys.argv)
+    resultados = {}
+
+    janela = None
+
+    def abrir_app():
+        nonlocal janela
+        if janela is not None:
+            janela.close()
+            janela.deleteLater()
+        janela = EstoqueApp()
+        janela.show()
+        esperar_tela(app)
+    resultados["tela.abrir_app"] = medir(abrir_app, repeticoes)
+
+    def abrir(mostrar):
+        def funcao():
+            mostrar()
+            esperar_tela(app)
+        return funcao
+
+    # As telas ficam guardadas depois da primeira visita: mede a troca
+    # vinda de outra tela, que é o que o usuário sente
+    def vindo_do_kanban():
+        janela.mostrar_kanban()
+        esperar_tela(app)
+
+    def vindo_do_estoque():
+        janela.mostrar_estoque()
+        esperar_tela(app)
+
+    def catalogo_frio():
+        vindo_do_kanban()
+        ProdutoCatalog.invalidar()
+
+    resultados["tela.kanban"] = medir(abrir(janela.mostrar_kanban), repeticoes, antes=vindo_do_estoque)
+    resultados["tela.venda.catalogo_frio"] = medir(abrir(janela.mostrar_venda), repeticoes, antes=catalogo_frio)
+    resultados["tela.venda"] = medir(abrir(janela.mostrar_venda), repeticoes, antes=vindo_do_kanban)
+    resultados["tela.estoque"] = medir(abrir(janela.mostrar_estoque), repeticoes, antes=vindo_do_kanban)
+    resultados["tela.historico"] = medir(abrir(janela.mostrar_historico), repeticoes, antes=vindo_do_kanban)
+    resultados["tela.painel_cozinha"] = medir(abrir(janela.mostrar_painel), repeticoes, antes=vindo_do_kanban)
+
+    # Pedido grande de buffet: com 100 linhas no carrinho (ou o cardápio
+    # todo, na escala pequena), pôr mais uma e mudar a quantidade de uma
+    # linha só redesenham a linha afetada
+    janela.mostrar_venda()
+    esperar_tela(app)
+    ProdutoCatalog.sincronizar()
+    produtos = ProdutoCatalog.todos()[:101]
+    for produto in produtos[:-1]:
+        janela.carrinho.definir(produto, 1)
+    app.processEvents()
+    ultimo = produtos[-1]
+    meio = produtos[len(produtos) // 2]
+
+    def linha_nova():
+        janela.carrinho.definir(ultimo, 1)
+        app.processEvents()
+
+    def quantidade_nova():
+        janela.carrinho.definir(meio, janela.carrinho.quantidade(meio.id) % 9 + 1)
+        app.processEvents()
+    resultados["tela.venda.carrinho_100_linhas"] = medir(linha_nova, repeticoes,
+                                                         antes=lambda: janela.carrinho.definir(ultimo, 0))
+    resultados["tela.venda.carrinho_alterar_linha"] = medir(quantidade_nova, repeticoes)
+    janela.carrinho.limpar()
+
+    modelo = ModeloPaginado(["ID", "Cliente", "Status", "Data/Hora", "Itens"],
+                            "SELECT id, cliente, status, data_hora, itens FROM todos_pedidos",
+                            ("data_hora", "id"), (3, 0), descendente=True)
+    meio = DBManager.consultar_um("SELECT id, cliente, status, data_hora, itens FROM pedidos "
+                                  "WHERE id = (SELECT MAX(id) / 2 FROM pedidos)")
+    resultados["historico.pagina.primeira"] = medir(lambda: modelo.buscar_pagina(None), repeticoes)
+    resultados["historico.pagina.meio"] = medir(lambda: modelo.buscar_pagina(meio), repeticoes)
+
+    janela.close()
+    esperar_tela(app)
+    return resultados
+
+
+def commit_atual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def preparar_banco(args):
+    # O banco gerado fica em cache por escala/semente/data; cada execução
+    # mede uma cópia, para as vendas de uma rodada não afetarem a próxima
+    produtos, pedidos, dias = gerar_dados.ESCALAS[args.escala]
+    parametros = {"produtos": produtos, "pedidos": pedidos, "dias": dias, "semente": args.semente,
+                  "ate": (args.ate or date.today()).isoformat()}
+    os.makedirs(args.cache, exist_ok=True)
+    base = os.path.join(args.cache, f"{args.escala}-{args.semente}-{parametros['ate']}-v{gerar_dados.VERSAO}.db")
+    if not os.path.exists(base):
+        inicio = time.perf_counter()
+        temporario = base + ".gerando"
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        gerar_dados.gerar(temporario, produtos, pedidos, dias, args.semente, date.fromisoformat(parametros["ate"]))
+        DBManager.fechar_conexoes()
+        os.replace(temporario, base)
+        print(f"banco {args.escala} gerado em {time.perf_counter() - inicio:.1f}s: {base}", file=sys.stderr)
+    copia = os.path.join(tempfile.mkdtemp(), "suite.db")
+    shutil.copyfile(base, copia)
+    return copia, parametros
+
+
+def comparar(base, atual, limiar, minimo_ms):
+    # Compara medianas; volta a lista de casos que ficaram mais lentos que o
+    # limiar. Diferenças abaixo de minimo_ms são ruído de medição
+    regressoes = []
+    print(f"{'caso':45} {'base ms':>10} {'atual ms':>10} {'variação':>9}")
+    for nome, resultado in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if anterior is None:
+            print(f"{nome:45} {'-':>10} {resultado['mediana_ms']:>10.3f}")
+            continue
+        variacao = (resultado["mediana_ms"] / anterior["mediana_ms"] - 1) * 100 if anterior["mediana_ms"] else 0
+        marca = ""
+        if variacao > limiar and resultado["mediana_ms"] - anterior["mediana_ms"] >= minimo_ms:
+            marca = "  REGRESSÃO"
+            regressoes.append(nome)
+        print(f"{nome:45} {anterior['mediana_ms']:>10.3f} {resultado['mediana_ms']:>10.3f} {variacao:>+8.1f}%{marca}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--escala", choices=gerar_dados.ESCALAS, default="media")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--ate", type=date.fromisoformat, help="data do último pedido gerado (AAAA-MM-DD)")
+    parser.add_argument("--cache", default=os.path.join(tempfile.gettempdir(), "lanchonete-bench"))
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--repeticoes-telas", type=int, default=5)
+    parser.add_argument("--sem-telas", action="store_true")
+    parser.add_argument("--saida", help="arquivo JSON com os resultados (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limiar", type=float, default=20, help="%% de piora na mediana considerado regressão")
+    parser.add_argument("--minimo-ms", type=float, default=0.5, help="piora absoluta mínima para contar como regressão")
+    args = parser.parse_args()
+
+    banco, parametros = preparar_banco(args)
+    servicos.DB_NAME = banco
+    DBManager.initialize_database()
+
+    resultados = consultas(args.repeticoes, parametros)
+    if not args.sem_telas:
+        resultados.update(telas(args.repeticoes_telas))
+    resultados.update(venda(args.repeticoes))
+    DBManager.fechar_conexoes()
+
+    relatorio = {
+        "commit": commit_atual(),
+        "quando": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "escala": args.escala,
+        "dados": parametros,
+        "ambiente": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                     "sistema": platform.platform(), "processador": platform.processor() or platform.machine()},
+        "resultados": resultados,
+    }
+    conteudo = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(conteudo + "\n")
+    else:
+        print(conteudo)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(json.load(arquivo), relatorio, args.limiar, args.minimo_ms)
+        sys.exit(1 if regressoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Simula vários terminais (caixas e cozinha) escrevendo no mesmo banco ao
+# mesmo tempo, enquanto este processo roda o MonitorBanco e mede quanto tempo
+# cada pedido novo leva para chegar ao sinal pedidos_alterados.
+#
+# Uso: python -m benchmarks.terminais [--terminais 3] [--pedidos 200] [--intervalo 50]
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+import estoque_app
+import servicos
+from estoque_app import MonitorBanco
+from servicos import DBManager, EstoqueInsuficiente, ProdutoCatalog, ServicoPedidos, TransicaoInvalida
+
+
+def terminal(banco, numero, n_pedidos, n_produtos):
+    servicos.DB_NAME = banco
+    ProdutoCatalog.sincronizar()
+    produtos = ProdutoCatalog.todos()
+    vendidos = recusados = 0
+    for i in range(n_pedidos):
+        produto = produtos[(numero + i) % n_produtos]
+        try:
+            # O horário de envio vai no nome do cliente para medir a latência
+            ServicoPedidos.finalizar(f"t{numero}@{time.time():.6f}", [(produto, 1)])
+            vendidos += 1
+        except EstoqueInsuficiente:
+            recusados += 1
+        if i % 3 == 0:
+            # Cozinha avançando pedidos abertos
+            aberto = DBManager.consultar_um("SELECT MIN(id) FROM pedidos WHERE status = 'Aberto'")[0]
+            if aberto is not None:
+                try:
+                    ServicoPedidos.avancar(aberto, "Aberto")
+                except TransicaoInvalida:
+                    # Outra cozinha pegou o mesmo pedido
+                    pass
+        time.sleep(0.002)
+    DBManager.fechar_conexoes()
+    return vendidos, recusados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--terminais", type=int, default=3)
+    parser.add_argument("--pedidos", type=int, default=200)
+    parser.add_argument("--produtos", type=int, default=10)
+    parser.add_argument("--estoque", type=int, default=50)
+    parser.add_argument("--intervalo", type=int, default=estoque_app.INTERVALO_MONITOR_MS)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp()
+    banco = os.path.join(pasta, "terminais.db")
+    servicos.DB_NAME = banco
+    DBManager.initialize_database()
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO produtos (nome, quantidade, preco_centavos) VALUES (?, ?, ?)",
+                           ((f"Produto {i}", args.estoque, 1000) for i in range(args.produtos)))
+
+    app = QCoreApplication(sys.argv)
+    latencias = []
+    vistos = set()
+
+    def recebido(desde, alteracoes):
+        agora = time.time()
+        for pedido_id, cliente, *_ in alteracoes:
+            if pedido_id not in vistos:
+                vistos.add(pedido_id)
+                latencias.append(agora - float(cliente.split("@")[1]))
+
+    monitor = MonitorBanco(args.intervalo)
+    monitor.pedidos_alterados.connect(recebido)
+    monitor.start()
+
+    contexto = multiprocessing.get_context("spawn")
+    pool = contexto.Pool(args.terminais)
+    resultado = pool.starmap_async(terminal, [(banco, n, args.pedidos, args.produtos) for n in range(args.terminais)])
+
+    def verificar_fim():
+        if resultado.ready():
+            # Uma última volta do monitor para pegar as escritas finais
+            QTimer.singleShot(args.intervalo * 3, app.quit)
+        else:
+            QTimer.singleShot(20, verificar_fim)
+
+    inicio = time.perf_counter()
+    QTimer.singleShot(20, verificar_fim)
+    app.exec_()
+    duracao = time.perf_counter() - inicio
+    monitor.parar()
+    pool.close()
+    pool.join()
+
+    vendidos = sum(v for v, _ in resultado.get())
+    recusados = sum(r for _, r in resultado.get())
+    negativos = DBManager.consultar_um("SELECT COUNT(*) FROM produtos WHERE quantidade < 0")[0]
+    vendido_banco = DBManager.consultar_um("SELECT COALESCE(SUM(quantidade), 0) FROM pedido_itens")[0]
+    baixa_estoque = args.produtos * args.estoque - DBManager.consultar_um("SELECT SUM(quantidade) FROM produtos")[0]
+
+    print(f"terminais: {args.terminais}  duração: {duracao:.2f}s")
+    print(f"pedidos vendidos: {vendidos}  recusados por estoque: {recusados}  vistos pelo monitor: {len(vistos)}")
+    if latencias:
+        latencias.sort()
+        p95 = latencias[int(len(latencias) * 0.95) - 1] if len(latencias) > 1 else latencias[0]
+        print(f"latência do monitor: mediana {statistics.median(latencias) * 1000:.1f}ms  p95 {p95 * 1000:.1f}ms")
+    print(f"estoque negativo: {negativos}  baixa de estoque = itens vendidos: {baixa_estoque == vendido_banco}")
+    DBManager.fechar_conexoes()
+    ok = negativos == 0 and baixa_estoque == vendido_banco == vendidos and len(vistos) == vendidos
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
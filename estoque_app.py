@@ -1,57 +1,457 @@
 import sys
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QTableWidget, QTableWidgetItem, QLineEdit, QLabel, QMessageBox, QInputDialog,
-    QGroupBox, QScrollArea, QGridLayout, QHeaderView, QDateEdit, QTextEdit
+    QTableView, QAbstractItemView, QLineEdit, QLabel, QMessageBox, QInputDialog,
+    QGroupBox, QScrollArea, QGridLayout, QHeaderView, QDateEdit, QTextEdit, QComboBox,
+    QDialog, QTabWidget, QTableWidget, QTableWidgetItem, QShortcut, QFileDialog, QProgressDialog, QStackedWidget,
+    QListView
 )
-from PyQt5.QtCore import QDateTime, Qt, QDate
+from PyQt5.QtCore import (
+    Qt, QDate, QTimer, QThread, pyqtSignal, QAbstractTableModel, QAbstractListModel, QModelIndex,
+    QObject, QRunnable, QThreadPool, QCoreApplication
+)
+from PyQt5.QtGui import QKeySequence
+from PyQt5 import sip
 import sqlite3
+import threading
+import time
+import uuid
+
+# analise, arquivamento e importacao (e o argparse das linhas de comando
+# deles) são importados só quando a tela ou a tarefa que os usa roda: não
+# pesam na abertura do app
+import perfil
+from perfil import Perfil
+from servicos import (
+    DBManager, Dinheiro, EstoqueInsuficiente, ProdutoCatalog, RelatorioCaixa, ServicoCaixa, ServicoPedidos, ServicoProdutos,
+    ServicoReservas, STATUS_KANBAN, VERSOES_CATALOGO, banco_ocupado
+)
+
+INTERVALO_MONITOR_MS = 50
+
+LIMITE_GRADE_PRODUTOS = 90
+
+# Reservas de carrinhos abandonados (terminal desligado no meio da venda)
+INTERVALO_EXPIRAR_RESERVAS_MS = 60_000
+
+# Pedidos concluídos antigos vão para o arquivo morto; entre um lote e outro
+# o pool fica livre para as telas
+INTERVALO_ARQUIVAMENTO_MS = 60 * 60_000
+PAUSA_ARQUIVAMENTO_MS = 200
+
+# Backfill e arquivamento só começam depois que a janela abriu e a primeira
+# tela carregou, para não disputar o banco com elas
+ESPERA_TAREFAS_FUNDO_MS = 5_000
+
+class SinaisTarefa(QObject):
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(object)
 
-DB_NAME = "estoque.db"
-
-class DBManager:
-    @staticmethod
-    def initialize_database():
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''CREATE TABLE IF NOT EXISTS produtos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                quantidade INTEGER NOT NULL,
-                preco REAL NOT NULL
-            )''')
-            cursor.execute('''CREATE TABLE IF NOT EXISTS pedidos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                cliente TEXT NOT NULL,
-                status TEXT NOT NULL,
-                data_hora TEXT,
-                itens TEXT NOT NULL
-            )''')
-            cursor.execute('''CREATE TABLE IF NOT EXISTS fluxo_caixa (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                data TEXT NOT NULL,
-                tipo TEXT NOT NULL,
-                valor REAL NOT NULL
-            )''')
-            conn.commit()
-
-    @staticmethod
-    def execute_query(query, params=None):
-        with sqlite3.connect(DB_NAME) as conn:
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
+def nome_funcao(funcao):
+    return getattr(funcao, "__qualname__", None) or repr(funcao)
+
+class TarefaBanco(QRunnable):
+    def __init__(self, funcao, args, sinais):
+        super().__init__()
+        self.funcao = funcao
+        self.args = args
+        self.sinais = sinais
+        self.criada = time.perf_counter()
+
+    def run(self):
+        # "fila" é o tempo esperando uma thread livre no pool
+        nome = nome_funcao(self.funcao)
+        Perfil.registrar("fila", nome, self.criada)
+        with Perfil.medir("tarefa", nome):
+            self.executar()
+
+    def executar(self):
+        for tentativa in range(DBAssincrono.TENTATIVAS):
+            try:
+                resultado = self.funcao(*self.args)
+            except sqlite3.OperationalError as e:
+                # SQLITE_BUSY depois do busy_timeout: outro terminal segurou o
+                # lock de escrita por muito tempo, tenta de novo com espera maior
+                if banco_ocupado(e) and tentativa + 1 < DBAssincrono.TENTATIVAS:
+                    time.sleep(DBAssincrono.ESPERA_INICIAL * 2 ** tentativa)
+                    continue
+                self.sinais.falhou.emit(e)
+                return
+            except Exception as e:
+                self.sinais.falhou.emit(e)
+                return
+            self.sinais.concluido.emit(resultado)
+            return
+
+class DBAssincrono:
+    # Roda funções de banco fora da thread da interface. Cada thread do pool
+    # usa a própria conexão do DBManager; o resultado volta por sinal e o
+    # callback roda na thread da interface
+    THREADS = 4
+    TENTATIVAS = 4
+    ESPERA_INICIAL = 0.1
+
+    _pool = None
+    _pendentes = set()
+
+    @classmethod
+    def pool(cls):
+        if cls._pool is None:
+            cls._pool = QThreadPool()
+            cls._pool.setMaxThreadCount(cls.THREADS)
+            # Threads não expiram, senão a conexão de cada uma ficaria órfã
+            cls._pool.setExpiryTimeout(-1)
+        return cls._pool
+
+    @classmethod
+    def executar(cls, funcao, *args, dono=None, ao_concluir=None, ao_falhar=None):
+        sinais = SinaisTarefa()
+        cls._pendentes.add(sinais)
+
+        def concluido(resultado):
+            cls._pendentes.discard(sinais)
+            # A tela que pediu pode ter sido trocada enquanto a consulta rodava
+            if dono is not None and sip.isdeleted(dono):
+                return
+            if ao_concluir:
+                # Montar widgets com o resultado também conta no perfil
+                with Perfil.medir("callback", nome_funcao(ao_concluir)):
+                    ao_concluir(resultado)
+
+        def falhou(erro):
+            cls._pendentes.discard(sinais)
+            if dono is not None and sip.isdeleted(dono):
+                return
+            if ao_falhar:
+                ao_falhar(erro)
+            elif isinstance(dono, QWidget):
+                QMessageBox.warning(dono, "Erro", f"Falha ao acessar o banco de dados: {erro}")
             else:
-                cursor.execute(query)
-            conn.commit()
-            return cursor.fetchall()
+                print(f"Falha ao acessar o banco de dados: {erro}", file=sys.stderr)
+
+        sinais.concluido.connect(concluido)
+        sinais.falhou.connect(falhou)
+        cls.pool().start(TarefaBanco(funcao, args, sinais))
+
+    @classmethod
+    def aguardar(cls, timeout_ms=-1):
+        # Espera as tarefas em andamento e entrega os callbacks pendentes
+        if cls._pool is not None:
+            cls._pool.waitForDone(timeout_ms)
+        QCoreApplication.processEvents()
+
+    @classmethod
+    def ocioso(cls):
+        # Nenhuma tarefa rodando nem callback esperando para ser entregue
+        return not cls._pendentes
+
+class SinaisProgresso(QObject):
+    progresso = pyqtSignal(int, int)
+
+def executar_com_progresso(dono, titulo, funcao, *args, ao_concluir=None):
+    # Tarefa longa (importação, exportação) no pool com barra de progresso e
+    # botão de cancelar; a função recebe progresso(feito, total) e cancelado()
+    dialogo = QProgressDialog(titulo, "Cancelar", 0, 1000, dono)
+    dialogo.setWindowModality(Qt.WindowModal)
+    dialogo.setMinimumDuration(300)
+    dialogo.setAutoClose(False)
+    dialogo.setValue(0)
+    sinais = SinaisProgresso(dialogo)
+    sinais.progresso.connect(lambda feito, total: dialogo.setValue(min(999, feito * 1000 // max(total, 1))))
+    cancelar = threading.Event()
+    dialogo.canceled.connect(cancelar.set)
+
+    def concluido(resultado):
+        dialogo.reset()
+        if ao_concluir:
+            ao_concluir(resultado)
+
+    def falhou(erro):
+        dialogo.reset()
+        QMessageBox.warning(dono, "Erro", str(erro))
+
+    DBAssincrono.executar(lambda: funcao(*args, progresso=sinais.progresso.emit, cancelado=cancelar.is_set),
+                          dono=dono, ao_concluir=concluido, ao_falhar=falhou)
+
+class ModeloPaginado(QAbstractTableModel):
+    # Tabela lida sob demanda: a view chama fetchMore conforme rola, e cada
+    # página continua de onde a anterior parou pela chave (keyset), sem OFFSET
+    TAMANHO_PAGINA = 200
+    carregamento_alterado = pyqtSignal(bool)
+
+    def __init__(self, cabecalhos, select, chave, indices_chave, descendente=False, parent=None):
+        super().__init__(parent)
+        self.cabecalhos = cabecalhos
+        self.select = select
+        self.chave = chave
+        self.indices_chave = indices_chave
+        direcao = "DESC" if descendente else "ASC"
+        self.ordem = ", ".join(f"{coluna} {direcao}" for coluna in chave)
+        self.comparacao = "<" if descendente else ">"
+        self.linhas = []
+        self._fim = False
+        self.carregando = False
+        self.geracao = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.linhas)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.cabecalhos)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return str(self.linhas[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.cabecalhos[section]
+        return super().headerData(section, orientation, role)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._fim and not self.carregando
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.carregando:
+            return
+        self.carregando = True
+        geracao = self.geracao
+        DBAssincrono.executar(self.buscar_pagina, self.linhas[-1] if self.linhas else None, dono=self,
+                              ao_concluir=lambda pagina: self.pagina_carregada(geracao, pagina),
+                              ao_falhar=lambda erro: self.pagina_falhou(geracao, erro))
+
+    def pagina_carregada(self, geracao, pagina):
+        # Página de antes de um recarregar(): descarta
+        if geracao != self.geracao:
+            return
+        self.carregando = False
+        if len(pagina) < self.TAMANHO_PAGINA:
+            self._fim = True
+        if pagina:
+            self.beginInsertRows(QModelIndex(), len(self.linhas), len(self.linhas) + len(pagina) - 1)
+            self.linhas.extend(pagina)
+            self.endInsertRows()
+        self.carregamento_alterado.emit(False)
+
+    def pagina_falhou(self, geracao, erro):
+        if geracao == self.geracao:
+            self.carregando = False
+            self.carregamento_alterado.emit(False)
+        print(f"Falha ao carregar página: {erro}", file=sys.stderr)
+
+    def buscar_pagina(self, ultima):
+        if ultima is None:
+            return DBManager.consultar(f"{self.select} ORDER BY {self.ordem} LIMIT ?", (self.TAMANHO_PAGINA,))
+        colunas = ", ".join(self.chave)
+        marcadores = ", ".join("?" * len(self.chave))
+        return DBManager.consultar(f"{self.select} WHERE ({colunas}) {self.comparacao} ({marcadores}) ORDER BY {self.ordem} LIMIT ?",
+                                   tuple(ultima[i] for i in self.indices_chave) + (self.TAMANHO_PAGINA,))
+
+    def linha(self, row):
+        return self.linhas[row]
+
+    def recarregar(self):
+        self.beginResetModel()
+        self.geracao += 1
+        self.linhas = []
+        self._fim = False
+        self.carregando = False
+        self.endResetModel()
+        self.carregamento_alterado.emit(True)
+        self.fetchMore()
+
+class ModeloCarrinho(QAbstractListModel):
+    # Pedido em andamento, uma linha por produto: pedir mais do mesmo produto
+    # soma na linha dele. Cada mudança avisa a view só da linha afetada e o
+    # subtotal anda pela diferença, sem percorrer o carrinho. Fica na janela,
+    # não na tela de venda: trocar de tela não perde o pedido nem as reservas
+    subtotal_alterado = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.id = uuid.uuid4().hex
+        self.ordem = []
+        self.linhas = {}
+        self.itens = {}
+        self.subtotal = Dinheiro()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ordem)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        produto_id = self.ordem[index.row()]
+        if role == Qt.DisplayRole:
+            produto, quantidade = self.itens[produto_id]
+            return f"{quantidade}x {produto.nome} - R$ {produto.preco * quantidade:.2f}"
+        if role == Qt.UserRole:
+            return produto_id
+        return None
+
+    def quantidade(self, produto_id):
+        item = self.itens.get(produto_id)
+        return item[1] if item else 0
+
+    def item(self, row):
+        return self.itens[self.ordem[row]]
+
+    def definir(self, produto, quantidade):
+        # Quantidade total do produto no carrinho, como a reserva; 0 tira a
+        # linha. O preço é o do produto quando entrou no carrinho
+        quantidade = max(quantidade, 0)
+        item = self.itens.get(produto.id)
+        preco, anterior = (item[0].preco, item[1]) if item else (produto.preco, 0)
+        if quantidade == anterior:
+            return
+        if not quantidade:
+            row = self.linhas.pop(produto.id)
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.ordem[row]
+            del self.itens[produto.id]
+            for seguinte in self.ordem[row:]:
+                self.linhas[seguinte] -= 1
+            self.endRemoveRows()
+        elif anterior:
+            self.itens[produto.id] = (self.itens[produto.id][0], quantidade)
+            indice = self.index(self.linhas[produto.id])
+            self.dataChanged.emit(indice, indice, [Qt.DisplayRole])
+        else:
+            row = len(self.ordem)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.ordem.append(produto.id)
+            self.linhas[produto.id] = row
+            self.itens[produto.id] = (produto, quantidade)
+            self.endInsertRows()
+        self.subtotal += preco * (quantidade - anterior)
+        self.subtotal_alterado.emit(self.subtotal)
+
+    def itens_venda(self):
+        return [self.itens[produto_id] for produto_id in self.ordem]
+
+    def limpar(self):
+        # Carrinho novo: as reservas do anterior viraram venda ou já foram liberadas
+        self.beginResetModel()
+        self.id = uuid.uuid4().hex
+        self.ordem = []
+        self.linhas = {}
+        self.itens = {}
+        self.subtotal = Dinheiro()
+        self.endResetModel()
+        self.subtotal_alterado.emit(self.subtotal)
+
+class MonitorBanco(QThread):
+    # Detecta escritas de qualquer conexão (outros terminais ou esta mesma
+    # janela) e entrega só o delta, sem bloquear o event loop do Qt
+    # (alteracao_id de onde o lote parte, linhas alteradas)
+    pedidos_alterados = pyqtSignal(int, list)
+    produtos_alterados = pyqtSignal(int)
+    reservas_alteradas = pyqtSignal(int)
+
+    def __init__(self, intervalo_ms=INTERVALO_MONITOR_MS, parent=None):
+        super().__init__(parent)
+        self.intervalo_ms = intervalo_ms
+        self.data_version = None
+        self.ultima_alteracao = None
+        self.versao_produtos = None
+        self.versao_reservas = None
+
+    def run(self):
+        # A interrupção é pedida fora da thread: um parar() antes do run()
+        # começar não se perde
+        try:
+            while not self.isInterruptionRequested():
+                self.verificar()
+                self.msleep(self.intervalo_ms)
+        finally:
+            DBManager._fechar(threading.get_ident())
+
+    def parar(self):
+        self.requestInterruption()
+        self.wait()
+
+    def verificar(self):
+        # PRAGMA data_version não lê nenhuma página: é o custo do polling ocioso.
+        # Vai direto na conexão para não encher o perfil com o polling
+        data_version = DBManager.conexao().execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self.data_version:
+            return
+        self.data_version = data_version
+
+        if self.ultima_alteracao is None:
+            self.ultima_alteracao = DBManager.consultar_um("SELECT COALESCE(MAX(alteracao_id), 0) FROM pedidos")[0]
+        else:
+            alteracoes = ServicoPedidos.alteracoes_desde(self.ultima_alteracao)
+            if alteracoes:
+                desde, self.ultima_alteracao = self.ultima_alteracao, alteracoes[-1][-1]
+                self.pedidos_alterados.emit(desde, alteracoes)
+
+        versao_produtos, versao_reservas = DBManager.consultar_um(VERSOES_CATALOGO)
+        if self.versao_produtos is not None and versao_produtos != self.versao_produtos:
+            self.produtos_alterados.emit(versao_produtos)
+        elif self.versao_reservas is not None and versao_reservas != self.versao_reservas:
+            self.reservas_alteradas.emit(versao_reservas)
+        self.versao_produtos = versao_produtos
+        self.versao_reservas = versao_reservas
 
 class EstoqueApp(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Sistema de Estoque e Vendas")
         self.setGeometry(100, 100, 1200, 800)
+        self.monitor = MonitorBanco(parent=self)
+        self.painel_perfil = None
+        self.kanban = None
+        self.venda = None
+        self.estoque = None
+        self.carrinho = ModeloCarrinho(self)
+        self.cache_telas = {}
+        self.telas_desatualizadas = set()
+        self.fechando = False
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.mostrar_perfil)
         self.init_ui()
+        self.monitor.start()
+        QTimer.singleShot(ESPERA_TAREFAS_FUNDO_MS, self.continuar_backfill)
+        self.timer_reservas = QTimer(self)
+        self.timer_reservas.timeout.connect(lambda: DBAssincrono.executar(ServicoReservas.expirar, dono=self))
+        self.timer_reservas.start(INTERVALO_EXPIRAR_RESERVAS_MS)
+        self.timer_arquivamento = QTimer(self)
+        self.timer_arquivamento.timeout.connect(self.continuar_arquivamento)
+        self.timer_arquivamento.start(INTERVALO_ARQUIVAMENTO_MS)
+
+    def closeEvent(self, event):
+        self.fechando = True
+        self.monitor.parar()
+        self.encerrar_venda()
+        DBAssincrono.aguardar()
+        super().closeEvent(event)
+
+    def continuar_backfill(self):
+        # Um lote por vez no pool, até não sobrar pedido antigo para converter
+        if self.fechando:
+            return
+        DBAssincrono.executar(DBManager.backfill_pedido_itens, dono=self,
+                              ao_concluir=lambda processados: (self.continuar_backfill() if processados
+                                                               else self.continuar_arquivamento()))
+
+    def continuar_arquivamento(self):
+        # Idem para o arquivo morto; no fim devolve ao sistema, aos poucos, o
+        # espaço que as tabelas do dia a dia deixaram de usar
+        if self.fechando:
+            return
+        import arquivamento
+        DBAssincrono.executar(arquivamento.arquivar_lote, dono=self,
+                              ao_concluir=lambda movidos: (QTimer.singleShot(PAUSA_ARQUIVAMENTO_MS, self.continuar_arquivamento)
+                                                           if movidos else self.continuar_compactacao()))
+
+    def continuar_compactacao(self):
+        if self.fechando:
+            return
+        import arquivamento
+        DBAssincrono.executar(arquivamento.compactar, dono=self,
+                              ao_concluir=lambda paginas: paginas and QTimer.singleShot(PAUSA_ARQUIVAMENTO_MS,
+                                                                                        self.continuar_compactacao))
 
     def init_ui(self):
         central_widget = QWidget()
@@ -71,6 +471,7 @@ class EstoqueApp(QMainWindow):
             ("Gerenciar Estoque", self.mostrar_estoque),
             ("Histórico de Pedidos", self.mostrar_historico),
             ("Kanban de Pedidos", self.mostrar_kanban),
+            ("Painel da Cozinha", self.mostrar_painel),
             ("Registrar Despesa", self.registrar_despesa)
         ]
 
@@ -82,59 +483,127 @@ class EstoqueApp(QMainWindow):
         layout.addLayout(menu_layout)
 
     def create_content_area(self, layout):
-        self.content_area = QWidget()
-        self.content_layout = QVBoxLayout(self.content_area)
-        layout.addWidget(self.content_area)
+        self.telas = QStackedWidget()
+        layout.addWidget(self.telas)
 
     def create_footer(self, layout):
         footer_label = QLabel("Sistema de Venda FronyTech 1.0")
         footer_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(footer_label)
 
-    def limpar_content_area(self):
-        while self.content_layout.count():
-            child = self.content_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+    def encerrar_venda(self):
+        # Fechar o app abandona o pedido em andamento e devolve o que ele reservou
+        if self.venda is not None:
+            self.venda.reiniciar()
+
+    def mostrar_tela(self, nome, criar):
+        # Cada tela é montada na primeira visita e fica guardada na pilha; na
+        # volta só recarrega se o banco mudou enquanto ela estava escondida
+        with Perfil.medir("tela", f"mostrar_{nome}"):
+            tela = self.cache_telas.get(nome)
+            if tela is None:
+                tela = criar()
+                self.cache_telas[nome] = tela
+                self.telas.addWidget(tela)
+            elif nome in self.telas_desatualizadas:
+                tela.reexibir()
+            self.telas_desatualizadas.discard(nome)
+            self.telas.setCurrentWidget(tela)
+            return tela
+
+    def ao_alterar(self, nome, slot=None):
+        # Só a tela visível reage na hora a um sinal do monitor; escondida,
+        # fica marcada e faz uma recarga só quando voltar
+        def receber(*args):
+            if self.telas.currentWidget() is self.cache_telas.get(nome):
+                if slot is not None:
+                    slot(*args)
+            else:
+                self.telas_desatualizadas.add(nome)
+        return receber
 
     def mostrar_kanban(self):
-        self.limpar_content_area()
+        self.mostrar_tela("kanban", self.criar_kanban)
+
+    def criar_kanban(self):
         self.kanban = KanbanPedidos(self)
-        self.content_layout.addWidget(self.kanban)
+        self.monitor.pedidos_alterados.connect(self.ao_alterar("kanban", self.kanban.pedidos_alterados))
+        return self.kanban
 
     def mostrar_venda(self):
-        self.limpar_content_area()
-        venda = VendaProdutos(self)
-        self.content_layout.addWidget(venda)
+        self.mostrar_tela("venda", self.criar_venda)
+
+    def criar_venda(self):
+        self.venda = VendaProdutos(self)
+        self.monitor.produtos_alterados.connect(self.ao_alterar("venda", self.venda.produtos_alterados))
+        # O disponível do catálogo acompanha os carrinhos dos outros
+        # terminais; a tabela do estoque não mostra reservas e não é avisada
+        self.monitor.reservas_alteradas.connect(self.ao_alterar("venda", self.venda.produtos_alterados))
+        return self.venda
 
     def mostrar_estoque(self):
-        self.limpar_content_area()
+        self.mostrar_tela("estoque", self.criar_estoque)
+
+    def criar_estoque(self):
         self.estoque = GerenciarEstoque(self)
-        self.content_layout.addWidget(self.estoque)
+        self.monitor.produtos_alterados.connect(self.ao_alterar("estoque", self.estoque.produtos_alterados))
+        return self.estoque
 
     def mostrar_historico(self):
-        self.limpar_content_area()
+        self.mostrar_tela("historico", self.criar_historico)
+
+    def criar_historico(self):
+        # Aberto, o histórico fica parado onde o usuário está olhando; as
+        # vendas novas entram na próxima visita
         historico = HistoricoPedidos(self)
-        self.content_layout.addWidget(historico)
+        self.monitor.pedidos_alterados.connect(self.ao_alterar("historico"))
+        return historico
+
+    def mostrar_painel(self):
+        self.mostrar_tela("painel", self.criar_painel)
+
+    def criar_painel(self):
+        painel = PainelCozinha(self)
+        self.monitor.pedidos_alterados.connect(self.ao_alterar("painel", painel.pedidos_alterados))
+        return painel
+
+    def mostrar_perfil(self):
+        if self.painel_perfil is None:
+            self.painel_perfil = PainelPerfil(self)
+        self.painel_perfil.atualizar()
+        self.painel_perfil.show()
+        self.painel_perfil.raise_()
 
     def registrar_despesa(self):
         valor, ok = QInputDialog.getDouble(self, "Registrar Despesa", "Valor da despesa:", 0, 0, 1000000, 2)
         if ok:
             descricao, ok = QInputDialog.getText(self, "Registrar Despesa", "Descrição da despesa:")
             if ok:
-                data_atual = QDateTime.currentDateTime().toString("yyyy-MM-dd")
-                DBManager.execute_query("INSERT INTO fluxo_caixa (data, tipo, valor) VALUES (?, ?, ?)",
-                                        (data_atual, f"Despesa: {descricao}", valor))
-                QMessageBox.information(self, "Sucesso", "Despesa registrada com sucesso!")
+                DBAssincrono.executar(ServicoCaixa.registrar_despesa, valor, descricao, dono=self,
+                                      ao_concluir=lambda _: self.despesa_registrada())
+
+    def despesa_registrada(self):
+        # O relatório do caixa no histórico já aberto fica velho
+        if "historico" in self.cache_telas:
+            self.telas_desatualizadas.add("historico")
+        QMessageBox.information(self, "Sucesso", "Despesa registrada com sucesso!")
 
 class KanbanPedidos(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
+        self.cards = {}
+        self.ultima_alteracao = 0
+        self.carregando = False
         self.init_ui()
 
     def init_ui(self):
-        layout = QHBoxLayout(self)
+        layout_principal = QVBoxLayout(self)
+        self.label_carregando = QLabel("Carregando pedidos...")
+        self.label_carregando.hide()
+        layout_principal.addWidget(self.label_carregando)
+        layout = QHBoxLayout()
+        layout_principal.addLayout(layout)
 
         self.coluna_abertos = self.criar_coluna("Pedidos Abertos")
         self.coluna_andamento = self.criar_coluna("Em Andamento")
@@ -159,9 +628,20 @@ class KanbanPedidos(QWidget):
         return grupo
 
     def carregar_pedidos(self):
-        pedidos = DBManager.execute_query("SELECT id, cliente, status, data_hora, itens FROM pedidos WHERE status != 'Concluído'")
+        with Perfil.medir("tela", "KanbanPedidos.carregar_pedidos"):
+            self.carregando = True
+            self.label_carregando.show()
+            DBAssincrono.executar(ServicoPedidos.pedidos_abertos, dono=self, ao_concluir=self.pedidos_carregados)
+
+    def pedidos_carregados(self, resultado):
+        self.ultima_alteracao, pedidos = resultado
+        self.limpar_kanban()
         for pedido in pedidos:
             self.adicionar_pedido_kanban(pedido)
+        self.carregando = False
+        self.label_carregando.hide()
+        # Pega o que mudou entre a leitura e agora
+        self.atualizar_kanban()
 
     def adicionar_pedido_kanban(self, pedido):
         id, cliente, status, data_hora, itens = pedido
@@ -187,34 +667,83 @@ class KanbanPedidos(QWidget):
 
         coluna = self.coluna_abertos if status == "Aberto" else self.coluna_andamento if status == "Em Andamento" else self.coluna_finalizados
         coluna.findChild(QScrollArea).widget().layout().insertWidget(0, pedido_widget)
+        self.cards[id] = pedido_widget
+
+    def remover_pedido_kanban(self, pedido_id):
+        card = self.cards.pop(pedido_id, None)
+        if card is not None:
+            card.setParent(None)
+            card.deleteLater()
 
     def avancar_pedido(self, pedido_id, status_atual):
-        novo_status = "Em Andamento" if status_atual == "Aberto" else "Finalizado"
-        DBManager.execute_query("UPDATE pedidos SET status = ? WHERE id = ?", (novo_status, pedido_id))
-        self.atualizar_kanban()
+        DBAssincrono.executar(ServicoPedidos.avancar, pedido_id, status_atual, dono=self,
+                              ao_concluir=lambda _: self.atualizar_kanban(), ao_falhar=self.transicao_falhou)
 
     def concluir_pedido(self, pedido_id):
-        DBManager.execute_query("UPDATE pedidos SET status = 'Concluído' WHERE id = ?", (pedido_id,))
-        QMessageBox.information(self, "Sucesso", f"Pedido #{pedido_id} foi concluído e removido do Kanban.")
+        DBAssincrono.executar(ServicoPedidos.concluir, pedido_id, dono=self,
+                              ao_concluir=lambda _: self.pedido_concluido(pedido_id), ao_falhar=self.transicao_falhou)
+
+    def transicao_falhou(self, erro):
+        self.atualizar_kanban()
+        QMessageBox.warning(self, "Erro", str(erro))
+
+    def pedido_concluido(self, pedido_id):
         self.atualizar_kanban()
+        QMessageBox.information(self, "Sucesso", f"Pedido #{pedido_id} foi concluído e removido do Kanban.")
 
     def limpar_kanban(self):
-        for coluna in [self.coluna_abertos, self.coluna_andamento, self.coluna_finalizados]:
-            scroll_area = coluna.findChild(QScrollArea)
-            layout = scroll_area.widget().layout()
-            for i in reversed(range(layout.count()-1)):
-                layout.itemAt(i).widget().setParent(None)
+        for pedido_id in list(self.cards):
+            self.remover_pedido_kanban(pedido_id)
 
     def atualizar_kanban(self):
-        self.limpar_kanban()
-        self.carregar_pedidos()
+        # Só o que mudou desde a última leitura; cada card alterado é recriado
+        # na coluna do status novo ou removido se saiu do Kanban
+        DBAssincrono.executar(ServicoPedidos.alteracoes_desde, self.ultima_alteracao, dono=self,
+                              ao_concluir=self.aplicar_alteracoes)
+
+    def pedidos_alterados(self, desde, alteracoes):
+        # O lote do monitor parte do cursor do monitor. Se ele começa onde o
+        # Kanban parou (ou antes), traz tudo o que falta e é aplicado direto;
+        # com um buraco entre os dois (tela escondida, carga recente), aplicá-lo
+        # pularia os pedidos do buraco, então busca do cursor daqui
+        if desde <= self.ultima_alteracao:
+            self.aplicar_alteracoes(alteracoes)
+        else:
+            self.atualizar_kanban()
+
+    def aplicar_alteracoes(self, alteracoes):
+        if self.carregando:
+            # A carga completa em andamento já vai trazer estes pedidos (e busca
+            # o resto ao terminar); o cursor não anda
+            return
+        for *pedido, alteracao_id in alteracoes:
+            # O monitor pode entregar algo que o clique local já aplicou
+            if alteracao_id <= self.ultima_alteracao:
+                continue
+            self.remover_pedido_kanban(pedido[0])
+            if pedido[2] in STATUS_KANBAN:
+                self.adicionar_pedido_kanban(pedido)
+            self.ultima_alteracao = alteracao_id
+
+    def reexibir(self):
+        # O que mudou enquanto outra tela estava na frente
+        self.atualizar_kanban()
 
 class VendaProdutos(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
-        self.itens_pedido = []
+        # Sem janela (benchmarks, tela avulsa) o carrinho é só desta tela
+        self.carrinho = parent.carrinho if parent is not None else ModeloCarrinho(self)
+        self.botoes_produtos = []
+        self.ids_botoes = []
+        self.grade_ativa = False
+        # id do carrinho cujas reservas a finalização em andamento está convertendo
+        self.finalizando = None
         self.init_ui()
+        if self.carrinho.rowCount():
+            # Tela remontada com um pedido em andamento: continua dele
+            self.mostrar_pedido()
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -223,112 +752,310 @@ class VendaProdutos(QWidget):
         self.btn_novo_pedido.clicked.connect(self.iniciar_novo_pedido)
         layout.addWidget(self.btn_novo_pedido)
 
+        filtros_layout = QHBoxLayout()
+        self.busca = QLineEdit()
+        self.busca.setPlaceholderText("Buscar produto...")
+        self.busca.setClearButtonEnabled(True)
+        self.busca.textChanged.connect(self.filtrar_produtos)
+        filtros_layout.addWidget(self.busca)
+        self.filtro_categoria = QComboBox()
+        self.filtro_categoria.addItem("Todas as categorias", None)
+        self.filtro_categoria.currentIndexChanged.connect(self.filtrar_produtos)
+        filtros_layout.addWidget(self.filtro_categoria)
+        self.filtros = QWidget()
+        self.filtros.setLayout(filtros_layout)
+        self.filtros.hide()
+        layout.addWidget(self.filtros)
+
         self.scroll_area = QScrollArea()
         self.scroll_area.setWidgetResizable(True)
         self.scroll_content = QWidget()
         self.scroll_area.setWidget(self.scroll_content)
         self.produtos_layout = QVBoxLayout(self.scroll_content)
+        self.label_carregando = QLabel("Carregando produtos...")
+        self.label_carregando.hide()
+        self.produtos_layout.addWidget(self.label_carregando)
+        self.grid_layout = QGridLayout()
+        self.produtos_layout.addLayout(self.grid_layout)
+        self.label_limite = QLabel()
+        self.label_limite.hide()
+        self.produtos_layout.addWidget(self.label_limite)
+        self.produtos_layout.addStretch(1)
         layout.addWidget(self.scroll_area)
 
-        self.area_itens_pedido = QVBoxLayout()
-        layout.addLayout(self.area_itens_pedido)
+        # Itens do pedido: a lista é uma view do carrinho da janela e só
+        # redesenha a linha que mudou
+        self.painel_pedido = QWidget()
+        pedido_layout = QVBoxLayout(self.painel_pedido)
+        pedido_layout.setContentsMargins(0, 0, 0, 0)
+        self.lista_itens = QListView()
+        self.lista_itens.setModel(self.carrinho)
+        self.lista_itens.setUniformItemSizes(True)
+        self.lista_itens.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.lista_itens.doubleClicked.connect(self.alterar_item)
+        pedido_layout.addWidget(self.lista_itens)
+        itens_layout = QHBoxLayout()
+        btn_alterar = QPushButton("Alterar Quantidade")
+        btn_alterar.clicked.connect(self.alterar_item)
+        itens_layout.addWidget(btn_alterar)
+        btn_remover = QPushButton("Remover Item")
+        btn_remover.clicked.connect(self.remover_item)
+        itens_layout.addWidget(btn_remover)
+        self.label_subtotal = QLabel()
+        self.label_subtotal.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
+        itens_layout.addWidget(self.label_subtotal)
+        pedido_layout.addLayout(itens_layout)
+        self.carrinho.subtotal_alterado.connect(self.exibir_subtotal)
+        self.exibir_subtotal(self.carrinho.subtotal)
+        self.painel_pedido.hide()
+        layout.addWidget(self.painel_pedido)
 
         self.btn_finalizar_pedido = QPushButton("Finalizar Pedido")
         self.btn_finalizar_pedido.clicked.connect(self.finalizar_pedido)
         self.btn_finalizar_pedido.hide()
         layout.addWidget(self.btn_finalizar_pedido)
 
+        self.btn_cancelar_pedido = QPushButton("Cancelar Pedido")
+        self.btn_cancelar_pedido.clicked.connect(self.cancelar_pedido)
+        self.btn_cancelar_pedido.hide()
+        layout.addWidget(self.btn_cancelar_pedido)
+
         self.btn_voltar_kanban = QPushButton("Voltar ao Kanban")
         self.btn_voltar_kanban.clicked.connect(self.voltar_ao_kanban)
         self.btn_voltar_kanban.hide()
         layout.addWidget(self.btn_voltar_kanban)
 
     def iniciar_novo_pedido(self):
-        self.itens_pedido = []
-        self.limpar_area_itens()
+        self.liberar_reservas()
+        self.mostrar_pedido()
+
+    def mostrar_pedido(self):
         self.mostrar_produtos()
         self.btn_novo_pedido.hide()
+        self.painel_pedido.show()
         self.btn_finalizar_pedido.show()
+        self.btn_cancelar_pedido.show()
         self.btn_voltar_kanban.show()
 
+    def exibir_subtotal(self, subtotal):
+        self.label_subtotal.setText(f"Subtotal: R$ {subtotal:.2f}")
+
+    def produtos_alterados(self, versao):
+        self.sincronizar_catalogo()
+
+    def reexibir(self):
+        self.sincronizar_catalogo()
+
+    def reiniciar(self):
+        # Abandona o pedido em andamento: a tela volta a como recém-aberta,
+        # com o carrinho vazio e sem reservas
+        self.liberar_reservas()
+        self.grade_ativa = False
+        self.filtros.hide()
+        self.busca.clear()
+        self.label_carregando.hide()
+        self.label_limite.hide()
+        for btn in self.botoes_produtos:
+            btn.hide()
+        self.travar_pedido(False)
+        self.painel_pedido.hide()
+        self.btn_finalizar_pedido.setText("Finalizar Pedido")
+        self.btn_finalizar_pedido.hide()
+        self.btn_cancelar_pedido.hide()
+        self.btn_voltar_kanban.hide()
+        self.btn_novo_pedido.show()
+
     def mostrar_produtos(self):
-        produtos = DBManager.execute_query("SELECT id, nome, quantidade, preco FROM produtos")
+        # Com o catálogo em memória a grade aparece na hora; a sincronização
+        # só redesenha os botões se algo mudou no banco
+        self.grade_ativa = True
+        self.filtros.show()
+        if ProdutoCatalog.carregado():
+            self.atualizar_categorias()
+            self.filtrar_produtos()
+        else:
+            self.label_carregando.show()
+        self.sincronizar_catalogo()
 
-        for i in reversed(range(self.produtos_layout.count())): 
-            self.produtos_layout.itemAt(i).widget().setParent(None)
+    def sincronizar_catalogo(self):
+        DBAssincrono.executar(ProdutoCatalog.sincronizar, dono=self, ao_concluir=self.catalogo_sincronizado)
 
-        grid_layout = QGridLayout()
-        for i, produto in enumerate(produtos):
-            btn = QPushButton(f"{produto[1]}\nR$ {produto[3]:.2f}")
-            btn.clicked.connect(lambda _, p=produto: self.adicionar_ao_pedido(p))
-            grid_layout.addWidget(btn, i // 3, i % 3)
+    def catalogo_sincronizado(self, alterados):
+        if self.grade_ativa and (alterados or self.label_carregando.isVisible()):
+            self.atualizar_categorias()
+            self.filtrar_produtos()
 
-        self.produtos_layout.addLayout(grid_layout)
+    def atualizar_categorias(self):
+        categorias = ProdutoCatalog.categorias()
+        atuais = [self.filtro_categoria.itemData(i) for i in range(1, self.filtro_categoria.count())]
+        if categorias == atuais:
+            return
+        selecionada = self.filtro_categoria.currentData()
+        self.filtro_categoria.blockSignals(True)
+        while self.filtro_categoria.count() > 1:
+            self.filtro_categoria.removeItem(1)
+        for categoria in categorias:
+            self.filtro_categoria.addItem(categoria, categoria)
+        indice = self.filtro_categoria.findData(selecionada)
+        self.filtro_categoria.setCurrentIndex(max(indice, 0))
+        self.filtro_categoria.blockSignals(False)
+
+    def filtrar_produtos(self):
+        if not self.grade_ativa or not ProdutoCatalog.carregado():
+            return
+        produtos = ProdutoCatalog.buscar(self.busca.text(), self.filtro_categoria.currentData())
+        # Cardápio grande: a grade só mostra os primeiros resultados, a busca refina
+        if len(produtos) > LIMITE_GRADE_PRODUTOS:
+            self.label_limite.setText(f"Mostrando {LIMITE_GRADE_PRODUTOS} de {len(produtos)} produtos. Use a busca para refinar.")
+            self.label_limite.show()
+            produtos = produtos[:LIMITE_GRADE_PRODUTOS]
+        else:
+            self.label_limite.hide()
+        self.exibir_produtos(produtos)
+
+    def exibir_produtos(self, produtos):
+        # Os botões da grade são reaproveitados por posição: filtrar ou trocar
+        # o cardápio só muda o texto dos que mudaram e esconde as sobras
+        self.label_carregando.hide()
+        self.ids_botoes = [produto.id for produto in produtos]
+        for i, produto in enumerate(produtos):
+            texto = f"{produto.nome}\nR$ {produto.preco:.2f}"
+            if i == len(self.botoes_produtos):
+                btn = QPushButton(texto)
+                btn.clicked.connect(lambda _, posicao=i: self.produto_clicado(self.ids_botoes[posicao]))
+                self.grid_layout.addWidget(btn, i // 3, i % 3)
+                self.botoes_produtos.append(btn)
+            else:
+                btn = self.botoes_produtos[i]
+                if btn.text() != texto:
+                    btn.setText(texto)
+                btn.show()
+        for btn in self.botoes_produtos[len(produtos):]:
+            btn.hide()
+
+    def produto_clicado(self, produto_id):
+        produto = ProdutoCatalog.por_id(produto_id)
+        if produto is None:
+            QMessageBox.warning(self, "Erro", "Este produto não está mais disponível.")
+            return
+        self.adicionar_ao_pedido(produto)
 
     def adicionar_ao_pedido(self, produto):
-        quantidade_disponivel = produto[2]  # A quantidade está no índice 2 da tupla do produto
+        # O disponível já desconta o que está nos carrinhos dos outros terminais
+        quantidade_disponivel = produto.disponivel
         if quantidade_disponivel <= 0:
-            QMessageBox.warning(self, "Erro", f"O produto {produto[1]} está fora de estoque.")
+            QMessageBox.warning(self, "Erro", f"O produto {produto.nome} está fora de estoque.")
             return
 
-        quantidade, ok = QInputDialog.getInt(self, "Quantidade", f"Quantidade de {produto[1]} (máx. {quantidade_disponivel}):", 1, 1, quantidade_disponivel)
+        quantidade, ok = QInputDialog.getInt(self, "Quantidade", f"Quantidade de {produto.nome} (máx. {quantidade_disponivel}):", 1, 1, quantidade_disponivel)
         if ok:
-            self.itens_pedido.append((produto, quantidade))
-            self.atualizar_lista_itens()
-
-    def atualizar_lista_itens(self):
-        self.limpar_area_itens()
-        subtotal = 0
-        for item in self.itens_pedido:
-            produto, quantidade = item
-            valor_item = produto[3] * quantidade
-            subtotal += valor_item
-            self.area_itens_pedido.addWidget(QLabel(f"{quantidade}x {produto[1]} - R$ {valor_item:.2f}"))
-    
-        # Adicionar o subtotal
-        self.area_itens_pedido.addWidget(QLabel(f"Subtotal: R$ {subtotal:.2f}"))
-
-
-    def limpar_area_itens(self):
-        for i in reversed(range(self.area_itens_pedido.count())):
-            layout_item = self.area_itens_pedido.itemAt(i)
-            if layout_item.widget():
-                layout_item.widget().setParent(None)
-            elif layout_item.layout():
-                self.limpar_layout(layout_item.layout())
-
-    def limpar_layout(self, layout):
-        for i in reversed(range(layout.count())):
-            item = layout.itemAt(i)
-            if item.widget():
-                item.widget().setParent(None)
-            elif item.layout():
-                self.limpar_layout(item.layout())
+            self.reservar(produto, self.carrinho.quantidade(produto.id) + quantidade)
+
+    def item_selecionado(self):
+        indice = self.lista_itens.currentIndex()
+        if not indice.isValid():
+            QMessageBox.warning(self, "Erro", "Selecione um item do pedido.")
+            return None
+        return self.carrinho.item(indice.row())
+
+    def alterar_item(self):
+        item = self.item_selecionado()
+        if item is None:
+            return
+        produto, atual = item
+        # O disponível do catálogo já desconta o que este carrinho reservou
+        catalogo = ProdutoCatalog.por_id(produto.id)
+        maximo = (catalogo.disponivel if catalogo else 0) + atual
+        quantidade, ok = QInputDialog.getInt(self, "Quantidade", f"Quantidade de {produto.nome} (máx. {maximo}):",
+                                             atual, 1, maximo)
+        if ok and quantidade != atual:
+            self.reservar(produto, quantidade)
+
+    def remover_item(self):
+        item = self.item_selecionado()
+        if item is not None:
+            self.reservar(item[0], 0)
+
+    def travar_pedido(self, travado):
+        # Enquanto uma reserva ou a finalização não volta, nada muda o
+        # carrinho: um total velho ou um carrinho trocado no meio deixariam
+        # reservas presas no id antigo até expirarem
+        for widget in (self.scroll_area, self.painel_pedido, self.btn_finalizar_pedido, self.btn_cancelar_pedido):
+            widget.setEnabled(not travado)
+
+    def reservar(self, produto, total):
+        # A reserva é do total do produto no carrinho; a próxima não pode sair de um total velho
+        self.travar_pedido(True)
+        DBAssincrono.executar(ServicoReservas.reservar, self.carrinho.id, produto.id, total, dono=self,
+                              ao_concluir=lambda _: self.item_reservado(produto, total),
+                              ao_falhar=self.falha_reserva)
+
+    def item_reservado(self, produto, total):
+        self.travar_pedido(False)
+        self.carrinho.definir(produto, total)
+
+    def falha_reserva(self, erro):
+        self.travar_pedido(False)
+        if isinstance(erro, EstoqueInsuficiente):
+            QMessageBox.warning(self, "Erro", str(erro))
+        else:
+            QMessageBox.warning(self, "Erro", f"Não foi possível reservar o produto: {erro}")
+
+    def liberar_reservas(self):
+        # As reservas de um carrinho em finalização são da venda; se ela
+        # falhar, falha_finalizar as libera
+        if self.carrinho.rowCount():
+            if self.carrinho.id != self.finalizando:
+                DBAssincrono.executar(ServicoReservas.liberar, self.carrinho.id)
+            self.carrinho.limpar()
+
+    def cancelar_pedido(self):
+        if self.carrinho.rowCount():
+            confirma = QMessageBox.question(self, "Cancelar Pedido", "Descartar os itens deste pedido?",
+                                            QMessageBox.Yes | QMessageBox.No)
+            if confirma != QMessageBox.Yes:
+                return
+        self.reiniciar()
 
     def finalizar_pedido(self):
-        if not self.itens_pedido: # se vazio !!
+        if not self.carrinho.rowCount(): # se vazio !!
             QMessageBox.warning(self, "Erro", "Adicione itens ao pedido antes de finalizar!")
             return
 
         cliente, ok = QInputDialog.getText(self, "Nome do Cliente", "Digite o nome do cliente:")
         if ok and cliente:
-            itens_str = ", ".join([f"{q}x {p[1]}" for p, q in self.itens_pedido])
-            data_hora = QDateTime.currentDateTime().toString("yyyy-MM-dd HH:mm:ss")
-
-            DBManager.execute_query("INSERT INTO pedidos (cliente, status, data_hora, itens) VALUES (?, ?, ?, ?)",
-                                    (cliente, "Aberto", data_hora, itens_str))
-
-            for produto, quantidade in self.itens_pedido:
-                DBManager.execute_query("UPDATE produtos SET quantidade = quantidade - ? WHERE id = ?", (quantidade, produto[0]))
-
-            total_venda = sum(p[3] * q for p, q in self.itens_pedido)
-            DBManager.execute_query("INSERT INTO fluxo_caixa (data, tipo, valor) VALUES (?, ?, ?)",
-                                    (QDate.currentDate().toString("yyyy-MM-dd"), "Venda", total_venda))
-
-            self.voltar_ao_kanban()
+            self.finalizando = self.carrinho.id
+            self.travar_pedido(True)
+            self.btn_finalizar_pedido.setText("Finalizando...")
+            DBAssincrono.executar(ServicoPedidos.finalizar, cliente, self.carrinho.itens_venda(), self.carrinho.id,
+                                  dono=self, ao_concluir=lambda _: self.pedido_finalizado(), ao_falhar=self.falha_finalizar)
         else:
             QMessageBox.warning(self, "Erro", "É necessário informar o nome do cliente!")
 
+    def pedido_finalizado(self):
+        # As reservas viraram a venda: o carrinho recomeça sem liberar nada.
+        # Se ele já foi trocado (janela fechando), não há mais o que desfazer
+        carrinho, self.finalizando = self.finalizando, None
+        if self.carrinho.id != carrinho:
+            return
+        self.carrinho.limpar()
+        self.reiniciar()
+        self.voltar_ao_kanban()
+
+    def falha_finalizar(self, erro):
+        carrinho, self.finalizando = self.finalizando, None
+        if self.carrinho.id != carrinho:
+            # O carrinho foi abandonado durante a finalização: ninguém mais
+            # vai usar as reservas dele
+            DBAssincrono.executar(ServicoReservas.liberar, carrinho)
+            return
+        self.travar_pedido(False)
+        self.btn_finalizar_pedido.setText("Finalizar Pedido")
+        if isinstance(erro, EstoqueInsuficiente):
+            QMessageBox.warning(self, "Erro", str(erro))
+        else:
+            QMessageBox.warning(self, "Erro", f"Não foi possível finalizar o pedido: {erro}")
+
     def voltar_ao_kanban(self):
         self.parent.mostrar_kanban()
 
@@ -352,6 +1079,10 @@ class GerenciarEstoque(QWidget):
         self.preco.setPlaceholderText("Preço")
         layout.addWidget(self.preco)
 
+        self.categoria = QLineEdit()
+        self.categoria.setPlaceholderText("Categoria (opcional)")
+        layout.addWidget(self.categoria)
+
         btn_adicionar = QPushButton("Adicionar Produto")
         btn_adicionar.clicked.connect(self.adicionar_produto)
         layout.addWidget(btn_adicionar)
@@ -367,20 +1098,46 @@ class GerenciarEstoque(QWidget):
 
         layout.addLayout(btn_layout)
 
-        self.tabela_produtos = QTableWidget()
-        self.tabela_produtos.setColumnCount(4)
-        self.tabela_produtos.setHorizontalHeaderLabels(["ID", "Nome", "Quantidade", "Preço"])
+        planilha_layout = QHBoxLayout()
+        btn_importar = QPushButton("Importar Planilha")
+        btn_importar.clicked.connect(self.importar_planilha)
+        planilha_layout.addWidget(btn_importar)
+
+        btn_exportar = QPushButton("Exportar Produtos")
+        btn_exportar.clicked.connect(self.exportar_produtos)
+        planilha_layout.addWidget(btn_exportar)
+
+        layout.addLayout(planilha_layout)
+
+        self.modelo_produtos = ModeloPaginado(["ID", "Nome", "Quantidade", "Preço", "Categoria"],
+                                              "SELECT id, nome, quantidade, printf('%.2f', preco_centavos / 100.0), categoria "
+                                              "FROM produtos", ("id",), (0,),
+                                              parent=self)
+        self.tabela_produtos = QTableView()
+        self.tabela_produtos.setModel(self.modelo_produtos)
+        self.tabela_produtos.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.tabela_produtos.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.tabela_produtos)
 
+        self.label_carregando = QLabel("Carregando produtos...")
+        self.modelo_produtos.carregamento_alterado.connect(self.label_carregando.setVisible)
+        layout.addWidget(self.label_carregando)
+
         self.carregar_produtos()
 
     def carregar_produtos(self):
-        produtos = DBManager.execute_query("SELECT id, nome, quantidade, preco FROM produtos")
-        self.tabela_produtos.setRowCount(len(produtos))
-        for row, produto in enumerate(produtos):
-            for col, valor in enumerate(produto):
-                self.tabela_produtos.setItem(row, col, QTableWidgetItem(str(valor)))
+        with Perfil.medir("tela", "GerenciarEstoque.carregar_produtos"):
+            self.modelo_produtos.recarregar()
+
+    def produtos_alterados(self, versao):
+        self.carregar_produtos()
+
+    def reexibir(self):
+        self.carregar_produtos()
+
+    def produto_selecionado(self):
+        indice = self.tabela_produtos.currentIndex()
+        return self.modelo_produtos.linha(indice.row()) if indice.isValid() else None
 
     def adicionar_produto(self):
         nome = self.nome.text()
@@ -393,125 +1150,349 @@ class GerenciarEstoque(QWidget):
 
         try:
             quantidade = int(quantidade)
-            preco = float(preco)
+            preco = Dinheiro.de_reais(preco)
         except ValueError:
             QMessageBox.warning(self, "Erro", "Quantidade deve ser um número inteiro e Preço deve ser um número decimal!")
             return
 
-        DBManager.execute_query("INSERT INTO produtos (nome, quantidade, preco) VALUES (?, ?, ?)",
-                                (nome, quantidade, preco))
+        DBAssincrono.executar(ServicoProdutos.adicionar, nome, quantidade, preco, self.categoria.text().strip(),
+                              dono=self, ao_concluir=self.produto_adicionado)
 
+    def produto_adicionado(self, _):
         QMessageBox.information(self, "Sucesso", "Produto adicionado com sucesso!")
         self.nome.clear()
         self.quantidade.clear()
         self.preco.clear()
+        self.categoria.clear()
         self.carregar_produtos()
 
     def excluir_produto(self):
-        row = self.tabela_produtos.currentRow()
-        if row > -1:
-            produto_id = self.tabela_produtos.item(row, 0).text()
+        produto = self.produto_selecionado()
+        if produto:
+            produto_id = produto[0]
             confirma = QMessageBox.question(self, 'Confirmar Exclusão',
                                             "Tem certeza que deseja excluir este produto?",
                                             QMessageBox.Yes | QMessageBox.No)
             if confirma == QMessageBox.Yes:
-                DBManager.execute_query("DELETE FROM produtos WHERE id = ?", (produto_id,))
-                self.carregar_produtos()
+                DBAssincrono.executar(ServicoProdutos.excluir, produto_id, dono=self,
+                                      ao_concluir=lambda _: self.carregar_produtos())
         else:
             QMessageBox.warning(self, "Erro", "Selecione um produto para excluir.")
 
     def editar_produto(self):
-        row = self.tabela_produtos.currentRow()
-        if row > -1:
-            produto_id = self.tabela_produtos.item(row, 0).text()
-            nome_atual = self.tabela_produtos.item(row, 1).text()
-            quantidade_atual = self.tabela_produtos.item(row, 2).text()
-            preco_atual = self.tabela_produtos.item(row, 3).text()
+        produto = self.produto_selecionado()
+        if produto:
+            produto_id, nome_atual, quantidade_atual, preco_atual, categoria_atual = produto
 
             nome, ok1 = QInputDialog.getText(self, 'Editar Produto', 'Nome:', text=nome_atual)
             if ok1:
                 quantidade, ok2 = QInputDialog.getInt(self, 'Editar Produto', 'Quantidade:', int(quantidade_atual))
                 if ok2:
-                    preco, ok3 = QInputDialog.getDouble(self, 'Editar Produto', 'Preço:', float(preco_atual))
+                    # Texto, não getDouble: o preço vai do que foi digitado para centavos sem passar por float
+                    preco, ok3 = QInputDialog.getText(self, 'Editar Produto', 'Preço:', text=preco_atual)
                     if ok3:
-                        DBManager.execute_query("UPDATE produtos SET nome = ?, quantidade = ?, preco = ? WHERE id = ?",
-                                                (nome, quantidade, preco, produto_id))
-                        self.carregar_produtos()
+                        try:
+                            preco = Dinheiro.de_reais(preco)
+                        except ValueError:
+                            QMessageBox.warning(self, "Erro", "Preço deve ser um número decimal!")
+                            return
+                        if preco < Dinheiro():
+                            QMessageBox.warning(self, "Erro", "O preço não pode ser negativo!")
+                            return
+                        categoria, ok4 = QInputDialog.getText(self, 'Editar Produto', 'Categoria:', text=categoria_atual)
+                        if ok4:
+                            DBAssincrono.executar(ServicoProdutos.editar, produto_id, nome, quantidade, preco,
+                                                  categoria.strip(), dono=self,
+                                                  ao_concluir=lambda _: self.carregar_produtos())
         else:
             QMessageBox.warning(self, "Erro", "Selecione um produto para editar.")
 
+    def importar_planilha(self):
+        caminho, _ = QFileDialog.getOpenFileName(self, "Importar Planilha", "", "Planilhas (*.csv *.json *.jsonl)")
+        if not caminho:
+            return
+        chave, ok = QInputDialog.getItem(self, "Importar Planilha", "Identificar os produtos pelo:", ["nome", "sku"], 0, False)
+        if not ok:
+            return
+        modos = ["Substituir o estoque pela quantidade da planilha", "Somar a quantidade da planilha ao estoque"]
+        modo, ok = QInputDialog.getItem(self, "Importar Planilha", "Quantidade:", modos, 0, False)
+        if ok:
+            import importacao
+            executar_com_progresso(self, "Importando produtos...", importacao.importar_produtos, caminho, chave,
+                                   modo == modos[1], ao_concluir=self.planilha_importada)
+
+    def planilha_importada(self, resultado):
+        erros = "\n".join(f"Linha {linha}: {mensagem}" for linha, mensagem in resultado.erros[:20])
+        QMessageBox.information(self, "Importação Concluída", f"{resultado}." + (f"\n\n{erros}" if erros else ""))
+        self.carregar_produtos()
+
+    def exportar_produtos(self):
+        caminho, _ = QFileDialog.getSaveFileName(self, "Exportar Produtos", "produtos.csv",
+                                                 "CSV (*.csv);;JSON (*.json);;JSON Lines (*.jsonl)")
+        if caminho:
+            import importacao
+            executar_com_progresso(self, "Exportando produtos...", importacao.exportar, "produtos", caminho,
+                                   ao_concluir=lambda linhas: QMessageBox.information(
+                                       self, "Sucesso", f"{linhas} produtos exportados."))
+
 
 class HistoricoPedidos(QWidget):
     def __init__(self, parent):
         super().__init__(parent)
+        self.relatorio_pedido = 0
         self.init_ui()
 
     def init_ui(self):
         layout = QVBoxLayout(self)
 
+        datas_layout = QHBoxLayout()
         self.date_select = QDateEdit(calendarPopup=True)
         self.date_select.setDate(QDate.currentDate())
-        self.date_select.dateChanged.connect(self.atualizar_relatorio)
-        layout.addWidget(self.date_select)
+        self.date_select.dateChanged.connect(self.data_inicio_alterada)
+        datas_layout.addWidget(QLabel("De:"))
+        datas_layout.addWidget(self.date_select)
+
+        self.date_fim = QDateEdit(calendarPopup=True)
+        self.date_fim.setDate(QDate.currentDate())
+        self.date_fim.dateChanged.connect(self.atualizar_relatorio)
+        datas_layout.addWidget(QLabel("Até:"))
+        datas_layout.addWidget(self.date_fim)
+        layout.addLayout(datas_layout)
 
         btn_gerar_relatorio = QPushButton("Gerar Relatório")
         btn_gerar_relatorio.clicked.connect(self.atualizar_relatorio)
         layout.addWidget(btn_gerar_relatorio)
 
+        exportar_layout = QHBoxLayout()
+        btn_exportar_pedidos = QPushButton("Exportar Pedidos do Período")
+        btn_exportar_pedidos.clicked.connect(lambda: self.exportar_periodo("pedidos"))
+        exportar_layout.addWidget(btn_exportar_pedidos)
+
+        btn_exportar_caixa = QPushButton("Exportar Caixa do Período")
+        btn_exportar_caixa.clicked.connect(lambda: self.exportar_periodo("caixa"))
+        exportar_layout.addWidget(btn_exportar_caixa)
+        layout.addLayout(exportar_layout)
+
         self.relatorio_area = QTextEdit()
         self.relatorio_area.setReadOnly(True)
         layout.addWidget(self.relatorio_area)
 
-        self.tabela_historico = QTableWidget()
-        self.tabela_historico.setColumnCount(5)
-        self.tabela_historico.setHorizontalHeaderLabels(["ID", "Cliente", "Status", "Data/Hora", "Itens"])
+        self.modelo_historico = ModeloPaginado(["ID", "Cliente", "Status", "Data/Hora", "Itens"],
+                                               "SELECT id, cliente, status, data_hora, itens FROM todos_pedidos",
+                                               ("data_hora", "id"), (3, 0), descendente=True, parent=self)
+        self.tabela_historico = QTableView()
+        self.tabela_historico.setModel(self.modelo_historico)
         self.tabela_historico.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.tabela_historico)
 
+        self.label_carregando = QLabel("Carregando pedidos...")
+        self.modelo_historico.carregamento_alterado.connect(self.label_carregando.setVisible)
+        layout.addWidget(self.label_carregando)
+
         self.carregar_historico()
         self.atualizar_relatorio()
 
     def carregar_historico(self):
-        pedidos = DBManager.execute_query("SELECT id, cliente, status, data_hora, itens FROM pedidos ORDER BY data_hora DESC")
-        self.tabela_historico.setRowCount(len(pedidos))
-        for row, pedido in enumerate(pedidos):
-            for col, valor in enumerate(pedido):
-                self.tabela_historico.setItem(row, col, QTableWidgetItem(str(valor)))
+        with Perfil.medir("tela", "HistoricoPedidos.carregar_historico"):
+            self.modelo_historico.recarregar()
+
+    def reexibir(self):
+        self.carregar_historico()
+        self.atualizar_relatorio()
+
+    def data_inicio_alterada(self, data):
+        # Escolher só o início volta ao relatório de um dia
+        if self.date_fim.date() != data:
+            self.date_fim.setDate(data)
+        else:
+            self.atualizar_relatorio()
+
+    def periodo(self):
+        inicio = self.date_select.date().toString("yyyy-MM-dd")
+        fim = self.date_fim.date().toString("yyyy-MM-dd")
+        return (fim, inicio) if fim < inicio else (inicio, fim)
+
+    def exportar_periodo(self, tipo):
+        inicio, fim = self.periodo()
+        caminho, _ = QFileDialog.getSaveFileName(self, "Exportar", f"{tipo}_{inicio}_{fim}.csv",
+                                                 "CSV (*.csv);;JSON (*.json);;JSON Lines (*.jsonl)")
+        if caminho:
+            import importacao
+            executar_com_progresso(self, f"Exportando {tipo}...", importacao.exportar, tipo, caminho, inicio, fim,
+                                   ao_concluir=lambda linhas: QMessageBox.information(
+                                       self, "Sucesso", f"{linhas} linhas exportadas."))
 
     def atualizar_relatorio(self):
-        data_selecionada = self.date_select.date().toString("yyyy-MM-dd")
-        
-        total_vendas = DBManager.execute_query("SELECT SUM(valor) FROM fluxo_caixa WHERE data = ? AND tipo = 'Venda'", (data_selecionada,))[0][0] or 0
-        total_despesas = DBManager.execute_query("SELECT SUM(valor) FROM fluxo_caixa WHERE data = ? AND tipo LIKE 'Despesa%'", (data_selecionada,))[0][0] or 0
-        detalhes = DBManager.execute_query("SELECT * FROM fluxo_caixa WHERE data = ? ORDER BY tipo", (data_selecionada,))
-        
-        relatorio = f"Relatório de Caixa - {data_selecionada}\n\n"
-        relatorio += f"Total de Vendas: R$ {total_vendas:.2f}\n"
-        relatorio += f"Total de Despesas: R$ {total_despesas:.2f}\n"
-        relatorio += f"Saldo do Dia: R$ {total_vendas - total_despesas:.2f}\n\n"
-        relatorio += "Detalhes:\n"
-        
-        # Buscar todas as vendas do dia
-        vendas = DBManager.execute_query("SELECT id, cliente, itens FROM pedidos WHERE data_hora LIKE ?", (f"{data_selecionada}%",))
-        
-        for item in detalhes:
-            if item[2] == "Venda":
-                venda_id = item[0]  # Assumindo que o ID da venda no fluxo_caixa corresponde ao ID do pedido
-                venda = next((v for v in vendas if v[0] == venda_id), None)
-                if venda:
-                    relatorio += f"Venda #{venda[0]} - Cliente: {venda[1]} - R$ {item[3]:.2f}\n"
-                    relatorio += f"  Itens: {venda[2]}\n"
-                else:
-                    relatorio += f"{item[2]}: R$ {item[3]:.2f}\n"
-            else:
-                relatorio += f"{item[2]}: R$ {item[3]:.2f}\n"
-    
-        self.relatorio_area.setText(relatorio)
+        inicio, fim = self.periodo()
+        # Só o relatório mais recente é exibido, mesmo que um anterior termine depois
+        self.relatorio_pedido += 1
+        pedido = self.relatorio_pedido
+        self.relatorio_area.setText("Carregando relatório...")
+        DBAssincrono.executar(RelatorioCaixa.texto, inicio, fim, dono=self,
+                              ao_concluir=lambda texto: pedido == self.relatorio_pedido and self.relatorio_area.setText(texto))
+
+def criar_tabela(colunas):
+    tabela = QTableWidget(0, len(colunas))
+    tabela.setHorizontalHeaderLabels(colunas)
+    tabela.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    tabela.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+    tabela.horizontalHeader().setStretchLastSection(True)
+    return tabela
+
+def preencher_tabela(tabela, linhas):
+    tabela.setRowCount(len(linhas))
+    for i, linha in enumerate(linhas):
+        for j, valor in enumerate(linha):
+            tabela.setItem(i, j, QTableWidgetItem(f"{valor:.2f}" if isinstance(valor, float) else str(valor)))
+
+class PainelCozinha(QWidget):
+    # Tempos de espera e preparo, vazão e fila da cozinha num dia. Com o dia
+    # de hoje selecionado, acompanha as mudanças de status dos pedidos
+    COLUNAS_ETAPAS = ("Etapa", "Pedidos", "Mediana", "p95", "Máximo")
+    COLUNAS_HORAS = ("Hora", "Entradas", "Iniciados", "Prontos", "Concluídos", "Fila", "")
 
-if __name__ == "__main__":
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.carregando = False
+        self.pendente = False
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+
+        data_layout = QHBoxLayout()
+        data_layout.addWidget(QLabel("Dia:"))
+        self.date_select = QDateEdit(calendarPopup=True)
+        self.date_select.setDate(QDate.currentDate())
+        self.date_select.dateChanged.connect(self.carregar)
+        data_layout.addWidget(self.date_select)
+        self.label_resumo = QLabel("Carregando indicadores...")
+        data_layout.addWidget(self.label_resumo, 1)
+        layout.addLayout(data_layout)
+
+        self.tabela_etapas = criar_tabela(self.COLUNAS_ETAPAS)
+        self.tabela_etapas.setMaximumHeight(160)
+        layout.addWidget(self.tabela_etapas)
+        self.tabela_horas = criar_tabela(self.COLUNAS_HORAS)
+        layout.addWidget(self.tabela_horas)
+
+        self.carregar()
+
+    def dia(self):
+        return self.date_select.date().toString("yyyy-MM-dd")
+
+    def pedidos_alterados(self, desde, alteracoes):
+        if self.date_select.date() == QDate.currentDate():
+            self.carregar()
+
+    def reexibir(self):
+        self.pedidos_alterados(0, [])
+
+    def carregar(self):
+        # Mudanças chegando durante uma leitura viram uma leitura só no fim dela
+        if self.carregando:
+            self.pendente = True
+            return
+        import analise
+        with Perfil.medir("tela", "PainelCozinha.carregar"):
+            self.carregando = True
+            DBAssincrono.executar(analise.painel, self.dia(), dono=self, ao_concluir=self.exibir,
+                                  ao_falhar=self.falha_carregar)
+
+    def falha_carregar(self, erro):
+        self.carregando = False
+        self.label_resumo.setText(f"Não foi possível carregar os indicadores: {erro}")
+
+    def exibir(self, dados):
+        import analise
+        self.carregando = False
+        if self.pendente or dados["dia"] != self.dia():
+            self.pendente = False
+            self.carregar()
+            if dados["dia"] != self.dia():
+                return
+        pico = f", pico de vazão às {dados['hora_pico']}h" if dados["hora_pico"] is not None else ""
+        self.label_resumo.setText(f"{dados['entradas']} pedidos entraram, {dados['prontos']} ficaram prontos, "
+                                  f"fila máxima de {dados['fila_maxima']}{pico}")
+        preencher_tabela(self.tabela_etapas, [
+            (etapa["etapa"], etapa["pedidos"], analise.formatar_duracao(etapa["p50_s"]),
+             analise.formatar_duracao(etapa["p95_s"]), analise.formatar_duracao(etapa["max_s"]))
+            for etapa in dados["etapas"]])
+        escala = max(dados["fila_maxima"], 1)
+        preencher_tabela(self.tabela_horas, [
+            (f"{hora['hora']:02d}h", hora["entradas"], hora["iniciados"], hora["prontos"], hora["concluidos"],
+             hora["fila"], "█" * round(max(hora["fila"], 0) * 30 / escala))
+            for hora in dados["horas"]])
+
+class PainelPerfil(QDialog):
+    # Ctrl+Shift+P: o que o buffer do perfil tem agora, agrupado e cru
+    COLUNAS_RESUMO = ("Tipo", "Nome", "N", "Total ms", "Mediana ms", "p95 ms", "Máx ms")
+    COLUNAS_RECENTES = ("Hora", "Tipo", "Nome", "ms", "Linhas", "Thread")
+    RECENTES = 300
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setWindowTitle("Perfil de desempenho")
+        self.resize(1000, 600)
+        layout = QVBoxLayout(self)
+
+        self.abas = QTabWidget()
+        self.tabela_resumo = criar_tabela(self.COLUNAS_RESUMO)
+        self.tabela_recentes = criar_tabela(self.COLUNAS_RECENTES)
+        self.texto_lentas = QTextEdit()
+        self.texto_lentas.setReadOnly(True)
+        self.abas.addTab(self.tabela_resumo, "Resumo")
+        self.abas.addTab(self.tabela_recentes, "Recentes")
+        self.abas.addTab(self.texto_lentas, "Consultas lentas")
+        layout.addWidget(self.abas)
+
+        botoes_layout = QHBoxLayout()
+        for texto, callback in (("Atualizar", self.atualizar), ("Exportar JSON", self.exportar), ("Limpar", self.limpar)):
+            btn = QPushButton(texto)
+            btn.clicked.connect(callback)
+            botoes_layout.addWidget(btn)
+        layout.addLayout(botoes_layout)
+
+    def atualizar(self):
+        medicoes = Perfil.medicoes()
+        preencher_tabela(self.tabela_resumo, [
+            (r["tipo"], " ".join(r["nome"].split()), r["n"], r["total_ms"], r["mediana_ms"], r["p95_ms"], r["max_ms"])
+            for r in perfil.resumo(medicoes)])
+        preencher_tabela(self.tabela_recentes, [
+            (time.strftime("%H:%M:%S", time.localtime(m["quando"])), m["tipo"], " ".join(m["nome"].split()),
+             m["duracao_ms"], "" if m["linhas"] is None else m["linhas"], m["thread"])
+            for m in reversed(medicoes[-self.RECENTES:])])
+        lentas = Perfil.consultas_lentas()
+        linhas = [f"Limite: {Perfil.limite_lenta_ms} ms - {len(lentas)} consultas", ""]
+        for lenta in reversed(lentas):
+            linhas.append(f"{time.strftime('%H:%M:%S', time.localtime(lenta['quando']))}  {lenta['duracao_ms']:.1f} ms  "
+                          f"{' '.join(lenta['sql'].split())}")
+            linhas.extend(f"    {passo}" for passo in lenta["plano"])
+        self.texto_lentas.setPlainText("\n".join(linhas))
+
+    def exportar(self):
+        caminho, _ = QFileDialog.getSaveFileName(self, "Exportar perfil", "perfil.json", "JSON (*.json)")
+        if caminho:
+            Perfil.exportar(caminho)
+
+    def limpar(self):
+        Perfil.limpar()
+        self.atualizar()
+
+def main():
     DBManager.initialize_database()
-    app = QApplication(sys.argv)
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.aboutToQuit.connect(DBManager.fechar_conexoes)
+    Perfil.instalar_sinal()
+    # O handler de sinal do Python só roda quando o interpretador ganha a
+    # vez; o timer garante isso mesmo com o event loop do Qt parado
+    timer_sinais = QTimer()
+    timer_sinais.timeout.connect(lambda: None)
+    timer_sinais.start(500)
     janela = EstoqueApp()
     janela.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+if __name__ == "__main__":
+    sys.exit(main())
 
@@ -0,0 +1,386 @@
+# Importação e exportação em massa: lista de preços do fornecedor, contagem de
+# inventário, pedidos e caixa de um período. Tudo em streaming: o arquivo é
+# lido e escrito linha a linha por geradores, e a gravação vai em lotes de
+# LOTE linhas por transação, liberando o lock de escrita entre um lote e outro
+# para os caixas continuarem vendendo.
+#
+# Uso: python importacao.py importar produtos.csv [--chave nome|sku] [--somar] [--banco estoque.db]
+#      python importacao.py exportar produtos|pedidos|caixa saida.csv [--inicio AAAA-MM-DD] [--fim AAAA-MM-DD]
+#
+# Formatos pela extensão: .csv (separador , ou ; detectado), .json (lista de
+# objetos) e .jsonl (um objeto por linha).
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import date
+
+import servicos
+from servicos import DBManager, Dinheiro, nas_duas_partes, normalizar
+
+LOTE = 2000
+MAXIMO_ERROS = 100
+TAMANHO_BLOCO = 64 * 1024
+CHAVES = ("nome", "sku")
+
+# Cabeçalhos aceitos além dos nomes das colunas, já sem acento e minúsculos
+SINONIMOS = {
+    "produto": "nome", "descricao": "nome",
+    "estoque": "quantidade", "qtd": "quantidade", "qtde": "quantidade",
+    "valor": "preco", "preco unitario": "preco",
+    "codigo": "sku", "cod": "sku", "referencia": "sku",
+}
+
+# Os arquivos continuam em reais: centavos / 100.0 sai como o decimal de duas
+# casas (12.5, 0.1), o mesmo texto que a importação lê de volta
+EXPORTACOES = {
+    "produtos": (
+        ["id", "sku", "nome", "quantidade", "preco", "categoria"],
+        "SELECT COUNT(*) FROM produtos",
+        "SELECT id, sku, nome, quantidade, preco_centavos / 100.0, categoria FROM produtos ORDER BY id",
+        False,
+    ),
+    "pedidos": (
+        ["id", "cliente", "status", "data_hora", "itens", "total"],
+        "SELECT COUNT(*) FROM todos_pedidos WHERE data_hora >= ? AND data_hora < date(?, '+1 day')",
+        # Pedidos e lançamentos arquivados saem juntos no mesmo arquivo morto
+        nas_duas_partes("SELECT p.id AS id, p.cliente, p.status, p.data_hora, p.itens, f.valor_centavos / 100.0 "
+                        "FROM {parte}.pedidos p LEFT JOIN {parte}.fluxo_caixa f ON f.pedido_id = p.id AND f.tipo = 'Venda' "
+                        "WHERE p.data_hora >= ?1 AND p.data_hora < date(?2, '+1 day')") + " ORDER BY data_hora, id",
+        True,
+    ),
+    "caixa": (
+        ["id", "data", "tipo", "valor", "pedido_id"],
+        "SELECT COUNT(*) FROM todo_fluxo_caixa WHERE data BETWEEN ? AND ?",
+        "SELECT id, data, tipo, valor_centavos / 100.0, pedido_id FROM todo_fluxo_caixa WHERE data BETWEEN ? AND ? "
+        "ORDER BY data, id",
+        True,
+    ),
+}
+
+class ErroImportacao(Exception):
+    pass
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.lidas = 0
+        self.inseridos = 0
+        self.atualizados = 0
+        self.invalidas = 0
+        self.erros = []
+        self.cancelado = False
+
+    def erro(self, linha, mensagem):
+        # Guarda só os primeiros erros; o total continua sendo contado
+        self.invalidas += 1
+        if len(self.erros) < MAXIMO_ERROS:
+            self.erros.append((linha, mensagem))
+
+    def __str__(self):
+        texto = (f"{self.lidas} linhas lidas: {self.inseridos} produtos novos, {self.atualizados} atualizados, "
+                 f"{self.invalidas} inválidas")
+        if self.cancelado:
+            texto += " (importação cancelada; os lotes anteriores já foram gravados)"
+        return texto
+
+def formato(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in (".csv", ".json", ".jsonl"):
+        raise ErroImportacao(f"Formato não suportado: {extensao or caminho} (use .csv, .json ou .jsonl)")
+    return extensao
+
+def coluna(nome):
+    nome = normalizar(str(nome)).strip().replace("_", " ")
+    return SINONIMOS.get(nome, nome)
+
+def ler_csv(texto):
+    # O separador é detectado na primeira linha (Excel em português usa ;)
+    cabecalho = texto.readline()
+    separador = ";" if cabecalho.count(";") > cabecalho.count(",") else ","
+    leitor = csv.reader(texto, delimiter=separador)
+    colunas = [coluna(nome) for nome in next(csv.reader([cabecalho], delimiter=separador), [])]
+    for valores in leitor:
+        if any(valor.strip() for valor in valores):
+            yield leitor.line_num + 1, dict(zip(colunas, valores))
+
+def ler_json(texto):
+    # Lista JSON lida objeto a objeto com raw_decode, sem carregar o arquivo
+    # inteiro; sem "[" no começo, é JSON Lines
+    decodificador = json.JSONDecoder()
+    buffer = texto.read(TAMANHO_BLOCO)
+    if not buffer.lstrip().startswith("["):
+        for numero, linha in enumerate(_linhas(buffer, texto), 1):
+            if linha.strip():
+                try:
+                    objeto = json.loads(linha)
+                except json.JSONDecodeError as e:
+                    raise ErroImportacao(f"Linha {numero}: JSON inválido ({e.msg})") from None
+                yield numero, _objeto(objeto, numero)
+        return
+    buffer = buffer.lstrip()[1:]
+    numero = 0
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            objeto, fim = decodificador.raw_decode(buffer)
+        except json.JSONDecodeError:
+            bloco = texto.read(TAMANHO_BLOCO)
+            if not bloco:
+                raise ErroImportacao(f"JSON incompleto depois do registro {numero}") from None
+            buffer += bloco
+            continue
+        numero += 1
+        yield numero, _objeto(objeto, numero)
+        buffer = buffer[fim:]
+        if len(buffer) < TAMANHO_BLOCO:
+            buffer += texto.read(TAMANHO_BLOCO)
+
+def _linhas(inicio, texto):
+    # O primeiro bloco já foi lido para ver se era lista: completa a última
+    # linha dele e segue lendo o arquivo linha a linha
+    partes = inicio.splitlines(keepends=True)
+    if partes and not partes[-1].endswith("\n"):
+        partes[-1] += texto.readline()
+    yield from partes
+    yield from texto
+
+def _objeto(objeto, numero):
+    if not isinstance(objeto, dict):
+        raise ErroImportacao(f"Registro {numero} não é um objeto JSON")
+    return {coluna(chave): valor for chave, valor in objeto.items()}
+
+def ler_registros(caminho, progresso=None):
+    # Gera (número da linha, {coluna: valor}); progresso recebe os bytes lidos
+    extensao = formato(caminho)
+    with open(caminho, "rb") as bruto:
+        texto = io.TextIOWrapper(bruto, encoding="utf-8-sig", newline="" if extensao == ".csv" else None)
+        registros = ler_csv(texto) if extensao == ".csv" else ler_json(texto)
+        for i, registro in enumerate(registros):
+            if progresso and i % LOTE == 0:
+                progresso(bruto.tell())
+            yield registro
+
+def numero_inteiro(valor):
+    if isinstance(valor, bool):
+        raise ValueError
+    if isinstance(valor, int):
+        return valor
+    # "10" e "10,0" valem; "10,5" não
+    numero = float(str(valor).strip().replace(",", "."))
+    if not numero.is_integer():
+        raise ValueError
+    return int(numero)
+
+def validar(registro, chave):
+    # Devolve (valor da chave, campos presentes) ou levanta ValueError
+    campos = {}
+    nome = str(registro.get("nome") or "").strip()
+    if nome:
+        campos["nome"] = nome
+    sku = str(registro.get("sku") or "").strip()
+    if sku:
+        campos["sku"] = sku
+    if str(registro.get("quantidade", "")).strip():
+        try:
+            campos["quantidade"] = numero_inteiro(registro["quantidade"])
+        except ValueError:
+            raise ValueError(f"quantidade inválida: {registro['quantidade']!r}") from None
+        if campos["quantidade"] < 0:
+            raise ValueError(f"quantidade negativa: {campos['quantidade']}")
+    if str(registro.get("preco", "")).strip():
+        try:
+            preco = Dinheiro.de_reais(registro["preco"])
+        except ValueError:
+            raise ValueError(f"preço inválido: {registro['preco']!r}") from None
+        if preco < Dinheiro():
+            raise ValueError(f"preço negativo: {preco}")
+        campos["preco_centavos"] = preco.centavos
+    if registro.get("categoria") is not None:
+        campos["categoria"] = str(registro["categoria"]).strip()
+    if chave not in campos:
+        raise ValueError(f"sem {chave}")
+    return campos[chave], campos
+
+INSERIR_PRODUTO = "INSERT INTO produtos (sku, nome, quantidade, preco_centavos, categoria) VALUES (?, ?, ?, ?, ?)"
+
+def planejar_lote(cursor, lote, chave, somar, resultado):
+    # lote: {valor da chave: (linha, campos)}; a última ocorrência no lote vale.
+    # Devolve {sql: [(linha, params)]}, com os UPDATEs agrupados pelas colunas
+    # presentes (uma planilha só de preços não zera o estoque) e os INSERTs
+    chaves = list(lote)
+    marcadores = ", ".join("?" * len(chaves))
+    existentes = {linha[0] for linha in cursor.execute(
+        f"SELECT {chave} FROM produtos WHERE {chave} IN ({marcadores})", chaves)}
+
+    comandos = {}
+    for valor in chaves:
+        linha, campos = lote[valor]
+        if valor in existentes:
+            colunas = tuple(coluna for coluna in ("nome", "sku", "quantidade", "preco_centavos", "categoria")
+                            if coluna in campos and coluna != chave)
+            if not colunas:
+                continue
+            atribuicoes = ", ".join("quantidade = quantidade + ?" if coluna == "quantidade" and somar else f"{coluna} = ?"
+                                    for coluna in colunas)
+            comandos.setdefault(f"UPDATE produtos SET {atribuicoes} WHERE {chave} = ?", []).append(
+                (linha, tuple(campos[coluna] for coluna in colunas) + (valor,)))
+        elif "nome" not in campos or "preco_centavos" not in campos:
+            resultado.erro(linha, "produto novo precisa de nome e preço")
+        else:
+            comandos.setdefault(INSERIR_PRODUTO, []).append(
+                (linha, (campos.get("sku"), campos["nome"], campos.get("quantidade", 0), campos["preco_centavos"],
+                         campos.get("categoria", ""))))
+    return comandos
+
+def gravar_lote(lote, chave, somar, resultado):
+    try:
+        with DBManager.transacao() as cursor:
+            comandos = planejar_lote(cursor, lote, chave, somar, resultado)
+            for sql, linhas in comandos.items():
+                cursor.executemany(sql, [params for _, params in linhas])
+    except sqlite3.IntegrityError:
+        # Algum SKU repetido derrubou o lote: regrava linha a linha, um
+        # savepoint por linha, para recusar só as que conflitam
+        with DBManager.transacao():
+            for sql, linhas in comandos.items():
+                gravadas = []
+                for linha, params in linhas:
+                    try:
+                        with DBManager.transacao() as cursor:
+                            cursor.execute(sql, params)
+                        gravadas.append(linha)
+                    except sqlite3.IntegrityError:
+                        resultado.erro(linha, "SKU já usado por outro produto")
+                comandos[sql] = gravadas
+    for sql, linhas in comandos.items():
+        if sql == INSERIR_PRODUTO:
+            resultado.inseridos += len(linhas)
+        else:
+            resultado.atualizados += len(linhas)
+
+def gravar(lote, chave, somar, resultado):
+    try:
+        gravar_lote(lote, chave, somar, resultado)
+    except sqlite3.OperationalError as e:
+        # Não deixa ninguém repetir a importação inteira sem saber que parte
+        # já foi gravada (com --somar, repetir somaria duas vezes)
+        raise ErroImportacao(f"Falha ao gravar depois da linha {resultado.lidas - len(lote)}: {e}. "
+                             f"{resultado.inseridos} produtos novos e {resultado.atualizados} atualizações "
+                             f"já foram gravados.") from e
+
+def importar_produtos(caminho, chave="nome", somar=False, progresso=None, cancelado=None):
+    # progresso(bytes lidos, tamanho do arquivo); cancelado() é consultado
+    # entre lotes e para a importação sem desfazer o que já foi gravado
+    if chave not in CHAVES:
+        raise ErroImportacao(f"Chave de importação inválida: {chave}")
+    tamanho = os.path.getsize(caminho)
+    resultado = ResultadoImportacao()
+    lote = {}
+    for linha, registro in ler_registros(caminho, progresso and (lambda lidos: progresso(lidos, tamanho))):
+        resultado.lidas += 1
+        try:
+            valor, campos = validar(registro, chave)
+        except ValueError as e:
+            resultado.erro(linha, str(e))
+            continue
+        lote[valor] = (linha, campos)
+        if len(lote) >= LOTE:
+            gravar(lote, chave, somar, resultado)
+            lote = {}
+            if cancelado and cancelado():
+                resultado.cancelado = True
+                return resultado
+    if lote:
+        gravar(lote, chave, somar, resultado)
+    resultado.erros.sort()
+    if progresso:
+        progresso(tamanho, tamanho)
+    return resultado
+
+def exportar(tipo, caminho, inicio=None, fim=None, progresso=None, cancelado=None):
+    # progresso(linhas escritas, total); pedidos e caixa exigem o período.
+    # Cancelada, a exportação apaga o arquivo pela metade
+    colunas, contagem, consulta, por_periodo = EXPORTACOES[tipo]
+    extensao = formato(caminho)
+    params = ()
+    if por_periodo:
+        if not inicio:
+            raise ErroImportacao(f"Informe o período para exportar {tipo}")
+        params = (inicio, fim or inicio)
+
+    escritas = 0
+    with DBManager.leitura() as cursor, open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        total = cursor.execute(contagem, params).fetchone()[0]
+        cursor.execute(consulta, params)
+        if extensao == ".csv":
+            escritor = csv.writer(arquivo)
+            escritor.writerow(colunas)
+        elif extensao == ".json":
+            arquivo.write("[")
+        while True:
+            linhas = cursor.fetchmany(LOTE)
+            if not linhas:
+                break
+            if extensao == ".csv":
+                escritor.writerows(linhas)
+            else:
+                separador = ",\n" if extensao == ".json" else "\n"
+                texto = separador.join(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False) for linha in linhas)
+                arquivo.write((separador if escritas and extensao == ".json" else "") + texto)
+                if extensao == ".jsonl":
+                    arquivo.write("\n")
+            escritas += len(linhas)
+            if progresso:
+                progresso(escritas, total)
+            if cancelado and cancelado():
+                break
+        if extensao == ".json":
+            arquivo.write("]\n")
+    if cancelado and cancelado():
+        os.remove(caminho)
+        raise ErroImportacao("Exportação cancelada")
+    return escritas
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--banco", default=servicos.DB_NAME)
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    importar = comandos.add_parser("importar")
+    importar.add_argument("arquivo")
+    importar.add_argument("--chave", choices=CHAVES, default="nome")
+    importar.add_argument("--somar", action="store_true", help="soma a quantidade ao estoque em vez de substituir")
+    exportacao = comandos.add_parser("exportar")
+    exportacao.add_argument("tipo", choices=EXPORTACOES)
+    exportacao.add_argument("arquivo")
+    exportacao.add_argument("--inicio", type=date.fromisoformat)
+    exportacao.add_argument("--fim", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    servicos.DB_NAME = args.banco
+    DBManager.initialize_database()
+    inicio = time.perf_counter()
+    try:
+        if args.comando == "importar":
+            resultado = importar_produtos(args.arquivo, args.chave, args.somar,
+                                          progresso=lambda lidos, total: print(f"\r{lidos * 100 // max(total, 1)}%",
+                                                                               end="", file=sys.stderr, flush=True))
+            print(f"\r{resultado} em {time.perf_counter() - inicio:.1f}s")
+            for linha, mensagem in resultado.erros:
+                print(f"  linha {linha}: {mensagem}")
+        else:
+            escritas = exportar(args.tipo, args.arquivo, args.inicio and args.inicio.isoformat(),
+                                args.fim and args.fim.isoformat())
+            print(f"{escritas} linhas exportadas em {time.perf_counter() - inicio:.1f}s")
+    except ErroImportacao as e:
+        raise SystemExit(str(e))
+    finally:
+        DBManager.fechar_conexoes()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+# Aplica as migrações de schema pendentes e converte os pedidos antigos para
+# pedido_itens, sem abrir a interface.
+#
+# Uso: python migrar.py [caminho/do/estoque.db] [--lote 500]
+import argparse
+
+import servicos
+from servicos import DBManager
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("banco", nargs="?", default=servicos.DB_NAME)
+    parser.add_argument("--lote", type=int, default=500)
+    args = parser.parse_args()
+
+    servicos.DB_NAME = args.banco
+    versao_antes = DBManager.versao_schema()
+    DBManager.initialize_database()
+    print(f"schema: versão {versao_antes} -> {DBManager.versao_schema()}")
+
+    total = 0
+    while True:
+        processados = DBManager.backfill_pedido_itens(args.lote)
+        if not processados:
+            break
+        total += processados
+        print(f"pedidos convertidos: {total}", flush=True)
+    print("backfill concluído")
+    DBManager.fechar_conexoes()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# Instrumentação de desempenho: cada consulta do DBManager, cada espera pelo
+# lock de escrita, cada tarefa do pool e cada troca de tela vira uma medição
+# num buffer circular em memória (as últimas CAPACIDADE). Consultas acima do
+# limite de lentidão vão para o stderr junto com o EXPLAIN QUERY PLAN.
+#
+# LANCHONETE_PERFIL=0 desliga; LANCHONETE_CONSULTA_LENTA_MS muda o limite.
+# Com o programa rodando, `kill -USR1 <pid>` grava perfil-<pid>.json na pasta
+# atual; `python perfil.py perfil-<pid>.json` mostra o resumo de um arquivo.
+import collections
+import json
+import os
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+class Perfil:
+    CAPACIDADE = 5000
+    CAPACIDADE_LENTAS = 100
+
+    ativo = os.environ.get("LANCHONETE_PERFIL", "1") != "0"
+    limite_lenta_ms = float(os.environ.get("LANCHONETE_CONSULTA_LENTA_MS", "50"))
+
+    # (inicio perf_counter, duração s, tipo, nome, linhas, thread)
+    _medicoes = collections.deque(maxlen=CAPACIDADE)
+    _lentas = collections.deque(maxlen=CAPACIDADE_LENTAS)
+    _planos = {}
+
+    @classmethod
+    def registrar(cls, tipo, nome, inicio, linhas=None):
+        # deque.append é atômico: não precisa de lock entre threads
+        if cls.ativo:
+            cls._medicoes.append((inicio, time.perf_counter() - inicio, tipo, nome, linhas, threading.get_ident()))
+
+    @classmethod
+    def consulta(cls, conn, sql, params, inicio, linhas=None):
+        if not cls.ativo:
+            return
+        duracao = time.perf_counter() - inicio
+        cls._medicoes.append((inicio, duracao, "sql", sql, linhas, threading.get_ident()))
+        if duracao * 1000 >= cls.limite_lenta_ms:
+            cls._consulta_lenta(conn, sql, params, duracao, linhas)
+
+    @classmethod
+    @contextmanager
+    def medir(cls, tipo, nome):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.registrar(tipo, nome, inicio)
+
+    @classmethod
+    def _consulta_lenta(cls, conn, sql, params, duracao, linhas):
+        # O plano é o mesmo para o mesmo SQL: só roda o EXPLAIN uma vez
+        plano = cls._planos.get(sql)
+        if plano is None:
+            try:
+                plano = [linha[3] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            except (sqlite3.Error, ValueError):
+                plano = []
+            cls._planos[sql] = plano
+        cls._lentas.append((time.time(), duracao, sql, linhas, plano))
+        descricao = f"{linhas} linhas" if linhas is not None else "linhas ?"
+        # Uma escrita só, para não intercalar com o log de outra thread
+        print("\n    ".join([f"[consulta lenta] {duracao * 1000:.1f} ms, {descricao}: {' '.join(sql.split())}", *plano]),
+              file=sys.stderr)
+
+    @classmethod
+    def medicoes(cls):
+        # Cópia com horário de parede e nome da thread, mais recente por último
+        deslocamento = time.time() - time.perf_counter()
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        return [{"quando": inicio + deslocamento, "duracao_ms": duracao * 1000, "tipo": tipo, "nome": nome,
+                 "linhas": linhas, "thread": threads.get(thread, str(thread))}
+                for inicio, duracao, tipo, nome, linhas, thread in list(cls._medicoes)]
+
+    @classmethod
+    def consultas_lentas(cls):
+        return [{"quando": quando, "duracao_ms": duracao * 1000, "sql": sql, "linhas": linhas, "plano": plano}
+                for quando, duracao, sql, linhas, plano in list(cls._lentas)]
+
+    @classmethod
+    def limpar(cls):
+        cls._medicoes.clear()
+        cls._lentas.clear()
+
+    @classmethod
+    def exportar(cls, caminho):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({"pid": os.getpid(), "limite_lenta_ms": cls.limite_lenta_ms, "medicoes": cls.medicoes(),
+                       "consultas_lentas": cls.consultas_lentas()}, arquivo, ensure_ascii=False, indent=1)
+        return caminho
+
+    @classmethod
+    def instalar_sinal(cls):
+        # SIGUSR1 grava o buffer atual sem parar o programa (não existe no Windows)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: print(f"perfil gravado em {cls.exportar(f'perfil-{os.getpid()}.json')}",
+                                                           file=sys.stderr))
+
+def resumo(medicoes):
+    # Agrupa por tipo e nome; o que mais consumiu tempo no total vem primeiro.
+    # statistics só aqui: o resto do módulo roda na abertura do app
+    import statistics
+    grupos = {}
+    for medicao in medicoes:
+        grupos.setdefault((medicao["tipo"], medicao["nome"]), []).append(medicao["duracao_ms"])
+    linhas = []
+    for (tipo, nome), tempos in grupos.items():
+        tempos.sort()
+        linhas.append({"tipo": tipo, "nome": nome, "n": len(tempos), "total_ms": sum(tempos),
+                       "mediana_ms": statistics.median(tempos),
+                       "p95_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))], "max_ms": tempos[-1]})
+    linhas.sort(key=lambda linha: -linha["total_ms"])
+    return linhas
+
+def main():
+    if len(sys.argv) != 2:
+        raise SystemExit("Uso: python perfil.py perfil-<pid>.json")
+    with open(sys.argv[1], encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    print(f"{'tipo':9} {'n':>6} {'total ms':>10} {'mediana':>9} {'p95':>9} {'máx':>9}  nome")
+    for linha in resumo(dados["medicoes"]):
+        print(f"{linha['tipo']:9} {linha['n']:>6} {linha['total_ms']:>10.1f} {linha['mediana_ms']:>9.2f} "
+              f"{linha['p95_ms']:>9.2f} {linha['max_ms']:>9.2f}  {' '.join(linha['nome'].split())[:90]}")
+    if dados["consultas_lentas"]:
+        print(f"\nConsultas acima de {dados['limite_lenta_ms']} ms:")
+        for lenta in dados["consultas_lentas"]:
+            print(f"  {lenta['duracao_ms']:.1f} ms: {' '.join(lenta['sql'].split())}")
+            for passo in lenta["plano"]:
+                print(f"      {passo}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1340 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from functools import total_ordering
+
+from perfil import Perfil
+
+DB_NAME = "estoque.db"
+
+class CursorMedido(sqlite3.Cursor):
+    # Cursor das transações: cada comando dentro delas também entra no perfil
+    def execute(self, sql, params=()):
+        inicio = time.perf_counter()
+        super().execute(sql, params)
+        Perfil.consulta(self.connection, sql, params, inicio, self.rowcount if self.rowcount >= 0 else None)
+        return self
+
+    def executemany(self, sql, params):
+        inicio = time.perf_counter()
+        super().executemany(sql, params)
+        Perfil.consulta(self.connection, sql, (), inicio, self.rowcount if self.rowcount >= 0 else None)
+        return self
+
+class DBManager:
+    # Pragmas aplicados em cada conexão nova: WAL permite leitores e um escritor
+    # ao mesmo tempo (Kanban, caixa e cozinha no mesmo arquivo), NORMAL só faz
+    # fsync no checkpoint do WAL. auto_vacuum só pega num banco novo (antes
+    # do WAL e da primeira tabela); num banco existente, no próximo VACUUM
+    PRAGMAS = (
+        "PRAGMA auto_vacuum = INCREMENTAL",
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -8000",
+        "PRAGMA mmap_size = 67108864",
+        "PRAGMA temp_store = MEMORY",
+    )
+    TIMEOUT = 5.0
+    STATEMENTS_EM_CACHE = 256
+
+    _local = threading.local()
+    _lock = threading.Lock()
+    _conexoes = {}
+
+    @staticmethod
+    def initialize_database():
+        # Versão do schema fica em PRAGMA user_version; cada migração roda uma
+        # única vez, na mesma transação que atualiza a versão
+        versao = DBManager.versao_schema()
+        for numero, comandos in MIGRACOES:
+            if numero <= versao:
+                continue
+            with DBManager.transacao() as cursor:
+                for comando in comandos:
+                    cursor.execute(comando)
+                cursor.execute(f"PRAGMA user_version = {numero}")
+        # Migração que mexe nas colunas das views do arquivo as derruba
+        for comando in VIEWS_ARQUIVO:
+            DBManager.conexao().execute(comando)
+
+    @staticmethod
+    def versao_schema():
+        return DBManager.consultar_um("PRAGMA user_version")[0]
+
+    @staticmethod
+    def backfill_pedido_itens(lote=500):
+        # Converte o texto livre de pedidos.itens ("2x X-Burger, 1x Coca") em
+        # linhas de pedido_itens, um lote por transação para não travar os
+        # outros terminais. Retorna quantos pedidos foram processados.
+        limite = DBManager.consultar_um("SELECT valor FROM schema_meta WHERE chave = 'backfill_itens_ate'")
+        ultimo = DBManager.consultar_um("SELECT valor FROM schema_meta WHERE chave = 'backfill_itens_ultimo_id'")
+        if limite is None:
+            return 0
+        limite, ultimo = int(limite[0]), int(ultimo[0]) if ultimo else 0
+        if ultimo >= limite:
+            return 0
+
+        with DBManager.transacao() as cursor:
+            pedidos = cursor.execute("SELECT id, itens FROM pedidos WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                                     (ultimo, limite, lote)).fetchall()
+            produtos = {nome: (produto_id, preco_centavos) for produto_id, nome, preco_centavos
+                        in cursor.execute("SELECT id, nome, preco_centavos FROM produtos")}
+            linhas = []
+            for pedido_id, itens in pedidos:
+                for quantidade, nome in REGEX_ITENS.findall(itens or ""):
+                    produto = produtos.get(nome.strip())
+                    if produto:
+                        linhas.append((pedido_id, produto[0], int(quantidade), produto[1]))
+            cursor.executemany("INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unit_centavos) "
+                               "VALUES (?, ?, ?, ?)", linhas)
+            novo_ultimo = pedidos[-1][0] if pedidos else limite
+            cursor.execute("INSERT OR REPLACE INTO schema_meta (chave, valor) VALUES ('backfill_itens_ultimo_id', ?)",
+                           (str(novo_ultimo),))
+        return len(pedidos)
+
+    @classmethod
+    def conexao(cls):
+        # Uma conexão de longa duração por thread; reaberta se DB_NAME mudar
+        conn = getattr(cls._local, "conn", None)
+        if conn is not None and cls._local.db_name == DB_NAME:
+            return conn
+        if conn is not None:
+            cls._fechar(threading.get_ident())
+
+        # isolation_level=None: cada comando avulso é autocommit e SELECT nunca
+        # abre transação; escritas em lote usam transacao()
+        conn = sqlite3.connect(DB_NAME, timeout=cls.TIMEOUT, isolation_level=None,
+                               cached_statements=cls.STATEMENTS_EM_CACHE)
+        # O arquivo morto é anexado antes dos pragmas para também ficar em WAL
+        conn.execute("ATTACH DATABASE ? AS arquivo", (caminho_arquivo(DB_NAME),))
+        for pragma in cls.PRAGMAS:
+            conn.execute(pragma)
+        # Tabelas do arquivo só na primeira conexão de cada versão; as views
+        # são temporárias e valem só para esta conexão
+        if conn.execute("PRAGMA arquivo.user_version").fetchone()[0] != VERSAO_ARQUIVO:
+            cls._migrar_arquivo(conn)
+        for comando in VIEWS_ARQUIVO:
+            conn.execute(comando)
+        cls._local.conn = conn
+        cls._local.db_name = DB_NAME
+        cls._local.savepoints = 0
+        with cls._lock:
+            cls._conexoes[threading.get_ident()] = conn
+        return conn
+
+    @staticmethod
+    def _migrar_arquivo(conn):
+        # Versão relida com o lock de escrita: outro terminal pode ter
+        # migrado o arquivo enquanto esta conexão abria
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            versao = conn.execute("PRAGMA arquivo.user_version").fetchone()[0]
+            if versao == 0:
+                for comando in ESQUEMA_ARQUIVO:
+                    conn.execute(comando)
+            else:
+                for numero, comandos in MIGRACOES_ARQUIVO:
+                    if numero > versao:
+                        for comando in comandos:
+                            conn.execute(comando)
+            conn.execute(f"PRAGMA arquivo.user_version = {VERSAO_ARQUIVO}")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @classmethod
+    def _fechar(cls, thread_id):
+        with cls._lock:
+            conn = cls._conexoes.pop(thread_id, None)
+        if conn is not None:
+            conn.close()
+        if thread_id == threading.get_ident():
+            cls._local.conn = None
+
+    @classmethod
+    def fechar_conexoes(cls):
+        with cls._lock:
+            conexoes = list(cls._conexoes.values())
+            cls._conexoes.clear()
+        for conn in conexoes:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Conexão de outra thread; o sqlite3 não deixa fechar daqui
+                pass
+        cls._local.conn = None
+
+    @classmethod
+    def consultar(cls, query, params=()):
+        conn = cls.conexao()
+        inicio = time.perf_counter()
+        linhas = conn.execute(query, params).fetchall()
+        Perfil.consulta(conn, query, params, inicio, len(linhas))
+        return linhas
+
+    @classmethod
+    def consultar_um(cls, query, params=()):
+        conn = cls.conexao()
+        inicio = time.perf_counter()
+        linha = conn.execute(query, params).fetchone()
+        Perfil.consulta(conn, query, params, inicio, int(linha is not None))
+        return linha
+
+    @classmethod
+    def executar(cls, query, params=()):
+        conn = cls.conexao()
+        if conn.in_transaction:
+            return conn.cursor(CursorMedido).execute(query, params).fetchall()
+        with cls.transacao() as cursor:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    @classmethod
+    @contextmanager
+    def transacao(cls):
+        conn = cls.conexao()
+        if conn.in_transaction:
+            # Transação aninhada vira savepoint: se falhar, desfaz só a parte
+            # dela e a transação externa decide o que fazer com o erro
+            nome = f"sp{cls._local.savepoints}"
+            cls._local.savepoints += 1
+            conn.execute(f"SAVEPOINT {nome}")
+            try:
+                yield conn.cursor(CursorMedido)
+            except BaseException:
+                conn.execute(f"ROLLBACK TO {nome}")
+                conn.execute(f"RELEASE {nome}")
+                raise
+            finally:
+                cls._local.savepoints -= 1
+            conn.execute(f"RELEASE {nome}")
+            return
+        # IMMEDIATE pega o lock de escrita logo no início, evitando deadlock de
+        # upgrade de lock entre terminais; o tempo até conseguir é a espera
+        # pelos outros terminais
+        inicio = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        Perfil.registrar("lock", "BEGIN IMMEDIATE", inicio)
+        inicio = time.perf_counter()
+        try:
+            yield conn.cursor(CursorMedido)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            Perfil.registrar("transacao", "ROLLBACK", inicio)
+            raise
+        conn.execute("COMMIT")
+        Perfil.registrar("transacao", "COMMIT", inicio)
+
+    @classmethod
+    @contextmanager
+    def leitura(cls):
+        # Várias consultas enxergando o mesmo instante do banco
+        conn = cls.conexao()
+        if conn.in_transaction:
+            yield conn.cursor(CursorMedido)
+            return
+        conn.execute("BEGIN")
+        try:
+            yield conn.cursor(CursorMedido)
+        finally:
+            conn.execute("COMMIT")
+
+    @classmethod
+    def execute_query(cls, query, params=None):
+        if query.lstrip()[:6].upper() in ("SELECT", "PRAGMA"):
+            return cls.consultar(query, params or ())
+        return cls.executar(query, params or ())
+
+MIGRACOES = [
+    (1, [
+        '''CREATE TABLE IF NOT EXISTS produtos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL,
+            quantidade INTEGER NOT NULL,
+            preco REAL NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS pedidos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente TEXT NOT NULL,
+            status TEXT NOT NULL,
+            data_hora TEXT,
+            itens TEXT NOT NULL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS fluxo_caixa (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            data TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            valor REAL NOT NULL
+        )''',
+    ]),
+    (2, [
+        '''CREATE TABLE IF NOT EXISTS schema_meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        )''',
+        '''CREATE TABLE IF NOT EXISTS pedido_itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL REFERENCES pedidos(id),
+            produto_id INTEGER NOT NULL REFERENCES produtos(id),
+            quantidade INTEGER NOT NULL,
+            preco_unit REAL NOT NULL
+        )''',
+        "ALTER TABLE fluxo_caixa ADD COLUMN pedido_id INTEGER REFERENCES pedidos(id)",
+        "CREATE INDEX IF NOT EXISTS idx_pedido_itens_pedido ON pedido_itens (pedido_id)",
+        "CREATE INDEX IF NOT EXISTS idx_pedido_itens_produto ON pedido_itens (produto_id, quantidade, preco_unit)",
+        # Kanban (status) e histórico/relatório (data_hora)
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_status ON pedidos (status, data_hora)",
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_data_hora ON pedidos (data_hora, id)",
+        # Cobre os SUMs do relatório sem tocar na tabela
+        "CREATE INDEX IF NOT EXISTS idx_fluxo_caixa_data ON fluxo_caixa (data, tipo, valor)",
+        "CREATE INDEX IF NOT EXISTS idx_fluxo_caixa_pedido ON fluxo_caixa (pedido_id)",
+        # Pedidos criados depois desta migração já gravam pedido_itens
+        "INSERT OR REPLACE INTO schema_meta (chave, valor) SELECT 'backfill_itens_ate', COALESCE(MAX(id), 0) FROM pedidos",
+    ]),
+    (3, [
+        # Feed de alterações: todo INSERT/UPDATE em pedidos recebe um
+        # alteracao_id crescente, e quem já viu até N só busca > N
+        "ALTER TABLE pedidos ADD COLUMN alteracao_id INTEGER NOT NULL DEFAULT 0",
+        "UPDATE pedidos SET alteracao_id = id",
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_alteracao ON pedidos (alteracao_id)",
+        '''CREATE TRIGGER IF NOT EXISTS trg_pedidos_alteracao_insert AFTER INSERT ON pedidos
+        BEGIN
+            UPDATE pedidos SET alteracao_id = (SELECT MAX(alteracao_id) FROM pedidos) + 1 WHERE id = NEW.id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_pedidos_alteracao_update AFTER UPDATE OF cliente, status, itens ON pedidos
+        BEGIN
+            UPDATE pedidos SET alteracao_id = (SELECT MAX(alteracao_id) FROM pedidos) + 1 WHERE id = NEW.id;
+        END''',
+    ]),
+    (4, [
+        # Contador de versão por tabela, para outros terminais saberem que o
+        # cardápio mudou sem reler os produtos
+        '''CREATE TABLE IF NOT EXISTS versoes (
+            tabela TEXT PRIMARY KEY,
+            versao INTEGER NOT NULL
+        )''',
+        "INSERT OR IGNORE INTO versoes (tabela, versao) VALUES ('produtos', 0)",
+        '''CREATE TRIGGER IF NOT EXISTS trg_produtos_versao_insert AFTER INSERT ON produtos
+        BEGIN
+            UPDATE versoes SET versao = versao + 1 WHERE tabela = 'produtos';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_produtos_versao_update AFTER UPDATE ON produtos
+        BEGIN
+            UPDATE versoes SET versao = versao + 1 WHERE tabela = 'produtos';
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_produtos_versao_delete AFTER DELETE ON produtos
+        BEGIN
+            UPDATE versoes SET versao = versao + 1 WHERE tabela = 'produtos';
+        END''',
+    ]),
+    (5, [
+        # Totais por dia mantidos pelos próprios lançamentos de caixa: o
+        # relatório de um período lê uma linha por dia em vez de somar o caixa
+        '''CREATE TABLE IF NOT EXISTS resumo_diario (
+            data TEXT PRIMARY KEY,
+            total_vendas REAL NOT NULL DEFAULT 0,
+            total_despesas REAL NOT NULL DEFAULT 0,
+            qtd_vendas INTEGER NOT NULL DEFAULT 0,
+            qtd_despesas INTEGER NOT NULL DEFAULT 0
+        )''',
+        '''INSERT OR REPLACE INTO resumo_diario (data, total_vendas, total_despesas, qtd_vendas, qtd_despesas)
+        SELECT data,
+               COALESCE(SUM(CASE WHEN tipo = 'Venda' THEN valor END), 0),
+               COALESCE(SUM(CASE WHEN tipo LIKE 'Despesa%' THEN valor END), 0),
+               COUNT(CASE WHEN tipo = 'Venda' THEN 1 END),
+               COUNT(CASE WHEN tipo LIKE 'Despesa%' THEN 1 END)
+        FROM fluxo_caixa GROUP BY data''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_insert AFTER INSERT ON fluxo_caixa
+        BEGIN
+            INSERT INTO resumo_diario (data, total_vendas, total_despesas, qtd_vendas, qtd_despesas)
+            VALUES (NEW.data,
+                    CASE WHEN NEW.tipo = 'Venda' THEN NEW.valor ELSE 0 END,
+                    CASE WHEN NEW.tipo LIKE 'Despesa%' THEN NEW.valor ELSE 0 END,
+                    NEW.tipo = 'Venda',
+                    NEW.tipo LIKE 'Despesa%')
+            ON CONFLICT (data) DO UPDATE SET
+                total_vendas = total_vendas + excluded.total_vendas,
+                total_despesas = total_despesas + excluded.total_despesas,
+                qtd_vendas = qtd_vendas + excluded.qtd_vendas,
+                qtd_despesas = qtd_despesas + excluded.qtd_despesas;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_delete AFTER DELETE ON fluxo_caixa
+        BEGIN
+            UPDATE resumo_diario SET
+                total_vendas = total_vendas - CASE WHEN OLD.tipo = 'Venda' THEN OLD.valor ELSE 0 END,
+                total_despesas = total_despesas - CASE WHEN OLD.tipo LIKE 'Despesa%' THEN OLD.valor ELSE 0 END,
+                qtd_vendas = qtd_vendas - (OLD.tipo = 'Venda'),
+                qtd_despesas = qtd_despesas - (OLD.tipo LIKE 'Despesa%')
+            WHERE data = OLD.data;
+        END''',
+    ]),
+    (6, [
+        "ALTER TABLE produtos ADD COLUMN categoria TEXT NOT NULL DEFAULT ''",
+        "CREATE INDEX IF NOT EXISTS idx_produtos_categoria ON produtos (categoria)",
+    ]),
+    (7, [
+        # Código do fornecedor, chave da importação de planilhas; NULL não
+        # conflita no índice único, então produtos sem SKU continuam valendo
+        "ALTER TABLE produtos ADD COLUMN sku TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_produtos_sku ON produtos (sku)",
+        "CREATE INDEX IF NOT EXISTS idx_produtos_nome ON produtos (nome)",
+    ]),
+    (8, [
+        # Reservas de estoque dos carrinhos abertos. produtos.reservado é a
+        # soma das reservas de cada produto, mantida pelos triggers: o
+        # disponível (quantidade - reservado) sai da própria linha do produto
+        '''CREATE TABLE IF NOT EXISTS reservas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            carrinho TEXT NOT NULL,
+            produto_id INTEGER NOT NULL REFERENCES produtos(id),
+            quantidade INTEGER NOT NULL CHECK (quantidade > 0),
+            expira_em REAL NOT NULL,
+            UNIQUE (carrinho, produto_id)
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_reservas_expira ON reservas (expira_em)",
+        "ALTER TABLE produtos ADD COLUMN reservado INTEGER NOT NULL DEFAULT 0",
+        '''CREATE TRIGGER IF NOT EXISTS trg_reservas_insert AFTER INSERT ON reservas
+        BEGIN
+            UPDATE produtos SET reservado = reservado + NEW.quantidade WHERE id = NEW.produto_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_reservas_update AFTER UPDATE OF quantidade ON reservas
+        BEGIN
+            UPDATE produtos SET reservado = reservado + NEW.quantidade - OLD.quantidade WHERE id = NEW.produto_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_reservas_delete AFTER DELETE ON reservas
+        BEGIN
+            UPDATE produtos SET reservado = reservado - OLD.quantidade WHERE id = OLD.produto_id;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_produtos_reservas_delete AFTER DELETE ON produtos
+        BEGIN
+            DELETE FROM reservas WHERE produto_id = OLD.id;
+        END''',
+    ]),
+    (9, [
+        # Histórico de status dos pedidos: um evento por mudança, gravado na
+        # mesma transação que a muda. Pedidos anteriores a esta migração não
+        # têm histórico e ficam fora dos tempos de preparo
+        '''CREATE TABLE IF NOT EXISTS pedido_eventos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pedido_id INTEGER NOT NULL REFERENCES pedidos(id),
+            status TEXT NOT NULL,
+            data_hora TEXT NOT NULL
+        )''',
+        "CREATE INDEX IF NOT EXISTS idx_pedido_eventos_pedido ON pedido_eventos (pedido_id, status, data_hora)",
+        "CREATE INDEX IF NOT EXISTS idx_pedido_eventos_status ON pedido_eventos (status, data_hora, pedido_id)",
+        '''CREATE TRIGGER IF NOT EXISTS trg_pedido_eventos_imutavel BEFORE UPDATE ON pedido_eventos
+        BEGIN
+            SELECT RAISE(ABORT, 'pedido_eventos não pode ser alterado');
+        END''',
+        # Contadores por hora ('AAAA-MM-DD HH') mantidos pelos eventos: vazão
+        # e fila da cozinha de um dia saem de no máximo 24 linhas
+        '''CREATE TABLE IF NOT EXISTS cozinha_hora (
+            hora TEXT PRIMARY KEY,
+            entradas INTEGER NOT NULL DEFAULT 0,
+            iniciados INTEGER NOT NULL DEFAULT 0,
+            prontos INTEGER NOT NULL DEFAULT 0,
+            concluidos INTEGER NOT NULL DEFAULT 0
+        )''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_cozinha_hora_insert AFTER INSERT ON pedido_eventos
+        BEGIN
+            INSERT INTO cozinha_hora (hora, entradas, iniciados, prontos, concluidos)
+            VALUES (substr(NEW.data_hora, 1, 13),
+                    NEW.status = 'Aberto',
+                    NEW.status = 'Em Andamento',
+                    NEW.status = 'Finalizado',
+                    NEW.status = 'Concluído')
+            ON CONFLICT (hora) DO UPDATE SET
+                entradas = entradas + excluded.entradas,
+                iniciados = iniciados + excluded.iniciados,
+                prontos = prontos + excluded.prontos,
+                concluidos = concluidos + excluded.concluidos;
+        END''',
+    ]),
+    (10, [
+        # Lançamento que vai para o arquivo morto continua somando no
+        # resumo_diario: durante o arquivamento a marca 'arquivando' em
+        # schema_meta (só visível dentro da transação) desliga o desconto
+        "DROP TRIGGER IF EXISTS trg_resumo_diario_delete",
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_delete AFTER DELETE ON fluxo_caixa
+        WHEN NOT EXISTS (SELECT 1 FROM schema_meta WHERE chave = 'arquivando')
+        BEGIN
+            UPDATE resumo_diario SET
+                total_vendas = total_vendas - CASE WHEN OLD.tipo = 'Venda' THEN OLD.valor ELSE 0 END,
+                total_despesas = total_despesas - CASE WHEN OLD.tipo LIKE 'Despesa%' THEN OLD.valor ELSE 0 END,
+                qtd_vendas = qtd_vendas - (OLD.tipo = 'Venda'),
+                qtd_despesas = qtd_despesas - (OLD.tipo LIKE 'Despesa%')
+            WHERE data = OLD.data;
+        END''',
+        # Despesas antigas candidatas ao arquivo
+        "CREATE INDEX IF NOT EXISTS idx_fluxo_caixa_avulsos ON fluxo_caixa (data) WHERE pedido_id IS NULL",
+    ]),
+    (11, [
+        # Dinheiro em centavos inteiros (ver Dinheiro): colunas novas com a
+        # unidade no nome, para SQL antigo falhar em vez de ler reais como
+        # centavos. Views, índices e triggers que citam as colunas REAL saem
+        # antes do DROP COLUMN e voltam sobre as novas
+        "DROP VIEW IF EXISTS temp.todos_pedido_itens",
+        "DROP VIEW IF EXISTS temp.todo_fluxo_caixa",
+        "DROP INDEX IF EXISTS idx_pedido_itens_produto",
+        "DROP INDEX IF EXISTS idx_fluxo_caixa_data",
+        "DROP TRIGGER IF EXISTS trg_resumo_diario_insert",
+        "DROP TRIGGER IF EXISTS trg_resumo_diario_delete",
+        "ALTER TABLE produtos ADD COLUMN preco_centavos INTEGER NOT NULL DEFAULT 0",
+        "UPDATE produtos SET preco_centavos = CAST(ROUND(preco * 100) AS INTEGER)",
+        "ALTER TABLE produtos DROP COLUMN preco",
+        "ALTER TABLE pedido_itens ADD COLUMN preco_unit_centavos INTEGER NOT NULL DEFAULT 0",
+        "UPDATE pedido_itens SET preco_unit_centavos = CAST(ROUND(preco_unit * 100) AS INTEGER)",
+        "ALTER TABLE pedido_itens DROP COLUMN preco_unit",
+        "ALTER TABLE fluxo_caixa ADD COLUMN valor_centavos INTEGER NOT NULL DEFAULT 0",
+        "UPDATE fluxo_caixa SET valor_centavos = CAST(ROUND(valor * 100) AS INTEGER)",
+        "ALTER TABLE fluxo_caixa DROP COLUMN valor",
+        "CREATE INDEX IF NOT EXISTS idx_pedido_itens_produto ON pedido_itens (produto_id, quantidade, preco_unit_centavos)",
+        "CREATE INDEX IF NOT EXISTS idx_fluxo_caixa_data ON fluxo_caixa (data, tipo, valor_centavos)",
+        # Os totais REAL já somados carregam o erro do float: refeitos a
+        # partir dos lançamentos, inclusive os do arquivo morto
+        "ALTER TABLE resumo_diario ADD COLUMN vendas_centavos INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE resumo_diario ADD COLUMN despesas_centavos INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE resumo_diario DROP COLUMN total_vendas",
+        "ALTER TABLE resumo_diario DROP COLUMN total_despesas",
+        "DELETE FROM resumo_diario",
+        '''INSERT INTO resumo_diario (data, vendas_centavos, despesas_centavos, qtd_vendas, qtd_despesas)
+        SELECT data,
+               COALESCE(SUM(CASE WHEN tipo = 'Venda' THEN valor_centavos END), 0),
+               COALESCE(SUM(CASE WHEN tipo LIKE 'Despesa%' THEN valor_centavos END), 0),
+               COUNT(CASE WHEN tipo = 'Venda' THEN 1 END),
+               COUNT(CASE WHEN tipo LIKE 'Despesa%' THEN 1 END)
+        FROM (SELECT data, tipo, valor_centavos FROM main.fluxo_caixa
+              UNION ALL SELECT data, tipo, valor_centavos FROM arquivo.fluxo_caixa)
+        GROUP BY data''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_insert AFTER INSERT ON fluxo_caixa
+        BEGIN
+            INSERT INTO resumo_diario (data, vendas_centavos, despesas_centavos, qtd_vendas, qtd_despesas)
+            VALUES (NEW.data,
+                    CASE WHEN NEW.tipo = 'Venda' THEN NEW.valor_centavos ELSE 0 END,
+                    CASE WHEN NEW.tipo LIKE 'Despesa%' THEN NEW.valor_centavos ELSE 0 END,
+                    NEW.tipo = 'Venda',
+                    NEW.tipo LIKE 'Despesa%')
+            ON CONFLICT (data) DO UPDATE SET
+                vendas_centavos = vendas_centavos + excluded.vendas_centavos,
+                despesas_centavos = despesas_centavos + excluded.despesas_centavos,
+                qtd_vendas = qtd_vendas + excluded.qtd_vendas,
+                qtd_despesas = qtd_despesas + excluded.qtd_despesas;
+        END''',
+        '''CREATE TRIGGER IF NOT EXISTS trg_resumo_diario_delete AFTER DELETE ON fluxo_caixa
+        WHEN NOT EXISTS (SELECT 1 FROM schema_meta WHERE chave = 'arquivando')
+        BEGIN
+            UPDATE resumo_diario SET
+                vendas_centavos = vendas_centavos - CASE WHEN OLD.tipo = 'Venda' THEN OLD.valor_centavos ELSE 0 END,
+                despesas_centavos = despesas_centavos - CASE WHEN OLD.tipo LIKE 'Despesa%' THEN OLD.valor_centavos ELSE 0 END,
+                qtd_vendas = qtd_vendas - (OLD.tipo = 'Venda'),
+                qtd_despesas = qtd_despesas - (OLD.tipo LIKE 'Despesa%')
+            WHERE data = OLD.data;
+        END''',
+    ]),
+    (12, [
+        # Cada clique de carrinho em qualquer terminal muda produtos.reservado.
+        # Contado como mudança do cadastro, fazia todo terminal reler o
+        # catálogo inteiro e a tabela do estoque voltar ao começo. Só o
+        # cadastro sobe versoes.produtos; o reservado tem a própria versão
+        "DROP TRIGGER IF EXISTS trg_produtos_versao_update",
+        '''CREATE TRIGGER IF NOT EXISTS trg_produtos_versao_update
+        AFTER UPDATE OF nome, quantidade, preco_centavos, categoria ON produtos
+        BEGIN
+            UPDATE versoes SET versao = versao + 1 WHERE tabela = 'produtos';
+        END''',
+        "INSERT OR IGNORE INTO versoes (tabela, versao) VALUES ('reservas', 0)",
+        '''CREATE TRIGGER IF NOT EXISTS trg_produtos_reservado_versao AFTER UPDATE OF reservado ON produtos
+        BEGIN
+            UPDATE versoes SET versao = versao + 1 WHERE tabela = 'reservas';
+        END''',
+    ]),
+]
+
+# Tabelas do arquivo morto (estoque-arquivo.db, anexado como "arquivo" em toda
+# conexão): mesmas colunas das tabelas do dia a dia, sem triggers. Arquivo
+# novo nasce com ESQUEMA_ARQUIVO na versão atual; um existente passa pelas
+# MIGRACOES_ARQUIVO que faltam. Mudou o esquema, sobe a versão
+VERSAO_ARQUIVO = 2
+
+ESQUEMA_ARQUIVO = [
+    '''CREATE TABLE IF NOT EXISTS arquivo.pedidos (
+        id INTEGER PRIMARY KEY,
+        cliente TEXT NOT NULL,
+        status TEXT NOT NULL,
+        data_hora TEXT,
+        itens TEXT NOT NULL,
+        alteracao_id INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS arquivo.pedido_itens (
+        id INTEGER PRIMARY KEY,
+        pedido_id INTEGER NOT NULL,
+        produto_id INTEGER NOT NULL,
+        quantidade INTEGER NOT NULL,
+        preco_unit_centavos INTEGER NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS arquivo.pedido_eventos (
+        id INTEGER PRIMARY KEY,
+        pedido_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        data_hora TEXT NOT NULL
+    )''',
+    '''CREATE TABLE IF NOT EXISTS arquivo.fluxo_caixa (
+        id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        valor_centavos INTEGER NOT NULL,
+        pedido_id INTEGER
+    )''',
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_pedidos_data_hora ON pedidos (data_hora, id)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_pedido_itens_pedido ON pedido_itens (pedido_id)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_pedido_itens_produto ON pedido_itens (produto_id, quantidade, preco_unit_centavos)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_pedido_eventos_pedido ON pedido_eventos (pedido_id, status, data_hora)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_pedido_eventos_status ON pedido_eventos (status, data_hora, pedido_id)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_fluxo_caixa_data ON fluxo_caixa (data, tipo, valor_centavos)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_fluxo_caixa_pedido ON fluxo_caixa (pedido_id)",
+]
+
+MIGRACOES_ARQUIVO = [
+    (2, [
+        # Centavos inteiros, como a migração 11 do banco do dia a dia
+        "DROP INDEX IF EXISTS arquivo.idx_pedido_itens_produto",
+        "DROP INDEX IF EXISTS arquivo.idx_fluxo_caixa_data",
+        "ALTER TABLE arquivo.pedido_itens ADD COLUMN preco_unit_centavos INTEGER NOT NULL DEFAULT 0",
+        "UPDATE arquivo.pedido_itens SET preco_unit_centavos = CAST(ROUND(preco_unit * 100) AS INTEGER)",
+        "ALTER TABLE arquivo.pedido_itens DROP COLUMN preco_unit",
+        "ALTER TABLE arquivo.fluxo_caixa ADD COLUMN valor_centavos INTEGER NOT NULL DEFAULT 0",
+        "UPDATE arquivo.fluxo_caixa SET valor_centavos = CAST(ROUND(valor * 100) AS INTEGER)",
+        "ALTER TABLE arquivo.fluxo_caixa DROP COLUMN valor",
+        "CREATE INDEX IF NOT EXISTS arquivo.idx_pedido_itens_produto ON pedido_itens (produto_id, quantidade, preco_unit_centavos)",
+        "CREATE INDEX IF NOT EXISTS arquivo.idx_fluxo_caixa_data ON fluxo_caixa (data, tipo, valor_centavos)",
+    ]),
+]
+
+# Juntam as duas partes para quem lê histórico
+VIEWS_ARQUIVO = [
+    '''CREATE TEMP VIEW IF NOT EXISTS todos_pedidos AS
+        SELECT id, cliente, status, data_hora, itens FROM main.pedidos
+        UNION ALL SELECT id, cliente, status, data_hora, itens FROM arquivo.pedidos''',
+    '''CREATE TEMP VIEW IF NOT EXISTS todos_pedido_itens AS
+        SELECT id, pedido_id, produto_id, quantidade, preco_unit_centavos FROM main.pedido_itens
+        UNION ALL SELECT id, pedido_id, produto_id, quantidade, preco_unit_centavos FROM arquivo.pedido_itens''',
+    '''CREATE TEMP VIEW IF NOT EXISTS todo_fluxo_caixa AS
+        SELECT id, data, tipo, valor_centavos, pedido_id FROM main.fluxo_caixa
+        UNION ALL SELECT id, data, tipo, valor_centavos, pedido_id FROM arquivo.fluxo_caixa''',
+]
+
+def caminho_arquivo(banco):
+    raiz, extensao = os.path.splitext(banco)
+    return f"{raiz}-arquivo{extensao or '.db'}"
+
+def nas_duas_partes(consulta):
+    # A mesma consulta no banco do dia a dia e no arquivo ({parte}), unidas.
+    # Para JOIN entre pedidos e caixa: pedido e lançamentos mudam de banco
+    # juntos, e juntar as views todos_* obrigaria o SQLite a materializá-las.
+    # Parâmetros numerados (?1, ?2) servem aos dois ramos com a mesma tupla
+    return " UNION ALL ".join(consulta.format(parte=parte) for parte in ("main", "arquivo"))
+
+# Tempo que um item fica reservado no carrinho sem ninguém mexer no carrinho
+RESERVA_MINUTOS = 15
+
+# Versões do cadastro de produtos e do reservado, numa linha só
+VERSOES_CATALOGO = ("SELECT COALESCE(MAX(CASE WHEN tabela = 'produtos' THEN versao END), 0), "
+                    "COALESCE(MAX(CASE WHEN tabela = 'reservas' THEN versao END), 0) FROM versoes")
+
+STATUS_KANBAN = ("Aberto", "Em Andamento", "Finalizado")
+
+PROXIMO_STATUS = {"Aberto": "Em Andamento", "Em Andamento": "Finalizado", "Finalizado": "Concluído"}
+
+REGEX_ITENS = re.compile(r"(\d+)x (.+?)(?=, \d+x |$)")
+
+def normalizar(texto):
+    # Minúsculas e sem acento: "Pão de Queijo" e "pao de queijo" batem
+    decomposto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+@total_ordering
+class Dinheiro:
+    # Valor em centavos inteiros, como fica gravado no banco: somar e
+    # multiplicar não acumula o erro do float (0.1 + 0.2 != 0.3). Texto,
+    # float e Decimal em reais entram por de_reais
+    __slots__ = ("centavos",)
+
+    def __init__(self, centavos=0):
+        if type(centavos) is not int:
+            raise TypeError(f"Dinheiro espera centavos inteiros, recebeu {centavos!r}")
+        self.centavos = centavos
+
+    @classmethod
+    def de_reais(cls, valor):
+        # "12,50", "R$ 1.234,56", "12.5", 12.5 ou Decimal; meio centavo arredonda para cima
+        if isinstance(valor, Dinheiro):
+            return valor
+        if isinstance(valor, bool):
+            raise ValueError(f"valor inválido: {valor!r}")
+        # repr do float é o decimal mais curto que o representa: 0.1 vira "0.1", não 0.1000000000000000055
+        texto = repr(valor) if isinstance(valor, float) else str(valor).strip().replace("R$", "").strip()
+        if "," in texto:
+            # 1.234,56 -> 1234.56
+            texto = texto.replace(".", "").replace(",", ".")
+        try:
+            reais = Decimal(texto)
+        except InvalidOperation:
+            raise ValueError(f"valor inválido: {valor!r}") from None
+        if not reais.is_finite():
+            raise ValueError(f"valor inválido: {valor!r}")
+        return cls(int((reais * 100).to_integral_value(ROUND_HALF_UP)))
+
+    @classmethod
+    def somar(cls, centavos):
+        # Soma uma coluna de centavos (inteiros) sem criar um Dinheiro por linha
+        return cls(sum(centavos))
+
+    @property
+    def reais(self):
+        return Decimal(self.centavos).scaleb(-2)
+
+    def __add__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return Dinheiro(self.centavos + outro.centavos)
+
+    def __radd__(self, outro):
+        # sum() começa do 0
+        if outro == 0:
+            return self
+        return NotImplemented
+
+    def __sub__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return Dinheiro(self.centavos - outro.centavos)
+
+    def __mul__(self, quantidade):
+        if isinstance(quantidade, bool) or not isinstance(quantidade, int):
+            return NotImplemented
+        return Dinheiro(self.centavos * quantidade)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Dinheiro(-self.centavos)
+
+    def __bool__(self):
+        return self.centavos != 0
+
+    def __eq__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return self.centavos == outro.centavos
+
+    def __lt__(self, outro):
+        if not isinstance(outro, Dinheiro):
+            return NotImplemented
+        return self.centavos < outro.centavos
+
+    def __hash__(self):
+        return hash(self.centavos)
+
+    def __float__(self):
+        # Só para JSON: centavos / 100 volta como o decimal de duas casas
+        return self.centavos / 100
+
+    def __str__(self):
+        # O float mais próximo de centavos / 100 erra muito menos que meio
+        # centavo (até trilhões de reais): duas casas arredondam de volta ao exato
+        return f"{self.centavos / 100:.2f}"
+
+    def __format__(self, especificacao):
+        if especificacao in ("", ".2f"):
+            return str(self)
+        return format(self.reais, especificacao)
+
+    def __repr__(self):
+        return f"Dinheiro({self.centavos})"
+
+sqlite3.register_adapter(Dinheiro, lambda dinheiro: dinheiro.centavos)
+
+class Produto:
+    __slots__ = ("id", "nome", "quantidade", "preco", "categoria", "reservado")
+
+    def __init__(self, id, nome, quantidade, preco_centavos, categoria="", reservado=0):
+        self.id = id
+        self.nome = nome
+        self.quantidade = quantidade
+        self.preco = Dinheiro(preco_centavos)
+        self.categoria = categoria
+        self.reservado = reservado
+
+    @property
+    def disponivel(self):
+        # O estoque pode ter sido reduzido abaixo do que já estava reservado
+        return max(self.quantidade - self.reservado, 0)
+
+    def dados(self):
+        return (self.id, self.nome, self.quantidade, self.preco.centavos, self.categoria, self.reservado)
+
+    def __repr__(self):
+        return f"Produto{self.dados()!r}"
+
+class IndiceBusca:
+    # Índice de prefixos das palavras de cada nome: "x-b" e "bac" acham
+    # "X-Bacon" com um acesso a dicionário por termo digitado
+    def __init__(self):
+        self.prefixos = {}
+        self.palavras = {}
+
+    def adicionar(self, produto):
+        palavras = set(normalizar(produto.nome).split())
+        self.palavras[produto.id] = palavras
+        for palavra in palavras:
+            for i in range(1, len(palavra) + 1):
+                self.prefixos.setdefault(palavra[:i], set()).add(produto.id)
+
+    def remover(self, produto_id):
+        for palavra in self.palavras.pop(produto_id, ()):
+            for i in range(1, len(palavra) + 1):
+                ids = self.prefixos.get(palavra[:i])
+                if ids is not None:
+                    ids.discard(produto_id)
+                    if not ids:
+                        del self.prefixos[palavra[:i]]
+
+    def buscar(self, texto):
+        # None quando não há termo (tudo casa)
+        termos = normalizar(texto).split()
+        if not termos:
+            return None
+        resultado = None
+        for termo in sorted(termos, key=len, reverse=True):
+            ids = self.prefixos.get(termo)
+            if not ids:
+                return set()
+            resultado = set(ids) if resultado is None else resultado & ids
+        return resultado
+
+class ProdutoCatalog:
+    # Cópia em memória da tabela produtos, compartilhada pelo processo. A
+    # versão acompanha versoes.produtos: escritas locais aplicam a mudança
+    # direto; escritas de outro terminal fazem sincronizar() reler a tabela.
+    # O reservado anda por versoes.reservas e é atualizado no lugar
+    _lock = threading.Lock()
+    _por_id = {}
+    _por_categoria = {}
+    _ordem = []
+    _indice = IndiceBusca()
+    versao = None
+    versao_reservas = None
+
+    @classmethod
+    def carregado(cls):
+        return cls.versao is not None
+
+    @classmethod
+    def por_id(cls, produto_id):
+        return cls._por_id.get(produto_id)
+
+    @classmethod
+    def todos(cls):
+        por_id = cls._por_id
+        return [por_id[produto_id] for produto_id in cls._ordem]
+
+    @classmethod
+    def categorias(cls):
+        return sorted(categoria for categoria in cls._por_categoria if categoria)
+
+    @classmethod
+    def buscar(cls, texto="", categoria=None):
+        with cls._lock:
+            ids = cls._indice.buscar(texto)
+            if categoria:
+                por_categoria = cls._por_categoria.get(categoria, set())
+                ids = set(por_categoria) if ids is None else ids & por_categoria
+            por_id = cls._por_id
+            if ids is None:
+                return [por_id[produto_id] for produto_id in cls._ordem]
+            return [por_id[produto_id] for produto_id in sorted(ids)]
+
+    @classmethod
+    def sincronizar(cls):
+        # Retorna os ids que mudaram (vazio se o catálogo já estava em dia)
+        versao, versao_reservas = DBManager.consultar_um(VERSOES_CATALOGO)
+        if versao == cls.versao:
+            if versao_reservas == cls.versao_reservas:
+                return set()
+            return cls._sincronizar_reservas()
+        with DBManager.leitura() as cursor:
+            versoes = cursor.execute(VERSOES_CATALOGO).fetchone()
+            linhas = cursor.execute("SELECT id, nome, quantidade, preco_centavos, categoria, reservado FROM produtos ORDER BY id").fetchall()
+        with cls._lock:
+            antigos = cls._por_id
+            alterados = set(antigos) - {linha[0] for linha in linhas}
+            por_id = {}
+            for linha in linhas:
+                antigo = antigos.get(linha[0])
+                if antigo is not None and antigo.dados() == linha:
+                    por_id[linha[0]] = antigo
+                else:
+                    por_id[linha[0]] = Produto(*linha)
+                    alterados.add(linha[0])
+            cls._trocar(por_id, alterados)
+            cls.versao, cls.versao_reservas = versoes
+        return alterados
+
+    @classmethod
+    def _sincronizar_reservas(cls):
+        # Só o reservado mudou: relê essa coluna e corrige os produtos no
+        # lugar, sem refazer os índices
+        with DBManager.leitura() as cursor:
+            versoes = cursor.execute(VERSOES_CATALOGO).fetchone()
+            reservados = cursor.execute("SELECT id, reservado FROM produtos").fetchall()
+        with cls._lock:
+            if versoes[0] != cls.versao:
+                # O cadastro mudou entre as leituras: vai a carga completa
+                cls.versao = None
+            else:
+                alterados = cls._corrigir_reservados(reservados)
+                cls.versao_reservas = versoes[1]
+                return alterados
+        return cls.sincronizar()
+
+    @classmethod
+    def _corrigir_reservados(cls, reservados):
+        alterados = set()
+        for produto_id, reservado in reservados:
+            produto = cls._por_id.get(produto_id)
+            if produto is not None and produto.reservado != reservado:
+                produto.reservado = reservado
+                alterados.add(produto_id)
+        return alterados
+
+    @classmethod
+    def aplicar_escrita(cls, versao_antes, versao_depois, produtos=(), removidos=()):
+        # Chamado por quem escreveu em produtos, com as versões lidas dentro
+        # da mesma transação; se o catálogo não estava exatamente em
+        # versao_antes, perdeu alguma escrita e precisa ser relido
+        with cls._lock:
+            if cls.versao != versao_antes:
+                cls.versao = None
+                return
+            por_id = dict(cls._por_id)
+            for produto in produtos:
+                por_id[produto.id] = produto
+            for produto_id in removidos:
+                por_id.pop(produto_id, None)
+            cls._trocar(por_id, {produto.id for produto in produtos} | set(removidos))
+            cls.versao = versao_depois
+
+    @classmethod
+    def aplicar_reservas(cls, versoes_antes, versoes_depois, reservados):
+        # Como aplicar_escrita, para quem só mexeu em reservas: versoes_* são
+        # (produtos, reservas) e reservados, pares (id, reservado)
+        with cls._lock:
+            if cls.versao is None:
+                return
+            if (cls.versao, cls.versao_reservas) != tuple(versoes_antes):
+                cls.versao_reservas = None
+                return
+            cls._corrigir_reservados(reservados)
+            cls.versao, cls.versao_reservas = versoes_depois
+
+    @classmethod
+    def invalidar(cls):
+        cls.versao = None
+
+    @classmethod
+    def _trocar(cls, por_id, alterados):
+        # Troca os índices inteiros de uma vez: quem está lendo vê o antigo ou o novo
+        por_categoria = {}
+        for produto in por_id.values():
+            por_categoria.setdefault(produto.categoria, set()).add(produto.id)
+        # O índice de busca só refaz os produtos que mudaram
+        for produto_id in alterados:
+            cls._indice.remover(produto_id)
+            if produto_id in por_id:
+                cls._indice.adicionar(por_id[produto_id])
+        cls._ordem = sorted(por_id)
+        cls._por_categoria = por_categoria
+        cls._por_id = por_id
+
+class ServicoProdutos:
+    @staticmethod
+    def _escrever(comando, params, produto_id=None):
+        with DBManager.transacao() as cursor:
+            versao_antes = cursor.execute("SELECT versao FROM versoes WHERE tabela = 'produtos'").fetchone()[0]
+            cursor.execute(comando, params)
+            produto_id = produto_id or cursor.lastrowid
+            linha = cursor.execute("SELECT id, nome, quantidade, preco_centavos, categoria, reservado FROM produtos WHERE id = ?", (produto_id,)).fetchone()
+            versao_depois = cursor.execute("SELECT versao FROM versoes WHERE tabela = 'produtos'").fetchone()[0]
+        if linha:
+            ProdutoCatalog.aplicar_escrita(versao_antes, versao_depois, produtos=[Produto(*linha)])
+        else:
+            ProdutoCatalog.aplicar_escrita(versao_antes, versao_depois, removidos=[produto_id])
+        return produto_id
+
+    @staticmethod
+    def adicionar(nome, quantidade, preco, categoria=""):
+        # preco: Dinheiro ou valor em reais
+        return ServicoProdutos._escrever("INSERT INTO produtos (nome, quantidade, preco_centavos, categoria) VALUES (?, ?, ?, ?)",
+                                         (nome, quantidade, Dinheiro.de_reais(preco), categoria))
+
+    @staticmethod
+    def editar(produto_id, nome, quantidade, preco, categoria=""):
+        return ServicoProdutos._escrever("UPDATE produtos SET nome = ?, quantidade = ?, preco_centavos = ?, categoria = ? WHERE id = ?",
+                                         (nome, quantidade, Dinheiro.de_reais(preco), categoria, produto_id), produto_id)
+
+    @staticmethod
+    def excluir(produto_id):
+        return ServicoProdutos._escrever("DELETE FROM produtos WHERE id = ?", (produto_id,), produto_id)
+
+class EstoqueInsuficiente(Exception):
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        nomes = ", ".join(f"{nome} (disponível: {disponivel})" for nome, disponivel in faltantes)
+        super().__init__(f"Estoque insuficiente para: {nomes}")
+
+class TransicaoInvalida(Exception):
+    pass
+
+class PedidoNaoFinalizado(TransicaoInvalida):
+    pass
+
+class ServicoReservas:
+    # Cada carrinho aberto segura o estoque que já pôs no pedido. Reservas
+    # vencidas não precisam de faxineiro: toda escrita de reserva ou venda
+    # apaga as vencidas antes de conferir o disponível
+    @staticmethod
+    def _escrever(alterar):
+        agora = time.time()
+        with DBManager.transacao() as cursor:
+            versoes_antes = cursor.execute(VERSOES_CATALOGO).fetchone()
+            produto_ids = ServicoReservas._expirar(cursor, agora)
+            resultado = alterar(cursor, agora, produto_ids)
+            marcadores = ", ".join("?" * len(produto_ids))
+            reservados = cursor.execute(f"SELECT id, reservado FROM produtos WHERE id IN ({marcadores})",
+                                        tuple(produto_ids)).fetchall()
+            versoes_depois = cursor.execute(VERSOES_CATALOGO).fetchone()
+        ProdutoCatalog.aplicar_reservas(versoes_antes, versoes_depois, reservados)
+        return resultado
+
+    @staticmethod
+    def _expirar(cursor, agora):
+        # Retorna os produtos cujo reservado mudou
+        produto_ids = {linha[0] for linha in cursor.execute("SELECT produto_id FROM reservas WHERE expira_em <= ?", (agora,))}
+        if produto_ids:
+            cursor.execute("DELETE FROM reservas WHERE expira_em <= ?", (agora,))
+        return produto_ids
+
+    @staticmethod
+    def _liberar(cursor, carrinho, produto_ids):
+        produto_ids.update(linha[0] for linha in cursor.execute("SELECT produto_id FROM reservas WHERE carrinho = ?", (carrinho,)))
+        cursor.execute("DELETE FROM reservas WHERE carrinho = ?", (carrinho,))
+
+    @staticmethod
+    def reservar(carrinho, produto_id, quantidade, minutos=RESERVA_MINUTOS):
+        # quantidade é o total do produto no carrinho, não um acréscimo: repetir
+        # a chamada (nova tentativa depois de banco ocupado) não reserva em dobro.
+        # Mexer no carrinho renova o prazo de todas as reservas dele
+        def alterar(cursor, agora, produto_ids):
+            produto_ids.add(produto_id)
+            if quantidade <= 0:
+                cursor.execute("DELETE FROM reservas WHERE carrinho = ? AND produto_id = ?", (carrinho, produto_id))
+            else:
+                linha = cursor.execute(
+                    "SELECT nome, quantidade - reservado + COALESCE((SELECT quantidade FROM reservas "
+                    "WHERE carrinho = ? AND produto_id = produtos.id), 0) FROM produtos WHERE id = ?",
+                    (carrinho, produto_id)).fetchone()
+                if linha is None:
+                    raise EstoqueInsuficiente([(f"#{produto_id}", 0)])
+                if linha[1] < quantidade:
+                    raise EstoqueInsuficiente([(linha[0], max(linha[1], 0))])
+                cursor.execute("INSERT INTO reservas (carrinho, produto_id, quantidade, expira_em) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (carrinho, produto_id) DO UPDATE SET quantidade = excluded.quantidade",
+                               (carrinho, produto_id, quantidade, agora))
+            cursor.execute("UPDATE reservas SET expira_em = ? WHERE carrinho = ?", (agora + minutos * 60, carrinho))
+        ServicoReservas._escrever(alterar)
+
+    @staticmethod
+    def liberar(carrinho):
+        # Carrinho cancelado ou abandonado
+        ServicoReservas._escrever(lambda cursor, agora, produto_ids: ServicoReservas._liberar(cursor, carrinho, produto_ids))
+
+    @staticmethod
+    def expirar():
+        # Para terminais parados: só abre transação se houver o que apagar
+        if DBManager.consultar_um("SELECT 1 FROM reservas WHERE expira_em <= ? LIMIT 1", (time.time(),)) is None:
+            return False
+        ServicoReservas._escrever(lambda cursor, agora, produto_ids: None)
+        return True
+
+class ServicoPedidos:
+    @staticmethod
+    def finalizar_ids(cliente, itens, carrinho=None):
+        # itens: lista de (produto_id, quantidade); preço e nome vêm do catálogo
+        ProdutoCatalog.sincronizar()
+        produtos = []
+        for produto_id, quantidade in itens:
+            produto = ProdutoCatalog.por_id(produto_id)
+            if produto is None:
+                raise EstoqueInsuficiente([(f"#{produto_id}", 0)])
+            if quantidade <= 0:
+                raise ValueError(f"Quantidade inválida para {produto.nome}: {quantidade}")
+            produtos.append((produto, quantidade))
+        return ServicoPedidos.finalizar(cliente, produtos, carrinho)
+
+    @staticmethod
+    def finalizar(cliente, itens, carrinho=None):
+        # itens: lista de (Produto, quantidade). Com carrinho, as reservas dele
+        # viram a venda: são apagadas na mesma transação que baixa o estoque
+        quantidades = {}
+        precos = {}
+        for produto, quantidade in itens:
+            quantidades[produto.id] = quantidades.get(produto.id, 0) + quantidade
+            precos[produto.id] = produto.preco
+        decrementos = [(q, produto_id, q) for produto_id, q in quantidades.items()]
+
+        itens_str = ", ".join(f"{q}x {p.nome}" for p, q in itens)
+        agora = datetime.now()
+        total_venda = Dinheiro.somar(p.preco.centavos * q for p, q in itens)
+
+        try:
+            with DBManager.transacao() as cursor:
+                versao_antes = cursor.execute("SELECT versao FROM versoes WHERE tabela = 'produtos'").fetchone()[0]
+                produto_ids = ServicoReservas._expirar(cursor, time.time())
+                if carrinho:
+                    ServicoReservas._liberar(cursor, carrinho, produto_ids)
+                produto_ids.update(quantidades)
+                # Decremento condicional: se outro terminal vendeu ou reservou
+                # antes, alguma linha não é atualizada e o pedido inteiro é desfeito
+                cursor.executemany("UPDATE produtos SET quantidade = quantidade - ? WHERE id = ? AND quantidade - reservado >= ?",
+                                   decrementos)
+                if cursor.rowcount != len(decrementos):
+                    raise EstoqueInsuficiente([])
+
+                cursor.execute("INSERT INTO pedidos (cliente, status, data_hora, itens) VALUES (?, ?, ?, ?)",
+                               (cliente, "Aberto", agora.strftime("%Y-%m-%d %H:%M:%S"), itens_str))
+                pedido_id = cursor.lastrowid
+                cursor.execute("INSERT INTO pedido_eventos (pedido_id, status, data_hora) VALUES (?, ?, ?)",
+                               (pedido_id, "Aberto", agora.strftime("%Y-%m-%d %H:%M:%S")))
+                cursor.executemany("INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unit_centavos) "
+                                   "VALUES (?, ?, ?, ?)",
+                                   [(pedido_id, produto_id, q, precos[produto_id]) for produto_id, q in quantidades.items()])
+                cursor.execute("INSERT INTO fluxo_caixa (data, tipo, valor_centavos, pedido_id) VALUES (?, ?, ?, ?)",
+                               (agora.strftime("%Y-%m-%d"), "Venda", total_venda, pedido_id))
+
+                marcadores = ", ".join("?" * len(produto_ids))
+                vendidos = cursor.execute(f"SELECT id, nome, quantidade, preco_centavos, categoria, reservado FROM produtos WHERE id IN ({marcadores})",
+                                          tuple(produto_ids)).fetchall()
+                versao_depois = cursor.execute("SELECT versao FROM versoes WHERE tabela = 'produtos'").fetchone()[0]
+        except EstoqueInsuficiente:
+            raise EstoqueInsuficiente(ServicoPedidos._faltantes(quantidades, carrinho)) from None
+        ProdutoCatalog.aplicar_escrita(versao_antes, versao_depois, produtos=[Produto(*linha) for linha in vendidos])
+        return pedido_id
+
+    @staticmethod
+    def avancar(pedido_id, status_atual=None):
+        # Sem status_atual, avança a partir do status gravado; com ele, só
+        # avança se ninguém mudou o pedido desde que a tela o mostrou
+        with DBManager.transacao() as cursor:
+            if status_atual is None:
+                linha = cursor.execute("SELECT status FROM pedidos WHERE id = ?", (pedido_id,)).fetchone()
+                if linha is None:
+                    raise TransicaoInvalida(f"Pedido #{pedido_id} não encontrado.")
+                status_atual = linha[0]
+            novo_status = PROXIMO_STATUS.get(status_atual)
+            if novo_status is None:
+                raise TransicaoInvalida(f"Pedido #{pedido_id} já está {status_atual}.")
+            cursor.execute("UPDATE pedidos SET status = ? WHERE id = ? AND status = ?", (novo_status, pedido_id, status_atual))
+            if cursor.rowcount != 1:
+                raise TransicaoInvalida(f"Pedido #{pedido_id} foi alterado em outro terminal.")
+            cursor.execute("INSERT INTO pedido_eventos (pedido_id, status, data_hora) VALUES (?, ?, ?)",
+                           (pedido_id, novo_status, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        return novo_status
+
+    @staticmethod
+    def concluir(pedido_id):
+        # Só conclui a partir de Finalizado: pedido em outro status não é
+        # conflito com outro terminal, e quem pediu precisa saber o motivo
+        with DBManager.transacao() as cursor:
+            linha = cursor.execute("SELECT status FROM pedidos WHERE id = ?", (pedido_id,)).fetchone()
+            if linha is None:
+                raise TransicaoInvalida(f"Pedido #{pedido_id} não encontrado.")
+            if linha[0] == "Concluído":
+                raise TransicaoInvalida(f"Pedido #{pedido_id} já está Concluído.")
+            if linha[0] != "Finalizado":
+                raise PedidoNaoFinalizado(f"Pedido #{pedido_id} ainda não está Finalizado (está {linha[0]}).")
+            return ServicoPedidos.avancar(pedido_id, "Finalizado")
+
+    @staticmethod
+    def pedidos_abertos():
+        # Retorna também o alteracao_id de referência, para quem for aplicar
+        # o feed depois saber de onde continuar
+        ultima = DBManager.consultar_um("SELECT COALESCE(MAX(alteracao_id), 0) FROM pedidos")[0]
+        marcadores = ", ".join("?" * len(STATUS_KANBAN))
+        pedidos = DBManager.consultar(f"SELECT id, cliente, status, data_hora, itens FROM pedidos WHERE status IN ({marcadores}) ORDER BY id",
+                                      STATUS_KANBAN)
+        return ultima, pedidos
+
+    @staticmethod
+    def alteracoes_desde(alteracao_id):
+        return DBManager.consultar("SELECT id, cliente, status, data_hora, itens, alteracao_id FROM pedidos "
+                                   "WHERE alteracao_id > ? ORDER BY alteracao_id", (alteracao_id,))
+
+    @staticmethod
+    def _faltantes(quantidades, carrinho=None):
+        # O disponível para este carrinho conta as reservas dele mesmo
+        marcadores = ", ".join("?" * len(quantidades))
+        produtos = DBManager.consultar(f"SELECT id, nome, quantidade - reservado + COALESCE((SELECT quantidade FROM reservas "
+                                       f"WHERE carrinho = ? AND produto_id = produtos.id AND expira_em > ?), 0) "
+                                       f"FROM produtos WHERE id IN ({marcadores})",
+                                       (carrinho, time.time(), *quantidades))
+        encontrados = {p[0]: p for p in produtos}
+        faltantes = []
+        for produto_id, quantidade in quantidades.items():
+            produto = encontrados.get(produto_id)
+            if produto is None:
+                faltantes.append((f"#{produto_id}", 0))
+            elif produto[2] < quantidade:
+                faltantes.append((produto[1], max(produto[2], 0)))
+        return faltantes
+
+class ServicoCaixa:
+    @staticmethod
+    def registrar_despesa(valor, descricao, data=None):
+        # valor: Dinheiro ou valor em reais
+        valor = Dinheiro.de_reais(valor)
+        data = data or datetime.now().strftime("%Y-%m-%d")
+        with DBManager.transacao() as cursor:
+            cursor.execute("INSERT INTO fluxo_caixa (data, tipo, valor_centavos) VALUES (?, ?, ?)",
+                           (data, f"Despesa: {descricao}", valor))
+            return cursor.lastrowid
+
+class FilaEscrita:
+    # Um único escritor para quem recebe escritas de vários lugares ao mesmo
+    # tempo (a API): as tarefas entram numa fila e uma thread só as executa
+    # em lote, uma transação por lote e um savepoint por tarefa, então uma
+    # venda recusada não desfaz as outras do mesmo lote
+    LOTE = 64
+
+    def __init__(self):
+        self._fila = queue.Queue()
+        self._thread = threading.Thread(target=self._executar, name="fila-escrita", daemon=True)
+        self._thread.start()
+
+    def enviar(self, funcao, *args):
+        # concurrent.futures puxa logging e cia.: só quem usa a fila paga a importação
+        from concurrent.futures import Future
+        futuro = Future()
+        self._fila.put((funcao, args, futuro))
+        return futuro
+
+    def parar(self):
+        self._fila.put(None)
+        self._thread.join()
+
+    def _executar(self):
+        try:
+            while True:
+                tarefa = self._fila.get()
+                if tarefa is None:
+                    return
+                lote = [tarefa]
+                while len(lote) < self.LOTE:
+                    try:
+                        tarefa = self._fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if tarefa is None:
+                        self._fila.put(None)
+                        break
+                    lote.append(tarefa)
+                self._executar_lote(lote)
+        finally:
+            DBManager._fechar(threading.get_ident())
+
+    def _executar_lote(self, lote):
+        resultados = []
+        try:
+            with DBManager.transacao():
+                for funcao, args, futuro in lote:
+                    try:
+                        resultados.append((futuro, funcao(*args), None))
+                    except Exception as e:
+                        resultados.append((futuro, None, e))
+        except Exception as e:
+            # O COMMIT falhou: nada do lote foi gravado
+            ProdutoCatalog.invalidar()
+            for _, _, futuro in lote:
+                futuro.set_exception(e)
+            return
+        for futuro, resultado, erro in resultados:
+            if erro is not None:
+                futuro.set_exception(erro)
+            else:
+                futuro.set_result(resultado)
+
+def banco_ocupado(erro):
+    mensagem = str(erro).lower()
+    return "locked" in mensagem or "busy" in mensagem
+
+class RelatorioCaixa:
+    @staticmethod
+    def totais(inicio, fim):
+        # Soma de inteiros no SQLite: exata, e o período inteiro é uma linha por dia
+        vendas, despesas, qtd_vendas, qtd_despesas = DBManager.consultar_um(
+            "SELECT COALESCE(SUM(vendas_centavos), 0), COALESCE(SUM(despesas_centavos), 0), "
+            "COALESCE(SUM(qtd_vendas), 0), COALESCE(SUM(qtd_despesas), 0) "
+            "FROM resumo_diario WHERE data BETWEEN ? AND ?", (inicio, fim))
+        return Dinheiro(vendas), Dinheiro(despesas), qtd_vendas, qtd_despesas
+
+    @staticmethod
+    def _lancamentos(inicio, fim, valor="f.valor_centavos"):
+        # Lançamentos do período já com o pedido de cada venda, numa consulta
+        # só, incluindo os que já foram para o arquivo
+        lancamentos = nas_duas_partes("SELECT f.data, f.tipo, " + valor + " AS valor, p.id AS pedido_id, p.cliente, "
+                                      "p.itens, f.id AS lancamento_id FROM {parte}.fluxo_caixa f "
+                                      "LEFT JOIN {parte}.pedidos p ON p.id = f.pedido_id WHERE f.data BETWEEN ?1 AND ?2")
+        return DBManager.consultar(f"SELECT data, tipo, valor, pedido_id, cliente, itens FROM ({lancamentos}) "
+                                   "ORDER BY data, tipo, lancamento_id", (inicio, fim))
+
+    @staticmethod
+    def detalhes(inicio, fim):
+        return [(data, tipo, Dinheiro(valor), pedido_id, cliente, itens)
+                for data, tipo, valor, pedido_id, cliente, itens in RelatorioCaixa._lancamentos(inicio, fim)]
+
+    @staticmethod
+    def texto(inicio, fim=None):
+        fim = fim or inicio
+        total_vendas, total_despesas, _, _ = RelatorioCaixa.totais(inicio, fim)
+        periodo = inicio if inicio == fim else f"{inicio} a {fim}"
+
+        linhas = [
+            f"Relatório de Caixa - {periodo}",
+            "",
+            f"Total de Vendas: R$ {total_vendas:.2f}",
+            f"Total de Despesas: R$ {total_despesas:.2f}",
+            f"Saldo do {'Dia' if inicio == fim else 'Período'}: R$ {total_vendas - total_despesas:.2f}",
+            "",
+            "Detalhes:",
+        ]
+        data_anterior = None
+        # O SQLite já devolve o valor formatado: um mês tem milhares de
+        # lançamentos e nenhum precisa de conta em Python
+        for data, tipo, valor, pedido_id, cliente, itens in RelatorioCaixa._lancamentos(
+                inicio, fim, "printf('%.2f', f.valor_centavos / 100.0)"):
+            if inicio != fim and data != data_anterior:
+                linhas.append(f"[{data}]")
+                data_anterior = data
+            if tipo == "Venda" and pedido_id is not None:
+                linhas.append(f"Venda #{pedido_id} - Cliente: {cliente} - R$ {valor}")
+                linhas.append(f"  Itens: {itens}")
+            else:
+                linhas.append(f"{tipo}: R$ {valor}")
+        return "\n".join(linhas) + "\n"
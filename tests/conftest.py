@@ -0,0 +1,21 @@
+# Cada teste ganha um banco próprio numa pasta temporária: o estoque.db do
+# repositório nunca é aberto.
+import pytest
+
+import servicos
+from servicos import DBManager, ProdutoCatalog
+
+
+@pytest.fixture
+def caminho_banco(tmp_path, monkeypatch):
+    # Só o caminho; quem precisa de um banco em versão antiga monta antes
+    monkeypatch.setattr(servicos, "DB_NAME", str(tmp_path / "teste.db"))
+    ProdutoCatalog.invalidar()
+    yield servicos.DB_NAME
+    DBManager.fechar_conexoes()
+
+
+@pytest.fixture
+def banco(caminho_banco):
+    DBManager.initialize_database()
+    return caminho_banco
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+import analise
+from servicos import DBManager, ProdutoCatalog, ServicoPedidos, ServicoProdutos
+
+
+@pytest.fixture
+def pedido(banco):
+    produto_id = ServicoProdutos.adicionar("Suco", 5, "4,99")
+    ProdutoCatalog.sincronizar()
+    return ServicoPedidos.finalizar("Ana", [(ProdutoCatalog.por_id(produto_id), 1)])
+
+
+def eventos(pedido_id):
+    return [linha[0] for linha in DBManager.consultar("SELECT status FROM pedido_eventos WHERE pedido_id = ? ORDER BY id",
+                                                      (pedido_id,))]
+
+
+def test_cada_transicao_grava_um_evento(pedido):
+    ServicoPedidos.avancar(pedido)
+    ServicoPedidos.avancar(pedido)
+    ServicoPedidos.concluir(pedido)
+    assert eventos(pedido) == ["Aberto", "Em Andamento", "Finalizado", "Concluído"]
+
+
+@pytest.mark.parametrize("comando", [
+    "UPDATE pedido_eventos SET status = 'Concluído'",
+    "UPDATE pedido_eventos SET data_hora = '2000-01-01 00:00:00'",
+])
+def test_pedido_eventos_nao_aceita_update(pedido, comando):
+    with pytest.raises(sqlite3.IntegrityError, match="pedido_eventos não pode ser alterado"):
+        with DBManager.transacao() as cursor:
+            cursor.execute(comando)
+    assert eventos(pedido) == ["Aberto"]
+
+
+def test_tempos_etapas_mede_cada_pedido_pelos_eventos(banco):
+    with DBManager.transacao() as cursor:
+        cursor.executemany("INSERT INTO pedido_eventos (pedido_id, status, data_hora) VALUES (?, ?, ?)", [
+            (100, "Aberto", "2026-01-01 10:00:00"), (100, "Em Andamento", "2026-01-01 10:02:00"),
+            (100, "Finalizado", "2026-01-01 10:10:00"),
+            (101, "Aberto", "2026-01-01 10:00:00"), (101, "Em Andamento", "2026-01-01 10:06:00"),
+            # Fora da janela
+            (102, "Aberto", "2025-12-31 23:00:00"), (102, "Em Andamento", "2025-12-31 23:30:00"),
+        ])
+    etapas = {etapa.pop("etapa"): etapa for etapa in analise.tempos_etapas("2026-01-01 00:00:00", "2026-01-02 00:00:00")}
+    assert etapas["Espera"] == {"pedidos": 2, "p50_s": pytest.approx(120), "p95_s": pytest.approx(360),
+                                "max_s": pytest.approx(360)}
+    assert etapas["Preparo"]["pedidos"] == 1 and etapas["Preparo"]["max_s"] == pytest.approx(480)
+    assert etapas["Cozinha (total)"]["max_s"] == pytest.approx(600)
+    assert etapas["Retirada"] == {"pedidos": 0, "p50_s": None, "p95_s": None, "max_s": None}
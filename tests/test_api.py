@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import pytest
+
+from api import ServidorAPI
+from servicos import DBManager, ServicoProdutos
+
+
+@pytest.fixture
+def servidor(banco):
+    ServicoProdutos.adicionar("Suco", 3, "4,99")
+    servidor = ServidorAPI()
+    yield servidor
+    servidor.fechar()
+
+
+def requisicao(metodo, alvo, corpo=None, conexao="close"):
+    conteudo = b"" if corpo is None else json.dumps(corpo).encode("utf-8")
+    return (f"{metodo} {alvo} HTTP/1.1\r\nContent-Length: {len(conteudo)}\r\n"
+            f"Connection: {conexao}\r\n\r\n").encode("latin-1") + conteudo
+
+
+def chamar(servidor, *brutos):
+    # Cada requisição numa conexão nova com o servidor de verdade; devolve
+    # (status, corpo JSON) de cada uma
+    async def rodar():
+        escuta = await asyncio.start_server(servidor.tratar_conexao, "127.0.0.1", 0)
+        porta = escuta.sockets[0].getsockname()[1]
+        respostas = []
+        async with escuta:
+            for bruto in brutos:
+                reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+                writer.write(bruto)
+                await writer.drain()
+                resposta = await asyncio.wait_for(reader.read(), 5)
+                writer.close()
+                cabecalho, _, corpo = resposta.partition(b"\r\n\r\n")
+                respostas.append((int(cabecalho.split()[1]), json.loads(corpo)))
+        return respostas
+    return asyncio.run(rodar())
+
+
+def test_reserva_venda_e_feed_de_pedidos(servidor):
+    respostas = chamar(
+        servidor,
+        requisicao("PUT", "/carrinhos/tablet-1/itens/1", {"quantidade": 2}),
+        requisicao("GET", "/produtos?busca=suco"),
+        requisicao("POST", "/pedidos", {"cliente": "Ana", "itens": [{"produto_id": 1, "quantidade": 2}],
+                                        "carrinho": "tablet-1"}),
+        requisicao("GET", "/pedidos"),
+        requisicao("POST", "/pedidos/1/avancar", {"status_atual": "Aberto"}),
+        requisicao("GET", "/pedidos/alteracoes?desde=1"),
+    )
+    assert [status for status, _ in respostas] == [200, 200, 201, 200, 200, 200]
+    assert respostas[1][1] == [{"id": 1, "nome": "Suco", "quantidade": 3, "disponivel": 1, "preco": 4.99,
+                                "categoria": ""}]
+    assert respostas[2][1] == {"id": 1}
+    assert [pedido["id"] for pedido in respostas[3][1]["pedidos"]] == [1]
+    assert respostas[4][1] == {"id": 1, "status": "Em Andamento"}
+    assert [(pedido["id"], pedido["status"], pedido["alteracao_id"]) for pedido in respostas[5][1]] == [
+        (1, "Em Andamento", 2)]
+    # A venda converteu a reserva do carrinho
+    assert DBManager.consultar("SELECT quantidade, reservado FROM produtos") == [(1, 0)]
+
+
+def test_keep_alive_responde_varias_requisicoes_na_mesma_conexao(servidor):
+    async def rodar():
+        escuta = await asyncio.start_server(servidor.tratar_conexao, "127.0.0.1", 0)
+        async with escuta:
+            reader, writer = await asyncio.open_connection("127.0.0.1", escuta.sockets[0].getsockname()[1])
+            writer.write(requisicao("GET", "/pedidos", conexao="keep-alive") + requisicao("GET", "/produtos"))
+            await writer.drain()
+            resposta = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return resposta
+    resposta = asyncio.run(rodar())
+    assert resposta.count(b"HTTP/1.1 200 OK\r\n") == 2
+    assert b"Connection: keep-alive\r\n" in resposta
+
+
+@pytest.mark.parametrize("bruto, status, erro", [
+    (requisicao("GET", "/nada"), 404, "Rota não encontrada: /nada"),
+    (requisicao("GET", "/despesas"), 405, "Método GET não permitido em /despesas."),
+    (b"POST /despesas HTTP/1.1\r\nContent-Length: 3\r\nConnection: close\r\n\r\n{x}", 400,
+     "Corpo da requisição não é um JSON válido."),
+    (requisicao("POST", "/pedidos", {"itens": [{"produto_id": 1, "quantidade": 1}]}), 400,
+     "É necessário informar o nome do cliente!"),
+    (requisicao("POST", "/despesas", {"valor": -5, "descricao": "Gás"}), 400, "Informe um valor de despesa positivo."),
+    (requisicao("GET", "/relatorio?inicio=2026-13-01"), 400, "Parâmetro inicio deve ser uma data AAAA-MM-DD."),
+    (requisicao("GET", "/pedidos/alteracoes?desde=x"), 400, "Parâmetro desde deve ser um número inteiro."),
+    (requisicao("POST", "/pedidos/99/avancar"), 409, "Pedido #99 não encontrado."),
+    (b"POST /despesas HTTP/1.1\r\nContent-Length: -5\r\n\r\n", 400, "Content-Length inválido."),
+    (b"POST /despesas HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n", 413, "Corpo da requisição muito grande."),
+    (b"GET /" + b"a" * 70000 + b" HTTP/1.1\r\n\r\n", 413, "Linha da requisição muito longa."),
+    (b"GET /produtos HTTP/1.1\r\nX: " + b"a" * 70000 + b"\r\n\r\n", 413, "Linha da requisição muito longa."),
+    (b"GET /produtos HTTP/1.1\r\n" + b"X: 1\r\n" * 200 + b"\r\n", 413, "Cabeçalhos demais na requisição."),
+    (b"lixo\r\n\r\n", 400, "Linha de requisição inválida."),
+    (b"GET /produtos HTTP/1.1\r\nsem dois pontos\r\n\r\n", 400, "Cabeçalho inválido."),
+])
+def test_erros_respondem_com_o_status_e_a_mensagem(servidor, bruto, status, erro):
+    assert chamar(servidor, bruto) == [(status, {"erro": erro})]
+
+
+def test_venda_acima_do_disponivel_e_conclusao_fora_de_hora_sao_conflito(servidor):
+    respostas = chamar(
+        servidor,
+        requisicao("PUT", "/carrinhos/tablet-1/itens/1", {"quantidade": 2}),
+        requisicao("PUT", "/carrinhos/tablet-2/itens/1", {"quantidade": 2}),
+        requisicao("POST", "/pedidos", {"cliente": "Bia", "itens": [{"produto_id": 1, "quantidade": 2}]}),
+        requisicao("POST", "/pedidos", {"cliente": "Bia", "itens": [{"produto_id": 1, "quantidade": 1}]}),
+        requisicao("POST", "/pedidos/1/concluir"),
+    )
+    assert [status for status, _ in respostas] == [200, 409, 409, 201, 409]
+    # O disponível já desconta os 2 reservados pelo tablet-1
+    assert respostas[1][1]["faltantes"] == [{"produto": "Suco", "disponivel": 1}]
+    assert respostas[2][1]["faltantes"] == [{"produto": "Suco", "disponivel": 1}]
+    assert respostas[4][1] == {"erro": "Pedido #1 ainda não está Finalizado (está Aberto)."}
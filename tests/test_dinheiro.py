@@ -0,0 +1,82 @@
+from decimal import Decimal
+
+import pytest
+
+from servicos import Dinheiro
+
+
+@pytest.mark.parametrize("valor, centavos", [
+    ("12,50", 1250),
+    ("12.5", 1250),
+    ("R$ 1.234,56", 123456),
+    (" 7 ", 700),
+    ("0,1", 10),
+    (12.5, 1250),
+    (3, 300),
+    (Decimal("9.99"), 999),
+    ("-4,20", -420),
+])
+def test_de_reais_le_texto_numero_e_decimal(valor, centavos):
+    assert Dinheiro.de_reais(valor).centavos == centavos
+
+
+@pytest.mark.parametrize("valor, centavos", [
+    ("1,005", 101),
+    ("1,004", 100),
+    ("0,005", 1),
+    ("-0,005", -1),
+])
+def test_de_reais_arredonda_meio_centavo_para_longe_do_zero(valor, centavos):
+    assert Dinheiro.de_reais(valor).centavos == centavos
+
+
+def test_de_reais_usa_o_float_como_foi_escrito():
+    # 2.675 em binário é 2.67499999...; round(2.675 * 100) daria 267
+    assert Dinheiro.de_reais(2.675).centavos == 268
+    assert Dinheiro.de_reais(0.1).centavos == 10
+
+
+@pytest.mark.parametrize("valor", ["", "abc", "12,5,0", "nan", "inf", "-Infinity", True, None])
+def test_de_reais_recusa_o_que_nao_e_valor(valor):
+    with pytest.raises(ValueError):
+        Dinheiro.de_reais(valor)
+
+
+def test_de_reais_devolve_o_proprio_dinheiro():
+    valor = Dinheiro(150)
+    assert Dinheiro.de_reais(valor) is valor
+
+
+@pytest.mark.parametrize("centavos", [1.5, "150", Decimal("1.50"), True])
+def test_construtor_so_aceita_centavos_inteiros(centavos):
+    with pytest.raises(TypeError):
+        Dinheiro(centavos)
+
+
+def test_soma_exata_onde_o_float_erra():
+    assert 0.1 + 0.2 != 0.3
+    assert Dinheiro.de_reais("0,1") + Dinheiro.de_reais("0,2") == Dinheiro.de_reais("0,3")
+    assert sum([Dinheiro(10)] * 10) == Dinheiro(100)
+    assert Dinheiro.somar(10 for _ in range(1000)) == Dinheiro(10_000)
+
+
+def test_aritmetica_e_comparacao():
+    preco = Dinheiro(350)
+    assert preco * 3 == 3 * preco == Dinheiro(1050)
+    assert preco - Dinheiro(400) == -Dinheiro(50)
+    assert Dinheiro(1) > Dinheiro()
+    assert not Dinheiro()
+    assert {Dinheiro(5), Dinheiro(5)} == {Dinheiro(5)}
+    with pytest.raises(TypeError):
+        preco * 1.5
+    with pytest.raises(TypeError):
+        preco + 1
+
+
+def test_texto_reais_e_float():
+    assert str(Dinheiro(123456)) == "1234.56"
+    assert str(Dinheiro(-5)) == "-0.05"
+    assert f"{Dinheiro(1250):.2f}" == "12.50"
+    assert f"{Dinheiro(1250):,.1f}" == "12.5"
+    assert Dinheiro(1250).reais == Decimal("12.50")
+    assert float(Dinheiro(1)) == 0.01
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt5.QtWidgets")
+
+import estoque_app
+from estoque_app import DBAssincrono, GerenciarEstoque, VendaProdutos
+from servicos import DBManager, EstoqueInsuficiente, ProdutoCatalog, ServicoProdutos, ServicoReservas
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def esperar(app):
+    app.processEvents()
+    while not DBAssincrono.ocioso():
+        DBAssincrono.aguardar()
+        app.processEvents()
+
+
+@pytest.mark.parametrize("digitado, centavos", [(None, 499), ("4,99", 499), ("R$ 12,345", 1235)])
+def test_editar_produto_guarda_o_preco_em_centavos(banco, app, monkeypatch, digitado, centavos):
+    produto_id = ServicoProdutos.adicionar("Suco", 3, "4,99")
+    tela = GerenciarEstoque(None)
+    esperar(app)
+    tela.tabela_produtos.selectRow(0)
+    # Confirma cada diálogo com o valor já preenchido, trocando só o preço
+    def texto(parent, titulo, rotulo, text=""):
+        return (digitado if rotulo == "Preço:" and digitado is not None else text), True
+    monkeypatch.setattr(estoque_app.QInputDialog, "getText", staticmethod(texto))
+    monkeypatch.setattr(estoque_app.QInputDialog, "getInt", staticmethod(lambda parent, titulo, rotulo, valor: (valor, True)))
+    tela.editar_produto()
+    esperar(app)
+    assert DBManager.consultar_um("SELECT preco_centavos FROM produtos WHERE id = ?", (produto_id,))[0] == centavos
+    assert tela.modelo_produtos.linha(0)[3] == f"{centavos / 100:.2f}"
+    tela.deleteLater()
+
+
+def reservas(carrinho):
+    return DBManager.consultar("SELECT produto_id, quantidade FROM reservas WHERE carrinho = ?", (carrinho,))
+
+
+@pytest.fixture
+def venda_finalizando(banco, app, monkeypatch):
+    # Tela com 2 sucos reservados e a finalização parada no meio: as tarefas
+    # de banco ficam guardadas em vez de rodar
+    produto_id = ServicoProdutos.adicionar("Suco", 5, "4,99")
+    ProdutoCatalog.sincronizar()
+    tela = VendaProdutos(None)
+    tela.mostrar_pedido()
+    tela.reservar(ProdutoCatalog.por_id(produto_id), 2)
+    esperar(app)
+    tarefas = []
+    monkeypatch.setattr(estoque_app.DBAssincrono, "executar",
+                        lambda funcao, *args, **opcoes: tarefas.append((funcao, args, opcoes)))
+    monkeypatch.setattr(estoque_app.QInputDialog, "getText", staticmethod(lambda *args: ("Ana", True)))
+    monkeypatch.setattr(estoque_app.QMessageBox, "warning", staticmethod(lambda *args: None))
+    carrinho = tela.carrinho.id
+    tela.finalizar_pedido()
+    assert [funcao for funcao, _, _ in tarefas] == [estoque_app.ServicoPedidos.finalizar]
+    yield tela, carrinho, produto_id, tarefas
+    tela.deleteLater()
+
+
+def test_carrinho_fica_travado_durante_a_finalizacao(venda_finalizando):
+    tela, carrinho, produto_id, tarefas = venda_finalizando
+    assert not tela.scroll_area.isEnabled()
+    assert not tela.painel_pedido.isEnabled()
+    assert not tela.btn_finalizar_pedido.isEnabled()
+    assert not tela.btn_cancelar_pedido.isEnabled()
+
+
+def test_falha_depois_de_abandonar_o_carrinho_libera_as_reservas(venda_finalizando):
+    tela, carrinho, produto_id, tarefas = venda_finalizando
+    # Fechar a janela no meio da finalização recomeça o carrinho, mas as
+    # reservas ainda são da venda em andamento
+    tela.reiniciar()
+    assert tela.carrinho.id != carrinho
+    assert len(tarefas) == 1
+    assert reservas(carrinho) == [(produto_id, 2)]
+
+    _, _, opcoes = tarefas[0]
+    opcoes["ao_falhar"](EstoqueInsuficiente([]))
+    funcao, args, _ = tarefas[-1]
+    assert (funcao, args) == (ServicoReservas.liberar, (carrinho,))
+    funcao(*args)
+    assert reservas(carrinho) == []
+
+
+def test_falha_com_o_mesmo_carrinho_mantem_as_reservas(venda_finalizando):
+    tela, carrinho, produto_id, tarefas = venda_finalizando
+    _, _, opcoes = tarefas[0]
+    opcoes["ao_falhar"](EstoqueInsuficiente([]))
+    assert len(tarefas) == 1
+    assert tela.carrinho.id == carrinho
+    assert tela.scroll_area.isEnabled() and tela.btn_finalizar_pedido.isEnabled()
+    assert reservas(carrinho) == [(produto_id, 2)]
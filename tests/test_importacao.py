@@ -0,0 +1,102 @@
+import pytest
+
+import importacao
+from importacao import ErroImportacao, importar_produtos, validar
+from servicos import DBManager
+
+
+def escrever(pasta, nome, conteudo):
+    caminho = pasta / nome
+    caminho.write_text(conteudo, encoding="utf-8")
+    return str(caminho)
+
+
+def produtos():
+    return DBManager.consultar("SELECT sku, nome, quantidade, preco_centavos, categoria FROM produtos ORDER BY id")
+
+
+def test_validar_converte_os_campos():
+    valor, campos = validar({"nome": " X-Burger ", "quantidade": "10,0", "preco": "R$ 12,50", "categoria": "Lanches"},
+                            "nome")
+    assert valor == "X-Burger"
+    assert campos == {"nome": "X-Burger", "quantidade": 10, "preco_centavos": 1250, "categoria": "Lanches"}
+
+
+@pytest.mark.parametrize("registro, mensagem", [
+    ({"nome": "A", "quantidade": "10,5"}, "quantidade inválida"),
+    ({"nome": "A", "quantidade": "dez"}, "quantidade inválida"),
+    ({"nome": "A", "quantidade": True}, "quantidade inválida"),
+    ({"nome": "A", "quantidade": -1}, "quantidade negativa"),
+    ({"nome": "A", "preco": "caro"}, "preço inválido"),
+    ({"nome": "A", "preco": "-1,00"}, "preço negativo"),
+    ({"nome": " ", "preco": "1"}, "sem nome"),
+])
+def test_validar_recusa_linha_invalida(registro, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        validar(registro, "nome")
+
+
+def test_importacao_csv_recusa_so_as_linhas_invalidas(banco, tmp_path):
+    # Separador ; e cabeçalhos sinônimos, como sai do Excel em português
+    caminho = escrever(tmp_path, "lista.csv",
+                       "Produto;Estoque;Preço Unitário;Categoria\n"
+                       "X-Burger;10;12,50;Lanches\n"
+                       "Suco;;abc;Bebidas\n"
+                       "Coxinha;-3;5,00;Salgados\n"
+                       "Pastel;4;;Salgados\n"
+                       "Café;20;3,5;Bebidas\n")
+    resultado = importar_produtos(caminho)
+    assert (resultado.lidas, resultado.inseridos, resultado.atualizados, resultado.invalidas) == (5, 2, 0, 3)
+    assert resultado.erros == [(3, "preço inválido: 'abc'"), (4, "quantidade negativa: -3"),
+                               (5, "produto novo precisa de nome e preço")]
+    assert produtos() == [(None, "X-Burger", 10, 1250, "Lanches"), (None, "Café", 20, 350, "Bebidas")]
+
+
+def test_importacao_atualiza_so_as_colunas_presentes_e_soma(banco, tmp_path):
+    importar_produtos(escrever(tmp_path, "a.json", '[{"nome": "Suco", "quantidade": 5, "preco": 4.5}]'))
+    # Só preço: o estoque fica como estava
+    resultado = importar_produtos(escrever(tmp_path, "b.jsonl", '{"nome": "Suco", "preco": "5,00"}\n'))
+    assert (resultado.inseridos, resultado.atualizados) == (0, 1)
+    assert produtos() == [(None, "Suco", 5, 500, "")]
+    importar_produtos(escrever(tmp_path, "c.csv", "nome,qtd\nSuco,3\n"), somar=True)
+    assert produtos() == [(None, "Suco", 8, 500, "")]
+
+
+def test_sku_repetido_recusa_so_a_linha_que_conflita(banco, tmp_path, monkeypatch):
+    # O UNIQUE do SKU derruba o lote inteiro; a regravação linha a linha,
+    # com um savepoint por linha, guarda as outras
+    DBManager.executar("INSERT INTO produtos (sku, nome, quantidade, preco_centavos) VALUES ('S1', 'Velho', 1, 100)")
+    monkeypatch.setattr(importacao, "LOTE", 10)
+    caminho = escrever(tmp_path, "skus.csv",
+                       "nome,sku,preco\n"
+                       "Novo A,S2,1\n"
+                       "Novo B,S1,2\n"
+                       "Novo C,S3,3\n"
+                       "Novo D,S3,4\n")
+    resultado = importar_produtos(caminho)
+    assert resultado.inseridos == 2
+    assert resultado.erros == [(3, "SKU já usado por outro produto"), (5, "SKU já usado por outro produto")]
+    assert produtos() == [("S1", "Velho", 1, 100, ""), ("S2", "Novo A", 0, 100, ""), ("S3", "Novo C", 0, 300, "")]
+    assert DBManager.consultar_um("PRAGMA integrity_check")[0] == "ok"
+
+
+def test_importacao_por_sku(banco, tmp_path):
+    importar_produtos(escrever(tmp_path, "a.csv", "cod,nome,preco\nS1,Água,2\n"), chave="sku")
+    importar_produtos(escrever(tmp_path, "b.csv", "cod,nome\nS1,Água com gás\n"), chave="sku")
+    assert produtos() == [("S1", "Água com gás", 0, 200, "")]
+
+
+@pytest.mark.parametrize("nome, conteudo, mensagem", [
+    ("lista.xlsx", "", "Formato não suportado"),
+    ("lista.json", '[{"nome": "A"}, 3]', "não é um objeto"),
+    ("lista.json", '[{"nome": "A"}', "JSON incompleto"),
+    ("lista.jsonl", '{"nome": "A"}\n{nome}\n', "Linha 2: JSON inválido"),
+])
+def test_arquivo_malformado(banco, tmp_path, nome, conteudo, mensagem):
+    with pytest.raises(ErroImportacao, match=mensagem):
+        importar_produtos(escrever(tmp_path, nome, conteudo))
+
+
+def test_chave_desconhecida(banco, tmp_path):
+    with pytest.raises(ErroImportacao, match="Chave de importação inválida"):
+        importar_produtos(escrever(tmp_path, "a.csv", "nome\nA\n"), chave="id")
@@ -0,0 +1,98 @@
+import sqlite3
+
+import servicos
+from servicos import (
+    DBManager, MIGRACOES, ProdutoCatalog, ServicoProdutos, ServicoReservas, VERSAO_ARQUIVO, VERSOES_CATALOGO,
+    caminho_arquivo
+)
+
+# Arquivo morto como a versão 1 o criava: dinheiro em REAL
+ARQUIVO_V1 = [
+    "CREATE TABLE arquivo.pedidos (id INTEGER PRIMARY KEY, cliente TEXT NOT NULL, status TEXT NOT NULL, "
+    "data_hora TEXT, itens TEXT NOT NULL, alteracao_id INTEGER NOT NULL DEFAULT 0)",
+    "CREATE TABLE arquivo.pedido_itens (id INTEGER PRIMARY KEY, pedido_id INTEGER NOT NULL, "
+    "produto_id INTEGER NOT NULL, quantidade INTEGER NOT NULL, preco_unit REAL NOT NULL)",
+    "CREATE TABLE arquivo.pedido_eventos (id INTEGER PRIMARY KEY, pedido_id INTEGER NOT NULL, "
+    "status TEXT NOT NULL, data_hora TEXT NOT NULL)",
+    "CREATE TABLE arquivo.fluxo_caixa (id INTEGER PRIMARY KEY, data TEXT NOT NULL, tipo TEXT NOT NULL, "
+    "valor REAL NOT NULL, pedido_id INTEGER)",
+    "CREATE INDEX arquivo.idx_pedido_itens_produto ON pedido_itens (produto_id, quantidade, preco_unit)",
+    "CREATE INDEX arquivo.idx_fluxo_caixa_data ON fluxo_caixa (data, tipo, valor)",
+    "INSERT INTO arquivo.pedidos VALUES (1, 'Antigo', 'Concluído', '2025-01-10 12:00:00', '1x Suco', 1)",
+    "INSERT INTO arquivo.pedido_itens VALUES (1, 1, 2, 1, 4.35)",
+    "INSERT INTO arquivo.fluxo_caixa VALUES (1, '2025-01-10', 'Venda', 4.35, 1)",
+    "INSERT INTO arquivo.fluxo_caixa VALUES (2, '2025-01-10', 'Despesa: Gás', 119.9, NULL)",
+    "PRAGMA arquivo.user_version = 1",
+]
+
+
+def criar_arquivo_v1(banco):
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("ATTACH DATABASE ? AS arquivo", (caminho_arquivo(banco),))
+    for comando in ARQUIVO_V1:
+        conn.execute(comando)
+    conn.close()
+
+
+def colunas(tabela, esquema="main"):
+    return [linha[1] for linha in DBManager.consultar(f"PRAGMA {esquema}.table_info({tabela})")]
+
+
+def test_banco_novo_chega_na_ultima_versao(banco):
+    assert DBManager.versao_schema() == MIGRACOES[-1][0]
+    assert DBManager.consultar_um("PRAGMA arquivo.user_version")[0] == VERSAO_ARQUIVO
+    assert DBManager.consultar_um("PRAGMA integrity_check")[0] == "ok"
+    # Rodar de novo não repete nenhuma migração
+    DBManager.initialize_database()
+    assert DBManager.versao_schema() == MIGRACOES[-1][0]
+
+
+def test_migracoes_numeradas_em_ordem():
+    numeros = [numero for numero, _ in MIGRACOES]
+    assert numeros == list(range(1, len(MIGRACOES) + 1))
+
+
+def test_reais_viram_centavos_nos_dois_bancos(caminho_banco, monkeypatch):
+    # Banco parado na versão 10 (dinheiro em REAL) e arquivo morto na 1
+    criar_arquivo_v1(caminho_banco)
+    monkeypatch.setattr(servicos, "MIGRACOES", [m for m in MIGRACOES if m[0] <= 10])
+    DBManager.initialize_database()
+    assert DBManager.versao_schema() == 10
+    # O arquivo é migrado ao abrir a conexão, antes da migração 11 do banco
+    assert DBManager.consultar_um("PRAGMA arquivo.user_version")[0] == VERSAO_ARQUIVO
+    assert DBManager.consultar("SELECT preco_unit_centavos FROM arquivo.pedido_itens") == [(435,)]
+    assert DBManager.consultar("SELECT valor_centavos FROM arquivo.fluxo_caixa ORDER BY id") == [(435,), (11990,)]
+    assert "preco_unit" not in colunas("pedido_itens", "arquivo")
+
+    conn = DBManager.conexao()
+    conn.execute("INSERT INTO produtos (nome, quantidade, preco) VALUES ('Suco', 5, 4.35)")
+    conn.execute("INSERT INTO produtos (nome, quantidade, preco) VALUES ('Café', 5, 0.1)")
+    conn.execute("INSERT INTO pedidos (cliente, status, data_hora, itens) "
+                 "VALUES ('Ana', 'Concluído', '2026-01-05 10:00:00', '3x Café')")
+    conn.execute("INSERT INTO pedido_itens (pedido_id, produto_id, quantidade, preco_unit) VALUES (1, 2, 3, 0.1)")
+    for valor in (0.1, 0.2, 0.3):
+        conn.execute("INSERT INTO fluxo_caixa (data, tipo, valor) VALUES ('2026-01-05', 'Venda', ?)", (valor,))
+
+    monkeypatch.setattr(servicos, "MIGRACOES", MIGRACOES)
+    DBManager.initialize_database()
+    assert DBManager.versao_schema() == MIGRACOES[-1][0]
+    assert DBManager.consultar("SELECT nome, preco_centavos FROM produtos ORDER BY id") == [("Suco", 435), ("Café", 10)]
+    assert DBManager.consultar("SELECT preco_unit_centavos FROM pedido_itens") == [(10,)]
+    assert "preco" not in colunas("produtos")
+    assert "valor" not in colunas("fluxo_caixa")
+    # O resumo é refeito a partir dos lançamentos dos dois bancos, sem o erro do float
+    assert DBManager.consultar("SELECT data, vendas_centavos, despesas_centavos, qtd_vendas, qtd_despesas "
+                               "FROM resumo_diario ORDER BY data") == [("2025-01-10", 435, 11990, 1, 1),
+                                                                        ("2026-01-05", 60, 0, 3, 0)]
+    assert DBManager.consultar_um("PRAGMA integrity_check")[0] == "ok"
+
+
+def test_reserva_nao_muda_a_versao_do_cadastro(banco):
+    produto_id = ServicoProdutos.adicionar("Suco", 10, "4,50")
+    ProdutoCatalog.sincronizar()
+    produtos, reservas = DBManager.consultar_um(VERSOES_CATALOGO)
+    ServicoReservas.reservar("carrinho", produto_id, 3)
+    assert DBManager.consultar_um(VERSOES_CATALOGO) == (produtos, reservas + 1)
+    assert ProdutoCatalog.por_id(produto_id).disponivel == 7
+    ServicoProdutos.editar(produto_id, "Suco de Laranja", 10, "4,50")
+    assert DBManager.consultar_um(VERSOES_CATALOGO) == (produtos + 1, reservas + 1)
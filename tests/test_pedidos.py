@@ -0,0 +1,90 @@
+import pytest
+
+from servicos import DBManager, EstoqueInsuficiente, ProdutoCatalog, ServicoPedidos, ServicoProdutos
+
+
+def estoque(*produto_ids):
+    return [DBManager.consultar_um("SELECT quantidade FROM produtos WHERE id = ?", (produto_id,))[0]
+            for produto_id in produto_ids]
+
+
+def contar(tabela):
+    return DBManager.consultar_um(f"SELECT COUNT(*) FROM {tabela}")[0]
+
+
+@pytest.fixture
+def cardapio(banco):
+    suco = ServicoProdutos.adicionar("Suco", 3, "4,99")
+    burger = ServicoProdutos.adicionar("X-Burger", 1, "12,50")
+    ProdutoCatalog.sincronizar()
+    return ProdutoCatalog.por_id(suco), ProdutoCatalog.por_id(burger)
+
+
+def test_venda_baixa_o_estoque_e_grava_o_pedido(cardapio):
+    suco, burger = cardapio
+    pedido_id = ServicoPedidos.finalizar("Ana", [(suco, 2), (burger, 1)])
+    assert estoque(suco.id, burger.id) == [1, 0]
+    assert DBManager.consultar("SELECT produto_id, quantidade, preco_unit_centavos FROM pedido_itens "
+                               "WHERE pedido_id = ? ORDER BY produto_id", (pedido_id,)) == [(suco.id, 2, 499),
+                                                                                           (burger.id, 1, 1250)]
+    assert DBManager.consultar_um("SELECT valor_centavos FROM fluxo_caixa WHERE pedido_id = ?", (pedido_id,))[0] == 2248
+
+
+def test_venda_acima_do_estoque_desfaz_o_pedido_inteiro(cardapio):
+    suco, burger = cardapio
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        ServicoPedidos.finalizar("Ana", [(suco, 1), (burger, 2)])
+    assert erro.value.faltantes == [("X-Burger", 1)]
+    # O suco, que tinha estoque, também não baixa
+    assert estoque(suco.id, burger.id) == [3, 1]
+    assert (contar("pedidos"), contar("pedido_itens"), contar("fluxo_caixa")) == (0, 0, 0)
+
+
+def test_a_mesma_quantidade_em_duas_linhas_soma_no_decremento(cardapio):
+    suco, _ = cardapio
+    with pytest.raises(EstoqueInsuficiente):
+        ServicoPedidos.finalizar("Ana", [(suco, 2), (suco, 2)])
+    assert estoque(suco.id) == [3]
+
+
+def test_catalogo_desatualizado_nao_vende_o_que_outro_terminal_vendeu(cardapio):
+    suco, burger = cardapio
+    # Outro terminal vende o último X-Burger; este ainda mostra 1 no catálogo
+    ServicoPedidos.finalizar("Bia", [(burger, 1)])
+    assert burger.quantidade == 1
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        ServicoPedidos.finalizar("Ana", [(burger, 1)])
+    assert erro.value.faltantes == [("X-Burger", 0)]
+    assert estoque(burger.id) == [0]
+    assert contar("pedidos") == 1
+
+
+def alteracao(pedido_id):
+    return DBManager.consultar_um("SELECT alteracao_id FROM pedidos WHERE id = ?", (pedido_id,))[0]
+
+
+def test_cada_escrita_em_pedidos_ganha_o_proximo_alteracao_id(cardapio):
+    suco, _ = cardapio
+    primeiro = ServicoPedidos.finalizar("Ana", [(suco, 1)])
+    segundo = ServicoPedidos.finalizar("Bia", [(suco, 1)])
+    assert (alteracao(primeiro), alteracao(segundo)) == (1, 2)
+    ServicoPedidos.avancar(primeiro)
+    assert alteracao(primeiro) == 3
+    # Colunas fora do feed não mudam o alteracao_id
+    DBManager.consultar("UPDATE pedidos SET data_hora = '2026-01-01 10:00:00' WHERE id = ?", (segundo,))
+    assert alteracao(segundo) == 2
+
+
+def test_alteracoes_desde_traz_so_o_que_mudou_depois_do_cursor(cardapio):
+    suco, _ = cardapio
+    primeiro = ServicoPedidos.finalizar("Ana", [(suco, 1)])
+    segundo = ServicoPedidos.finalizar("Bia", [(suco, 1)])
+    ultima, abertos = ServicoPedidos.pedidos_abertos()
+    assert ultima == 2
+    assert [pedido[0] for pedido in abertos] == [primeiro, segundo]
+    assert ServicoPedidos.alteracoes_desde(ultima) == []
+
+    ServicoPedidos.avancar(primeiro)
+    alteracoes = ServicoPedidos.alteracoes_desde(ultima)
+    assert [(linha[0], linha[2], linha[5]) for linha in alteracoes] == [(primeiro, "Em Andamento", 3)]
+    assert [linha[0] for linha in ServicoPedidos.alteracoes_desde(0)] == [segundo, primeiro]
@@ -0,0 +1,74 @@
+import pytest
+
+from servicos import DBManager, EstoqueInsuficiente, ProdutoCatalog, ServicoPedidos, ServicoProdutos, ServicoReservas
+
+
+@pytest.fixture
+def suco(banco):
+    produto_id = ServicoProdutos.adicionar("Suco", 5, "4,99")
+    ProdutoCatalog.sincronizar()
+    return produto_id
+
+
+def estoque(produto_id):
+    # (quantidade, reservado) no banco
+    return DBManager.consultar_um("SELECT quantidade, reservado FROM produtos WHERE id = ?", (produto_id,))
+
+
+def test_reserva_desconta_do_disponivel_e_e_pelo_total(suco):
+    ServicoReservas.reservar("a", suco, 2)
+    # Repetir o mesmo total (nova tentativa) não reserva em dobro
+    ServicoReservas.reservar("a", suco, 2)
+    assert estoque(suco) == (5, 2)
+    assert ProdutoCatalog.por_id(suco).disponivel == 3
+    ServicoReservas.reservar("a", suco, 4)
+    assert ProdutoCatalog.por_id(suco).disponivel == 1
+    ServicoReservas.reservar("a", suco, 0)
+    assert estoque(suco) == (5, 0)
+    assert ProdutoCatalog.por_id(suco).disponivel == 5
+
+
+def test_outro_carrinho_nao_reserva_o_que_ja_esta_reservado(suco):
+    ServicoReservas.reservar("a", suco, 4)
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        ServicoReservas.reservar("b", suco, 2)
+    assert erro.value.faltantes == [("Suco", 1)]
+    ServicoReservas.reservar("b", suco, 1)
+    assert estoque(suco) == (5, 5)
+    # Venda sem carrinho também não leva o que está reservado
+    with pytest.raises(EstoqueInsuficiente) as erro:
+        ServicoPedidos.finalizar("Ana", [(ProdutoCatalog.por_id(suco), 1)])
+    assert erro.value.faltantes == [("Suco", 0)]
+    assert estoque(suco) == (5, 5)
+
+
+def test_venda_com_carrinho_converte_as_reservas(suco):
+    ServicoReservas.reservar("a", suco, 3)
+    ServicoReservas.reservar("b", suco, 2)
+    ServicoPedidos.finalizar("Ana", [(ProdutoCatalog.por_id(suco), 3)], "a")
+    assert estoque(suco) == (2, 2)
+    assert DBManager.consultar("SELECT carrinho, quantidade FROM reservas") == [("b", 2)]
+    assert ProdutoCatalog.por_id(suco).disponivel == 0
+
+
+def test_liberar_devolve_o_carrinho_inteiro(suco):
+    outro = ServicoProdutos.adicionar("Café", 2, "3,50")
+    ServicoReservas.reservar("a", suco, 3)
+    ServicoReservas.reservar("a", outro, 2)
+    ServicoReservas.liberar("a")
+    assert (estoque(suco), estoque(outro)) == ((5, 0), (2, 0))
+    assert DBManager.consultar("SELECT * FROM reservas") == []
+
+
+def test_reservas_vencidas_saem_no_expirar_e_na_proxima_escrita(suco):
+    assert ServicoReservas.expirar() is False
+    ServicoReservas.reservar("a", suco, 3, minutos=-1)
+    assert estoque(suco) == (5, 3)
+    assert ServicoReservas.expirar() is True
+    assert estoque(suco) == (5, 0)
+    assert ProdutoCatalog.por_id(suco).disponivel == 5
+
+    # Sem faxina: a reserva vencida do carrinho "a" não impede a do "b"
+    ServicoReservas.reservar("a", suco, 5, minutos=-1)
+    ServicoReservas.reservar("b", suco, 5)
+    assert DBManager.consultar("SELECT carrinho, quantidade FROM reservas") == [("b", 5)]